@@ -2,7 +2,7 @@ from flask import Flask, jsonify, render_template
 from flask_cors import CORS
 from flask_mail import Mail
 from app.config import config
-from app.utils.base_datos import get_db_connection, init_db
+from app.utils.base_datos import get_db_connection, get_pool_stats, init_db, registrar_unidad_de_trabajo
 from app.servicios.email_servicio import email_service
 import os
 
@@ -327,9 +327,25 @@ def crear_app(config_name="development"):
             print(f"❌ Error inicializando base de datos: {e}")
             print("   La aplicación funcionará con limitaciones")
 
+    # Una transacción compartida por solicitud
+    registrar_unidad_de_trabajo(app)
+
     # Registrar Blueprints (Rutas)
     registrar_blueprints(app)
 
+    # Servicio ML: carga perezosa de modelos o precarga antes del fork
+    from app.servicios.ml_servicio import configurar_servicio_ml
+
+    configurar_servicio_ml(
+        mmap_modo="r" if app.config["ML_MMAP_MODELOS"] else None,
+        precargar=app.config["ML_PRECARGAR_MODELOS"],
+        intervalo_recarga=app.config["ML_RECARGA_INTERVALO"],
+        cache_tamano=app.config["ML_CACHE_TAMANO"],
+        cache_ttl=app.config["ML_CACHE_TTL"],
+        backend_inferencia=app.config["ML_BACKEND_INFERENCIA"],
+        numpy_max_filas=app.config["ML_NUMPY_MAX_FILAS"],
+    )
+
     # Registrar manejadores de errores
     registrar_manejadores_errores(app)
 
@@ -344,6 +360,11 @@ def crear_app(config_name="development"):
             }
         ), 200
 
+    @app.route("/health/db")
+    def health_db():
+        """Estadísticas del pool de conexiones del worker que atiende"""
+        return jsonify({"status": "healthy", "pool": get_pool_stats()}), 200
+
     @app.route("/")
     def index():
         return render_template("inicio.html")
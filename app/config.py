@@ -32,6 +32,15 @@ class Config:
         DB_PASSWORD = os.getenv('DB_PASSWORD', 'postgres')
         DATABASE_URI = f"postgresql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
 
+    # Pool de conexiones (por proceso de gunicorn)
+    DB_POOL_MAX_SIZE = int(os.getenv('DB_POOL_MAX_SIZE', '10'))
+    DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', '10'))  # segundos esperando una conexión libre
+    DB_POOL_MAX_LIFETIME = float(os.getenv('DB_POOL_MAX_LIFETIME', '1800'))  # segundos
+    DB_POOL_MAX_IDLE = float(os.getenv('DB_POOL_MAX_IDLE', '300'))  # segundos
+    DB_POOL_PRE_PING = os.getenv('DB_POOL_PRE_PING', 'True').lower() == 'true'
+    # Una conexión y un commit por solicitud HTTP, compartidos por todos los modelos
+    DB_UNIT_OF_WORK = os.getenv('DB_UNIT_OF_WORK', 'True').lower() == 'true'
+
     # Configuración CORS
     CORS_ORIGINS = os.getenv('CORS_ORIGINS', '*')
 
@@ -50,6 +59,34 @@ class Config:
     MAX_YEARS_PROJECTION = 30
     MIN_INVESTMENT_AMOUNT = 0
     MAX_INVESTMENT_AMOUNT = 999999999999  # 1 billón
+    MAX_PROYECTOS_LOTE = 10000  # proyectos por solicitud en /van/lote
+    MAX_EMPRESAS_LOTE = 10000  # empresas por solicitud en /ml/predecir/lote
+
+    # Monte Carlo: por encima del umbral las simulaciones se reparten en procesos
+    MC_MAX_SIMULACIONES = int(os.getenv('MC_MAX_SIMULACIONES', '2000000'))
+    MC_UMBRAL_PARALELO = int(os.getenv('MC_UMBRAL_PARALELO', '200000'))
+    MC_PROCESOS = int(os.getenv('MC_PROCESOS', str(os.cpu_count() or 1)))  # 1 = sin procesos
+    # Parada adaptativa de /analisis-completo: semiancho del IC 95% del VAN medio
+    # como fracción de la inversión, y tiempo máximo de simulación en segundos
+    MC_SEMIANCHO_RELATIVO = float(os.getenv('MC_SEMIANCHO_RELATIVO', '0.01'))
+    MC_TIEMPO_MAXIMO = float(os.getenv('MC_TIEMPO_MAXIMO', '2.0'))
+
+    # Modelos ML: carga con memory-map (compartida entre workers) y precarga
+    # opcional al crear la app (antes del fork con gunicorn --preload)
+    ML_MMAP_MODELOS = os.getenv('ML_MMAP_MODELOS', 'True').lower() == 'true'
+    ML_PRECARGAR_MODELOS = os.getenv('ML_PRECARGAR_MODELOS', 'False').lower() == 'true'
+    # Cada cuántos segundos busca cada worker una nueva versión de modelos (0 = no busca)
+    ML_RECARGA_INTERVALO = float(os.getenv('ML_RECARGA_INTERVALO', '0'))
+    # Token de la cabecera X-Admin-Token para /ml/modelos/recargar (vacío = deshabilitado)
+    ML_TOKEN_ADMIN = os.getenv('ML_TOKEN_ADMIN', '')
+    # Caché de predicciones por empresa (entradas, 0 = sin caché) y su vida en segundos
+    ML_CACHE_TAMANO = int(os.getenv('ML_CACHE_TAMANO', '4096'))
+    ML_CACHE_TTL = float(os.getenv('ML_CACHE_TTL', '300'))
+    # Backend de inferencia: 'nativo' (predict del modelo) o 'numpy' (árboles en
+    # arrays, más rápido en pocas filas); con 'numpy', los lotes de más de
+    # ML_NUMPY_MAX_FILAS filas usan el modelo nativo
+    ML_BACKEND_INFERENCIA = os.getenv('ML_BACKEND_INFERENCIA', 'nativo')
+    ML_NUMPY_MAX_FILAS = int(os.getenv('ML_NUMPY_MAX_FILAS', '64'))
 
     # OpenAI configuration
     OPENAI_API_KEY = os.getenv('OPENAI_API_KEY', '')
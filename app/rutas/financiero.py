@@ -1,11 +1,12 @@
 """
 Endpoints REST para:
-- VAN, TIR, WACC, Portafolio, Reemplazo de Activos
+- VAN, TIR, WACC, Portafolio (y su optimización), Reemplazo de Activos
+- VAN/TIR por lotes de proyectos
 - Préstamos y Simulación de Cuotas
 - Ahorro e Inversión con Proyecciones
 """
 
-from flask import Blueprint, request, jsonify, session
+from flask import Blueprint, Response, request, jsonify, session, current_app, stream_with_context
 from app.servicios.financiero_servicio import FinancieroServicio
 from app.servicios.prestamo_servicio import ServicioPrestamo
 from app.servicios.ahorro_inversion_servicio import ServicioAhorroInversion
@@ -91,6 +92,70 @@ def calcular_van():
         return jsonify({"error": f"Error interno: {str(e)}"}), 500
 
 
+@bp_financiero.route("/van/lote", methods=["POST"])
+def calcular_van_lote():
+    """
+    Calcula VAN, TIR y decisión para un lote de proyectos en una sola llamada
+
+    Body JSON:
+    {
+        "inversiones_iniciales": [100000, 50000],
+        "flujos_caja": [[30000, 35000, 40000, 45000], [20000, 20000, 20000]],
+        "tasas_descuento": [0.10, 0.12],
+        "tasa_referencia": 0.10,
+        "nombres": ["Proyecto Solar", "Proyecto Eólico"]
+    }
+
+    inversiones_iniciales y tasas_descuento aceptan también un único número
+    que se aplica a todos los proyectos.
+
+    Returns:
+        JSON con listas de VAN, TIR y decisiones en el orden recibido
+    """
+    try:
+        datos = request.get_json()
+
+        inversiones = datos.get("inversiones_iniciales")
+        flujos = datos.get("flujos_caja")
+        tasas = datos.get("tasas_descuento", 0.10)
+        tasa_ref = datos.get("tasa_referencia", 0.10)
+        nombres = datos.get("nombres")
+
+        if inversiones is None or flujos is None:
+            return jsonify(
+                {
+                    "error": "Faltan parámetros requeridos: inversiones_iniciales, flujos_caja"
+                }
+            ), 400
+
+        max_proyectos = current_app.config.get("MAX_PROYECTOS_LOTE", 10000)
+        if isinstance(flujos, list) and len(flujos) > max_proyectos:
+            return jsonify(
+                {"error": f"El lote no puede superar {max_proyectos} proyectos"}
+            ), 400
+
+        resultado = FinancieroServicio.calcular_van_lote(inversiones, flujos, tasas, tasa_ref)
+
+        if nombres:
+            if len(nombres) != resultado["n_proyectos"]:
+                return jsonify(
+                    {"error": "El número de nombres debe coincidir con el número de proyectos"}
+                ), 400
+            resultado["nombres"] = nombres
+
+        return jsonify(
+            {
+                "success": True,
+                "data": resultado,
+            }
+        ), 200
+
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": f"Error interno: {str(e)}"}), 500
+
+
 @bp_financiero.route("/tir", methods=["POST"])
 def calcular_tir():
     """
@@ -256,6 +321,9 @@ def analizar_portafolio():
         "ponderaciones": [0.4, 0.35, 0.25],
         "volatilidades": [0.20, 0.25, 0.15],
         "matriz_correlacion": [[1, 0.5, 0.3], [0.5, 1, 0.4], [0.3, 0.4, 1]],
+        "tasa_libre_riesgo": 0.03,                  // opcional
+        "matriz_retornos": [[0.01, 0.02, -0.01], ...],  // opcional: agrega VaR/CVaR
+        "nivel_confianza": 0.95,                    // opcional
         "usuario_id": 1,
         "nombre_simulacion": "Portafolio Diversificado"
     }
@@ -299,7 +367,13 @@ def analizar_portafolio():
 
         # Analizar portafolio
         resultado = FinancieroServicio.analizar_portafolio(
-            retornos, ponderaciones, volatilidades, matriz_corr
+            retornos,
+            ponderaciones,
+            volatilidades,
+            matriz_corr,
+            tasa_libre_riesgo=float(datos.get("tasa_libre_riesgo", 0)),
+            matriz_retornos=datos.get("matriz_retornos"),
+            nivel_confianza=float(datos.get("nivel_confianza", 0.95)),
         )
 
         # Guardar simulación
@@ -347,6 +421,97 @@ def analizar_portafolio():
         return jsonify({"error": f"Error interno: {str(e)}"}), 500
 
 
+@bp_financiero.route("/portafolio/optimizar", methods=["POST"])
+def optimizar_portafolio():
+    """
+    Optimiza un portafolio: mínima varianza, máximo Sharpe y frontera eficiente
+
+    Body JSON:
+    {
+        "retornos": [0.12, 0.15, 0.10],
+        "volatilidades": [0.20, 0.25, 0.15],
+        "matriz_correlacion": [[1, 0.5, 0.3], [0.5, 1, 0.4], [0.3, 0.4, 1]],
+        "tasa_libre_riesgo": 0.03,
+        "n_puntos": 50,
+        "solo_largos": true
+    }
+
+    Returns:
+        JSON con portafolios óptimos y frontera eficiente
+    """
+    try:
+        datos = request.get_json()
+
+        retornos = datos.get("retornos")
+        volatilidades = datos.get("volatilidades")
+        matriz_corr = datos.get("matriz_correlacion")
+
+        if any(x is None for x in [retornos, volatilidades, matriz_corr]):
+            return jsonify(
+                {"error": "Faltan parámetros requeridos: retornos, volatilidades, matriz_correlacion"}
+            ), 400
+
+        resultado = FinancieroServicio.optimizar_portafolio(
+            retornos,
+            volatilidades,
+            matriz_corr,
+            tasa_libre_riesgo=float(datos.get("tasa_libre_riesgo", 0)),
+            n_puntos=int(datos.get("n_puntos", 50)),
+            solo_largos=bool(datos.get("solo_largos", True)),
+        )
+
+        return jsonify({"success": True, "data": resultado}), 200
+
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": f"Error interno: {str(e)}"}), 500
+
+
+@bp_financiero.route("/portafolio/riesgo", methods=["POST"])
+def riesgo_portafolio():
+    """
+    VaR y CVaR de un portafolio (paramétrico, histórico y Monte Carlo)
+
+    Body JSON:
+    {
+        "matriz_retornos": [[0.010, -0.004, 0.002], [-0.021, 0.012, 0.005], ...],
+        "ponderaciones": [0.4, 0.35, 0.25],
+        "nivel_confianza": 0.99,
+        "valor_portafolio": 100000,
+        "n_escenarios": 100000,
+        "semilla": 42
+    }
+
+    Returns:
+        JSON con VaR/CVaR por método y contribución de cada activo al riesgo
+    """
+    try:
+        datos = request.get_json()
+
+        matriz_retornos = datos.get("matriz_retornos")
+        ponderaciones = datos.get("ponderaciones")
+
+        if matriz_retornos is None or ponderaciones is None:
+            return jsonify({"error": "Faltan parámetros requeridos: matriz_retornos, ponderaciones"}), 400
+
+        resultado = FinancieroServicio.analizar_riesgo_portafolio(
+            matriz_retornos,
+            ponderaciones,
+            nivel_confianza=float(datos.get("nivel_confianza", 0.95)),
+            valor_portafolio=float(datos.get("valor_portafolio", 1.0)),
+            n_escenarios=int(datos.get("n_escenarios", 100000)),
+            semilla=int(datos.get("semilla", 42)),
+        )
+
+        return jsonify({"success": True, "data": resultado}), 200
+
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": f"Error interno: {str(e)}"}), 500
+
+
 @bp_financiero.route("/reemplazo-activo", methods=["POST"])
 def analizar_reemplazo():
     """
@@ -514,7 +679,26 @@ def calcular_prestamo():
         "tasa_impuesto": 0,
         "comision_inicial": 2,
         "usuario_id": 1,
-        "nombre_simulacion": "Préstamo Auto"
+        "nombre_simulacion": "Préstamo Auto",
+        "incluir_tabla": true,
+        "desde_mes": 1,
+        "limite": 12
+    }
+
+    incluir_tabla=false devuelve solo resumen, costos e indicadores;
+    desde_mes/limite devuelven un tramo de la tabla con "paginacion".
+
+    Con "modo": "simulacion" acepta además prepagos, cambios de tasa y
+    período de gracia, y compara estrategias de prepago en lote (con la
+    misma comisión e impuesto que el modo estándar):
+    {
+        "modo": "simulacion",
+        "prepagos": [{"mes": 12, "monto": 5000}, {"monto": 200, "cada": 1}],
+        "modalidad": "reducir_plazo" | "reducir_cuota",
+        "cambios_tasa": [{"mes": 25, "tasa_anual": 14}],
+        "gracia_meses": 6,
+        "tipo_gracia": "parcial" | "total",
+        "estrategias": [{"nombre": "...", "prepagos": [...], "modalidad": "..."}]
     }
 
     Returns:
@@ -540,15 +724,49 @@ def calcular_prestamo():
         comision_inicial = datos.get("comision_inicial", 0)
         usuario_id = datos.get("usuario_id")
         nombre = datos.get("nombre_simulacion", "Simulación Préstamo")
+        incluir_tabla = bool(datos.get("incluir_tabla", True))
+        desde_mes = int(datos.get("desde_mes", 1))
+        limite = datos.get("limite")
+
+        modo = datos.get("modo", "estandar")
+        parametros = {
+            "monto": monto,
+            "tasa_anual": tasa_anual,
+            "plazo_meses": plazo_meses,
+            "tasa_impuesto": tasa_impuesto,
+            "comision_inicial": comision_inicial,
+        }
 
         # Calcular préstamo
-        resultado = ServicioPrestamo.calcular_prestamo_completo(
-            monto=monto,
-            tasa_anual=tasa_anual,
-            plazo_meses=plazo_meses,
-            tasa_impuesto=tasa_impuesto,
-            comision_inicial=comision_inicial,
-        )
+        if modo == "simulacion":
+            parametros = {
+                "monto": monto,
+                "tasa_anual": tasa_anual,
+                "plazo_meses": plazo_meses,
+                "prepagos": datos.get("prepagos"),
+                "modalidad": datos.get("modalidad", "reducir_plazo"),
+                "cambios_tasa": datos.get("cambios_tasa"),
+                "gracia_meses": datos.get("gracia_meses", 0),
+                "tipo_gracia": datos.get("tipo_gracia", "parcial"),
+                "estrategias": datos.get("estrategias"),
+                "tasa_impuesto": tasa_impuesto,
+                "comision_inicial": comision_inicial,
+            }
+            resultado = ServicioPrestamo.simular_prestamo(
+                incluir_tabla=incluir_tabla, **parametros
+            )
+            parametros["modo"] = modo
+        elif modo == "estandar":
+            resultado = ServicioPrestamo.calcular_prestamo_completo(
+                incluir_tabla=incluir_tabla,
+                desde_mes=desde_mes,
+                limite=None if limite is None else int(limite),
+                **parametros,
+            )
+        else:
+            return jsonify(
+                {"error": f"Modo no válido: {modo}. Opciones: estandar, simulacion"}
+            ), 400
 
         # Guardar simulación si hay usuario_id
         if usuario_id:
@@ -556,13 +774,7 @@ def calcular_prestamo():
                 usuario_id=usuario_id,
                 nombre=nombre,
                 tipo_simulacion="PRESTAMO",
-                parametros={
-                    "monto": monto,
-                    "tasa_anual": tasa_anual,
-                    "plazo_meses": plazo_meses,
-                    "tasa_impuesto": tasa_impuesto,
-                    "comision_inicial": comision_inicial,
-                },
+                parametros=parametros,
                 resultados=resultado,
             )
             if simulacion:
@@ -660,6 +872,53 @@ def comparar_plazos_prestamo():
         return jsonify({"error": f"Error interno: {str(e)}"}), 500
 
 
+@bp_financiero.route("/prestamo/grid", methods=["POST"])
+def rejilla_prestamo():
+    """
+    Cuota y costos para todas las combinaciones de montos, tasas y plazos
+
+    Body JSON:
+    {
+        "montos": [50000] | 50000,
+        "tasas_anuales": [8, 9, 10, ...],
+        "plazos_meses": [12, 24, 36, ...],
+        "tasa_impuesto": 0,
+        "comision_inicial": 0
+    }
+
+    Returns:
+        JSON con superficies [monto][tasa][plazo] de cuota y costos
+    """
+    try:
+        datos = request.get_json()
+
+        montos = datos.get("montos", datos.get("monto"))
+        tasas_anuales = datos.get("tasas_anuales", datos.get("tasa_anual"))
+        plazos_meses = datos.get("plazos_meses", datos.get("plazo_meses"))
+
+        if any(x is None for x in [montos, tasas_anuales, plazos_meses]):
+            return jsonify(
+                {
+                    "error": "Faltan parámetros requeridos: montos, tasas_anuales, plazos_meses"
+                }
+            ), 400
+
+        resultado = ServicioPrestamo.evaluar_rejilla(
+            montos,
+            tasas_anuales,
+            plazos_meses,
+            tasa_impuesto=datos.get("tasa_impuesto", 0),
+            comision_inicial=datos.get("comision_inicial", 0),
+        )
+
+        return jsonify({"success": True, "data": resultado}), 200
+
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": f"Error interno: {str(e)}"}), 500
+
+
 # ============================================================================
 # ENDPOINTS PARA SIMULACIÓN DE AHORRO E INVERSIÓN
 # ============================================================================
@@ -678,12 +937,16 @@ def calcular_ahorro():
         "meses": 120,
         "tasa_impuesto": 0.05,
         "inflacion_anual": 3.0,
+        "resolucion": "anual",           // opcional: mensual | trimestral | anual
+        "formato": "json",               // opcional: json | csv (csv siempre en streaming)
+        "stream": false,                 // opcional: JSON enviado por bloques
         "usuario_id": 1,
         "nombre_simulacion": "Ahorro Jubilación"
     }
 
     Returns:
-        JSON con proyección de ahorro
+        JSON con proyección de ahorro. Con "formato": "csv" o "stream": true
+        la proyección se envía por bloques y no se guarda la simulación.
     """
     try:
         datos = request.get_json()
@@ -704,9 +967,31 @@ def calcular_ahorro():
         # Parámetros opcionales
         tasa_impuesto = datos.get("tasa_impuesto", 0)
         inflacion_anual = datos.get("inflacion_anual", 0)
+        resolucion = datos.get("resolucion", "anual")
+        formato = datos.get("formato", "json")
         usuario_id = datos.get("usuario_id")
         nombre = datos.get("nombre_simulacion", "Simulación Ahorro")
 
+        # Proyecciones largas (p. ej. mensual a 50 años) se envían por bloques
+        if formato != "json" or datos.get("stream"):
+            bloques = ServicioAhorroInversion.proyeccion_en_bloques(
+                monto_inicial=monto_inicial,
+                aporte_mensual=aporte_mensual,
+                tasa_anual=tasa_anual,
+                meses=meses,
+                tasa_impuesto=tasa_impuesto,
+                inflacion_anual=inflacion_anual,
+                resolucion=resolucion,
+                formato=formato,
+            )
+            if formato == "csv":
+                return Response(
+                    stream_with_context(bloques),
+                    mimetype="text/csv",
+                    headers={"Content-Disposition": "attachment; filename=proyeccion_ahorro.csv"},
+                )
+            return Response(stream_with_context(bloques), mimetype="application/json")
+
         # Calcular ahorro
         resultado = ServicioAhorroInversion.calcular_ahorro_con_aportes(
             monto_inicial=monto_inicial,
@@ -715,6 +1000,7 @@ def calcular_ahorro():
             meses=meses,
             tasa_impuesto=tasa_impuesto,
             inflacion_anual=inflacion_anual,
+            resolucion=resolucion,
         )
 
         # Guardar simulación
@@ -762,15 +1048,25 @@ def calcular_meta_ahorro():
         "monto_objetivo": 100000,
         "monto_inicial": 10000,
         "tasa_anual": 8.0,
-        "aporte_mensual": 500
+        "aporte_mensual": 500,
+        "tasa_impuesto": 0,
+        "inflacion_anual": 0
     }
 
+    Con "metas": [{...}, ...] resuelve todas las metas en una llamada; los
+    campos del nivel superior sirven de valor por defecto para cada meta.
+
     Returns:
         JSON con tiempo necesario y proyección
     """
     try:
         datos = request.get_json()
 
+        if "metas" in datos:
+            comunes = {campo: valor for campo, valor in datos.items() if campo != "metas"}
+            resultado = ServicioAhorroInversion.analizar_metas_lote(datos["metas"], comunes)
+            return jsonify({"success": True, "data": resultado}), 200
+
         monto_objetivo = datos.get("monto_objetivo")
         monto_inicial = datos.get("monto_inicial")
         tasa_anual = datos.get("tasa_anual")
@@ -783,7 +1079,12 @@ def calcular_meta_ahorro():
             return jsonify({"error": "Faltan parámetros requeridos"}), 400
 
         resultado = ServicioAhorroInversion.analizar_meta_ahorro(
-            monto_objetivo, monto_inicial, tasa_anual, aporte_mensual
+            monto_objetivo,
+            monto_inicial,
+            tasa_anual,
+            aporte_mensual,
+            tasa_impuesto=datos.get("tasa_impuesto", 0),
+            inflacion_anual=datos.get("inflacion_anual", 0),
         )
 
         return jsonify({"success": True, "data": resultado}), 200
@@ -909,3 +1210,66 @@ def sensibilidad_ahorro():
         return jsonify({"error": str(e)}), 400
     except Exception as e:
         return jsonify({"error": f"Error interno: {str(e)}"}), 500
+
+
+@bp_financiero.route("/ahorro/monte-carlo", methods=["POST"])
+def monte_carlo_ahorro():
+    """
+    Simulación Monte Carlo del ahorro con rendimientos e inflación aleatorios
+
+    Body JSON:
+    {
+        "monto_inicial": 10000,
+        "aporte_mensual": 500,
+        "tasa_anual": 7.0,
+        "meses": 480,
+        "volatilidad_anual": 15.0,
+        "modelo": "normal",              // normal | lognormal | bootstrap
+        "serie_rendimientos": [1.2, -0.4],  // rendimientos mensuales (%) para bootstrap
+        "inflacion_anual": 3.0,
+        "volatilidad_inflacion": 1.0,
+        "tasa_impuesto": 0,
+        "monto_objetivo": 500000,
+        "n_simulaciones": 10000,
+        "resolucion": "anual",
+        "semilla": 42
+    }
+
+    Returns:
+        JSON con bandas de percentiles por mes y probabilidad de alcanzar la meta
+    """
+    try:
+        datos = request.get_json()
+
+        monto_inicial = datos.get("monto_inicial")
+        aporte_mensual = datos.get("aporte_mensual")
+        modelo = datos.get("modelo", "normal")
+        tasa_anual = datos.get("tasa_anual", 0 if modelo == "bootstrap" else None)
+        meses = datos.get("meses")
+
+        if any(x is None for x in [monto_inicial, aporte_mensual, tasa_anual, meses]):
+            return jsonify({"error": "Faltan parámetros requeridos"}), 400
+
+        resultado = ServicioAhorroInversion.simular_ahorro_monte_carlo(
+            monto_inicial=monto_inicial,
+            aporte_mensual=aporte_mensual,
+            tasa_anual=tasa_anual,
+            meses=meses,
+            volatilidad_anual=datos.get("volatilidad_anual", 15.0),
+            modelo=modelo,
+            serie_rendimientos=datos.get("serie_rendimientos"),
+            inflacion_anual=datos.get("inflacion_anual", 0),
+            volatilidad_inflacion=datos.get("volatilidad_inflacion", 0),
+            tasa_impuesto=datos.get("tasa_impuesto", 0),
+            monto_objetivo=datos.get("monto_objetivo"),
+            n_simulaciones=int(datos.get("n_simulaciones", 10000)),
+            resolucion=datos.get("resolucion", "anual"),
+            semilla=int(datos.get("semilla", 42)),
+        )
+
+        return jsonify({"success": True, "data": resultado}), 200
+
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": f"Error interno: {str(e)}"}), 500
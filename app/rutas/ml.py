@@ -7,14 +7,21 @@ Endpoints disponibles:
 - POST /api/v1/ml/predecir/ingresos - Predicción de ingresos
 - POST /api/v1/ml/predecir/crecimiento - Predicción de crecimiento
 - POST /api/v1/ml/predecir/riesgo - Clasificación de riesgo
+- POST /api/v1/ml/predecir/lote - Predicciones para un conjunto de empresas
 - POST /api/v1/ml/sensibilidad/montecarlo - Simulación Monte Carlo
 - POST /api/v1/ml/sensibilidad/tornado - Análisis de tornado
 - POST /api/v1/ml/sensibilidad/escenarios - Análisis de escenarios
+- POST /api/v1/ml/sensibilidad/superficie - VAN sobre rejillas de variables (mapas de calor)
+- POST /api/v1/ml/sensibilidad/arana - VAN variando cada variable por separado
 - GET /api/v1/ml/estado - Estado del servicio ML
+- GET /api/v1/ml/modelos - Versión de modelos activa e historial
+- POST /api/v1/ml/modelos/recargar - Cambio en caliente de versión de modelos (admin)
 """
-from flask import Blueprint, request, jsonify
+import hmac
+from flask import Blueprint, request, jsonify, current_app
 from app.servicios.ml_servicio import (
     obtener_servicio_ml,
+    obtener_registro_modelos,
     SimulacionMonteCarlo,
     AnalisisSensibilidad
 )
@@ -39,10 +46,14 @@ def estado_servicio():
         return jsonify({
             'status': 'activo',
             'modelos_cargados': servicio.modelos_cargados,
+            'version_modelos': servicio.version,
+            'carga_modelos': servicio.estado_modelos(),
+            'cache_predicciones': servicio.cache.estadisticas(),
             'servicios_disponibles': {
                 'prediccion_ingresos': True,
                 'prediccion_crecimiento': True,
                 'clasificacion_riesgo': True,
+                'prediccion_lote': True,
                 'simulacion_montecarlo': True,
                 'analisis_sensibilidad': True
             },
@@ -55,6 +66,69 @@ def estado_servicio():
         }), 500
 
 
+@bp_ml.route('/modelos', methods=['GET'])
+def versiones_modelos():
+    """
+    Lista la versión de modelos activa, las cargadas antes y las disponibles.
+    
+    Returns:
+        JSON con la versión activa (id, checksum, metadatos), el historial de
+        versiones cargadas en este worker y los directorios disponibles
+    """
+    try:
+        registro = obtener_registro_modelos()
+        return jsonify({
+            'status': 'success',
+            'activa': registro.activa,
+            'version_configurada': registro.version_configurada(),
+            'historial': registro.historial,
+            'versiones_disponibles': registro.versiones_disponibles()
+        }), 200
+    except Exception as e:
+        return jsonify({'error': f'Error interno: {str(e)}'}), 500
+
+
+@bp_ml.route('/modelos/recargar', methods=['POST'])
+def recargar_modelos():
+    """
+    Carga una versión de modelos y la activa sin reiniciar el servidor.
+    
+    Requiere la cabecera X-Admin-Token igual a ML_TOKEN_ADMIN. La versión
+    se fija en ml/modelos/VERSION_ACTIVA para que el resto de workers la
+    adopten en su próxima comprobación (ML_RECARGA_INTERVALO).
+    
+    Request Body:
+        {
+            "version": str (opcional, subdirectorio de ml/modelos; "." el raíz),
+            "forzar": bool (opcional, recargar aunque no haya cambios)
+        }
+        
+    Returns:
+        JSON con la versión activa y si hubo cambio
+    """
+    try:
+        token = current_app.config['ML_TOKEN_ADMIN']
+        if not token or not hmac.compare_digest(request.headers.get('X-Admin-Token', ''), token):
+            return jsonify({'error': 'No autorizado'}), 403
+        
+        datos = request.get_json(silent=True) or {}
+        resultado = obtener_registro_modelos().cargar(
+            version=datos.get('version'),
+            forzar=bool(datos.get('forzar', False)),
+            fijar='version' in datos
+        )
+        
+        return jsonify({
+            'status': 'success',
+            'version': resultado
+        }), 200
+        
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': f'Error interno: {str(e)}'}), 500
+
+
 # ============================================================================
 # Endpoints de Predicción
 # ============================================================================
@@ -182,6 +256,47 @@ def clasificar_riesgo():
         return jsonify({'error': f'Error interno: {str(e)}'}), 500
 
 
+@bp_ml.route('/predecir/lote', methods=['POST'])
+def predecir_lote():
+    """
+    Predice ingresos, crecimiento y riesgo de un conjunto de empresas.
+    
+    Request Body:
+        {
+            "empresas": [{...datos como /predecir/ingresos...}, ...] (requerido),
+            "modelos": ["ingresos", "crecimiento", "riesgo"] (opcional, default todos)
+        }
+        
+    Returns:
+        JSON con una entrada por empresa (en el mismo orden) con el resultado
+        de cada modelo pedido
+    """
+    try:
+        datos = request.get_json()
+        
+        empresas = datos.get('empresas') if isinstance(datos, dict) else None
+        if not isinstance(empresas, list) or len(empresas) == 0:
+            return jsonify({'error': 'Se requiere "empresas": lista no vacía de empresas'}), 400
+        
+        max_empresas = current_app.config['MAX_EMPRESAS_LOTE']
+        if len(empresas) > max_empresas:
+            return jsonify({'error': f'Máximo {max_empresas} empresas por solicitud'}), 400
+        
+        servicio = obtener_servicio_ml()
+        resultados = servicio.predecir_lote(empresas, datos.get('modelos'))
+        
+        return jsonify({
+            'status': 'success',
+            'n_empresas': len(resultados),
+            'predicciones': resultados
+        }), 200
+        
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': f'Error interno: {str(e)}'}), 500
+
+
 # ============================================================================
 # Endpoints de Análisis de Sensibilidad
 # ============================================================================
@@ -198,9 +313,19 @@ def simulacion_montecarlo():
             "tasa_descuento": float (requerido),
             "variacion_flujos": float (opcional, default 0.15),
             "variacion_tasa": float (opcional, default 0.02),
-            "n_simulaciones": int (opcional, default 10000)
+            "n_simulaciones": int (opcional, default 10000, máx. MC_MAX_SIMULACIONES),
+            "precision": "float64" | "float32" (opcional, default "float64"),
+            "semilla": int | null (opcional, default 42; null = aleatoria),
+            "metodo": "estandar" | "antitetico" | "variable_control" | "sobol"
+                      (opcional, reducción de varianza; default "estandar"),
+            "error_objetivo": float (opcional, error estándar del VAN medio),
+            "semiancho_objetivo": float (opcional, semiancho del IC 95%),
+            "tiempo_maximo": float (opcional, segundos)
         }
         
+        Con error_objetivo, semiancho_objetivo o tiempo_maximo la simulación
+        para en cuanto se alcanza la precisión (n_simulaciones es el máximo).
+        
     Returns:
         JSON con estadísticas de la simulación Monte Carlo
     """
@@ -220,18 +345,33 @@ def simulacion_montecarlo():
         variacion_flujos = datos.get('variacion_flujos', 0.15)
         variacion_tasa = datos.get('variacion_tasa', 0.02)
         n_simulaciones = datos.get('n_simulaciones', 10000)
+        precision = datos.get('precision', 'float64')
+        semilla = datos.get('semilla', 42)
+        metodo = datos.get('metodo', 'estandar')
+        objetivos = {
+            clave: float(datos[clave])
+            for clave in ('error_objetivo', 'semiancho_objetivo', 'tiempo_maximo')
+            if datos.get(clave) is not None
+        }
         
-        # Limitar simulaciones para evitar timeout
-        n_simulaciones = min(n_simulaciones, 50000)
+        # Limitar simulaciones para evitar timeout; las grandes se reparten en procesos
+        n_simulaciones = min(int(n_simulaciones), current_app.config['MC_MAX_SIMULACIONES'])
+        n_procesos = None
+        if metodo == 'estandar' and not objetivos and n_simulaciones >= current_app.config['MC_UMBRAL_PARALELO']:
+            n_procesos = current_app.config['MC_PROCESOS']
         
         # Ejecutar simulación
-        mc = SimulacionMonteCarlo(n_simulaciones=n_simulaciones)
+        mc = SimulacionMonteCarlo(n_simulaciones=n_simulaciones, seed=semilla)
         resultado = mc.simular_van(
             inversion_inicial=datos['inversion_inicial'],
             flujos_base=datos['flujos_caja'],
             tasa_descuento_base=datos['tasa_descuento'],
             variacion_flujos=variacion_flujos,
-            variacion_tasa=variacion_tasa
+            variacion_tasa=variacion_tasa,
+            precision=precision,
+            n_procesos=n_procesos,
+            metodo=metodo,
+            **objetivos
         )
         
         return jsonify({
@@ -263,7 +403,8 @@ def analisis_tornado():
             "inversion_inicial": float (requerido),
             "flujos_caja": [float, ...] (requerido),
             "tasa_descuento": float (requerido),
-            "variacion": float (opcional, default 0.20)
+            "variacion": float (opcional, default 0.20),
+            "variables": ["inversion", "flujos", "tasa", "flujo_1", ...] (opcional)
         }
         
     Returns:
@@ -287,7 +428,8 @@ def analisis_tornado():
             inversion_inicial=datos['inversion_inicial'],
             flujos_base=datos['flujos_caja'],
             tasa_base=datos['tasa_descuento'],
-            variacion=variacion
+            variacion=variacion,
+            variables=datos.get('variables')
         )
         
         return jsonify({
@@ -353,21 +495,91 @@ def analisis_escenarios():
         return jsonify({'error': f'Error interno: {str(e)}'}), 500
 
 
+@bp_ml.route('/sensibilidad/superficie', methods=['POST'])
+def superficie_sensibilidad():
+    """
+    Calcula el VAN en todas las combinaciones de las rejillas de las variables.
+    
+    Request Body:
+        {
+            "inversion_inicial": float (requerido),
+            "flujos_caja": [float, ...] (requerido),
+            "tasa_descuento": float (requerido),
+            "variables": {
+                "flujos": {"min": 0.5, "max": 1.5, "n": 50},
+                "tasa": {"min": 0.02, "max": 0.30, "n": 50, "tipo": "absoluto"},
+                "flujo_3": [0.8, 1.0, 1.2]
+            } (requerido; variables: inversion, flujos, tasa, flujo_<período>)
+        }
+        
+    Returns:
+        JSON con los ejes y el VAN como lista anidada (un nivel por eje),
+        lista para mapas de calor
+    """
+    return _rejilla_sensibilidad('superficie_sensibilidad', 'analisis_superficie')
+
+
+@bp_ml.route('/sensibilidad/arana', methods=['POST'])
+def sensibilidad_arana():
+    """
+    Calcula el VAN moviendo cada variable por su rejilla con el resto en su
+    valor base (gráfico de araña). Mismo cuerpo que /sensibilidad/superficie.
+    
+    Returns:
+        JSON con una serie por variable ordenada por rango de VAN
+    """
+    return _rejilla_sensibilidad('sensibilidad_univariada', 'analisis_arana')
+
+
+def _rejilla_sensibilidad(metodo: str, clave: str):
+    """Valida el cuerpo común de los análisis sobre rejillas y ejecuta el método."""
+    try:
+        datos = request.get_json()
+        
+        campos_requeridos = ['inversion_inicial', 'flujos_caja', 'tasa_descuento', 'variables']
+        for campo in campos_requeridos:
+            if campo not in datos:
+                return jsonify({
+                    'error': f'Campo requerido faltante: {campo}',
+                    'campos_requeridos': campos_requeridos
+                }), 400
+        
+        analisis = AnalisisSensibilidad()
+        resultado = getattr(analisis, metodo)(
+            inversion_inicial=float(datos['inversion_inicial']),
+            flujos_base=[float(f) for f in datos['flujos_caja']],
+            tasa_base=float(datos['tasa_descuento']),
+            variables=datos['variables']
+        )
+        
+        return jsonify({
+            'status': 'success',
+            clave: resultado
+        }), 200
+        
+    except (ValueError, TypeError) as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': f'Error interno: {str(e)}'}), 500
+
+
 @bp_ml.route('/sensibilidad/punto-equilibrio', methods=['POST'])
 def punto_equilibrio():
     """
-    Calcula el punto de equilibrio (VAN = 0) para una variable.
+    Calcula el punto de equilibrio (VAN = 0) para una variable o para todas.
     
     Request Body:
         {
             "inversion_inicial": float (requerido),
             "flujos_caja": [float, ...] (requerido),
             "tasa_descuento": float (requerido),
-            "variable": str (opcional, 'flujos' o 'tasa', default 'flujos')
+            "variable": str (opcional, 'flujos', 'tasa', 'inversion', 'horizonte',
+                        'flujo_<período>' o 'todas', default 'flujos')
         }
         
     Returns:
-        JSON con punto de equilibrio y margen de seguridad
+        JSON con punto de equilibrio y margen de seguridad ('todas' devuelve
+        el VAN base y el equilibrio de cada variable)
     """
     try:
         datos = request.get_json()
@@ -424,7 +636,10 @@ def analisis_completo():
                 "inversion_inicial": float,
                 "flujos_caja": [float, ...],
                 "tasa_descuento": float
-            } (opcional, para análisis de sensibilidad)
+            } (opcional, para análisis de sensibilidad),
+            "semilla": int | null (opcional, semilla del Monte Carlo),
+            "semiancho_objetivo": float (opcional, precisión del VAN medio del
+                Monte Carlo; default MC_SEMIANCHO_RELATIVO × inversión)
         }
         
     Returns:
@@ -444,17 +659,18 @@ def analisis_completo():
             'predicciones': {}
         }
         
-        # Predicciones de empresa
+        # Predicciones de empresa (una sola matriz de características para los tres modelos)
         empresa = datos['empresa']
-        resultado['predicciones']['ingresos'] = servicio.predecir_ingresos(empresa)
-        resultado['predicciones']['crecimiento'] = servicio.predecir_crecimiento(empresa)
-        resultado['predicciones']['riesgo'] = servicio.clasificar_riesgo(empresa)
+        resultado['predicciones'] = servicio.predecir_lote([empresa])[0]
         
         # Análisis de sensibilidad si hay datos de proyecto
         if 'proyecto' in datos:
             proyecto = datos['proyecto']
             analisis = AnalisisSensibilidad()
-            mc = SimulacionMonteCarlo(n_simulaciones=5000)
+            mc = SimulacionMonteCarlo(n_simulaciones=5000, seed=datos.get('semilla', 42))
+            semiancho_objetivo = datos.get('semiancho_objetivo') or (
+                current_app.config['MC_SEMIANCHO_RELATIVO'] * abs(float(proyecto['inversion_inicial']))
+            )
             
             resultado['sensibilidad'] = {
                 'escenarios': analisis.analisis_escenarios(
@@ -470,7 +686,9 @@ def analisis_completo():
                 'montecarlo': mc.simular_van(
                     inversion_inicial=proyecto['inversion_inicial'],
                     flujos_base=proyecto['flujos_caja'],
-                    tasa_descuento_base=proyecto['tasa_descuento']
+                    tasa_descuento_base=proyecto['tasa_descuento'],
+                    semiancho_objetivo=float(semiancho_objetivo) or None,
+                    tiempo_maximo=current_app.config['MC_TIEMPO_MAXIMO']
                 )
             }
         
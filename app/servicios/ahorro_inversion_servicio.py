@@ -7,16 +7,30 @@ Funcionalidades:
 - Cálculo de valor futuro
 - Comparación de instrumentos de inversión
 - Análisis de inflación
-- Proyecciones con impuestos
+- Proyecciones con impuestos (vectorizadas, con salida en streaming)
+- Simulación Monte Carlo de rendimientos e inflación
 """
 
+import csv
+import io
+import json
 import numpy as np
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Iterator, Optional
 
 
 class ServicioAhorroInversion:
     """Servicio para cálculos de ahorro e inversiones"""
 
+    MAX_MESES_META = 1200  # 100 años
+    MAX_METAS_LOTE = 2000
+    RESOLUCIONES = {"mensual": 1, "trimestral": 3, "anual": 12}
+    # Monte Carlo: escenarios por llamada, bloques meses × escenarios y bandas reportadas
+    MODELOS_MONTE_CARLO = ("normal", "lognormal", "bootstrap")
+    MAX_SIMULACIONES_AHORRO = 100000
+    MEMORIA_MAX_BLOQUE = 32 * 1024 * 1024
+    MAX_MESES_BLOQUE = 120
+    PERCENTILES_ABANICO = (5, 25, 50, 75, 95)
+
     @staticmethod
     def validar_parametros_ahorro(
         monto_inicial: float, aporte_mensual: float, tasa_anual: float, meses: int
@@ -58,81 +72,61 @@ class ServicioAhorroInversion:
         return vf
 
     @staticmethod
-    def calcular_ahorro_con_aportes(
+    def proyectar_ahorro(
         monto_inicial: float,
         aporte_mensual: float,
-        tasa_anual: float,
+        tasas_anuales,
         meses: int,
-        tasa_impuesto: float = 0,
+        tasas_impuesto=0,
         inflacion_anual: float = 0,
-    ) -> Dict[str, Any]:
+    ) -> Dict[str, np.ndarray]:
         """
-        Simula crecimiento de ahorro con aportes periódicos y capitalización compuesta
+        Proyección mes a mes de una o varias tasas en una sola pasada
 
-        Args:
-            monto_inicial: Monto inicial de ahorro
-            aporte_mensual: Aporte mensual
-            tasa_anual: Tasa de rendimiento anual (%)
-            meses: Número de meses
-            tasa_impuesto: Tasa de impuesto sobre intereses (%)
-            inflacion_anual: Inflación anual (%) - Para poder adquisitivo
+        Cada fila corresponde a una tasa (con su impuesto) y cada columna a un
+        mes. El saldo sale de la forma cerrada de _saldo_con_aportes con la
+        tasa neta r·(1 - t) y el interés bruto del mes es r·(S_(k-1) + A).
 
         Returns:
-            Dict con proyección detallada
+            Dict con 'mes' (meses,) y matrices n_tasas × meses 'saldo',
+            'interes_mes', 'impuesto_mes' y 'saldo_poder_adquisitivo'
         """
-        ServicioAhorroInversion.validar_parametros_ahorro(
-            monto_inicial, aporte_mensual, tasa_anual, meses
-        )
-
-        if tasa_impuesto < 0 or tasa_impuesto > 100:
-            raise ValueError("La tasa de impuesto debe estar entre 0 y 100%")
+        tasas = np.atleast_1d(np.asarray(tasas_anuales, dtype=np.float64)) / 1200
+        impuestos = np.broadcast_to(np.asarray(tasas_impuesto, dtype=np.float64), tasas.shape) / 100
+        tasas, impuestos = tasas[:, None], impuestos[:, None]
+        mes = np.arange(1, int(meses) + 1)
 
-        tasa_mensual = (tasa_anual / 100) / 12
-        inflacion_mensual = (inflacion_anual / 100) / 12
-
-        proyeccion = []
-        saldo = monto_inicial
-        interes_total_bruto = 0
-        impuestos_total = 0
-        aporte_total = 0
-
-        for mes in range(1, meses + 1):
-            # Agregar aporte al inicio del mes
-            saldo += aporte_mensual
-            aporte_total += aporte_mensual
-
-            # Calcular interés sobre saldo
-            interes_mes = saldo * tasa_mensual
-            interes_total_bruto += interes_mes
-
-            # Calcular impuesto sobre interés
-            impuesto_mes = interes_mes * (tasa_impuesto / 100)
-            impuestos_total += impuesto_mes
-
-            # Aplicar interés neto (después de impuesto)
-            saldo = saldo + interes_mes - impuesto_mes
-
-            # Calcular poder adquisitivo considerando inflación
-            poder_adquisitivo = saldo / ((1 + inflacion_mensual) ** mes)
-
-            # Datos para el mes
-            if (
-                mes % 12 == 0 or mes == 1 or mes == meses
-            ):  # Mostrar cada año + primero y último
-                proyeccion.append(
-                    {
-                        "mes": mes,
-                        "ano": round(mes / 12, 1),
-                        "aporte_mes": round(aporte_mensual, 2),
-                        "aporte_acumulado": round(aporte_total, 2),
-                        "interes_mes": round(interes_mes, 2),
-                        "impuesto_mes": round(impuesto_mes, 2),
-                        "saldo": round(saldo, 2),
-                        "saldo_poder_adquisitivo": round(poder_adquisitivo, 2),
-                    }
-                )
+        saldo = ServicioAhorroInversion._saldo_con_aportes(
+            monto_inicial, aporte_mensual, tasas * (1 - impuestos), mes
+        )
+        previo = np.concatenate([np.full((len(tasas), 1), float(monto_inicial)), saldo[:, :-1]], axis=1)
+        interes = (previo + aporte_mensual) * tasas
+        return {
+            "mes": mes,
+            "saldo": saldo,
+            "interes_mes": interes,
+            "impuesto_mes": interes * impuestos,
+            "saldo_poder_adquisitivo": saldo / (1 + inflacion_anual / 1200) ** mes,
+        }
 
+    @staticmethod
+    def _resumen_ahorro(
+        proyeccion: Dict[str, np.ndarray],
+        monto_inicial: float,
+        aporte_mensual: float,
+        tasa_anual: float,
+        meses: int,
+        inflacion_anual: float,
+    ) -> Dict[str, Any]:
+        """Resumen e indicadores de la primera fila de una proyección"""
+        saldo = float(proyeccion["saldo"][0, -1])
+        interes_total_bruto = float(proyeccion["interes_mes"][0].sum())
+        impuestos_total = float(proyeccion["impuesto_mes"][0].sum())
+        aporte_total = aporte_mensual * meses
         ganancia_neta = interes_total_bruto - impuestos_total
+        capital = aporte_total + monto_inicial
+        tasa_mensual = (tasa_anual / 100) / 12
+        saldo_real = saldo / ((1 + (inflacion_anual / 100) / 12) ** meses)
 
         return {
             "resumen": {
@@ -147,21 +141,155 @@ class ServicioAhorroInversion:
                 "periodo_anos": round(meses / 12, 1),
             },
             "indicadores": {
-                "rendimiento_porcentaje": round(
-                    (ganancia_neta / (aporte_total + monto_inicial)) * 100, 2
-                ),
-                "saldo_poder_adquisitivo_real": round(
-                    saldo / ((1 + inflacion_mensual) ** meses), 2
-                ),
-                "perdida_poder_adquisitivo": round(
-                    saldo - (saldo / ((1 + inflacion_mensual) ** meses)), 2
-                ),
+                "rendimiento_porcentaje": round((ganancia_neta / capital) * 100, 2) if capital else 0.0,
+                "saldo_poder_adquisitivo_real": round(saldo_real, 2),
+                "perdida_poder_adquisitivo": round(saldo - saldo_real, 2),
                 "tasa_efectiva_anual": round((((1 + tasa_mensual) ** 12) - 1) * 100, 2),
                 "saldo_inicial_total": round(monto_inicial + aporte_total, 2),
             },
-            "proyeccion": proyeccion,
         }
 
+    @staticmethod
+    def _columnas_proyeccion(
+        proyeccion: Dict[str, np.ndarray], aporte_mensual: float, resolucion: str
+    ) -> Dict[str, list]:
+        """
+        Columnas redondeadas de la primera fila en la resolución pedida
+        (siempre se incluyen el primer y el último mes)
+        """
+        if resolucion not in ServicioAhorroInversion.RESOLUCIONES:
+            raise ValueError(
+                f"Resolución no válida: {resolucion}. Opciones: {list(ServicioAhorroInversion.RESOLUCIONES)}"
+            )
+        mes = proyeccion["mes"]
+        paso = ServicioAhorroInversion.RESOLUCIONES[resolucion]
+        indices = (mes % paso == 0) | (mes == 1) | (mes == mes[-1])
+        mes = mes[indices]
+
+        def columna(valores):
+            return np.round(valores[0, indices], 2).tolist()
+
+        return {
+            "mes": mes.tolist(),
+            "ano": np.round(mes / 12, 1).tolist(),
+            "aporte_mes": [round(aporte_mensual, 2)] * len(mes),
+            "aporte_acumulado": np.round(aporte_mensual * mes, 2).tolist(),
+            "interes_mes": columna(proyeccion["interes_mes"]),
+            "impuesto_mes": columna(proyeccion["impuesto_mes"]),
+            "saldo": columna(proyeccion["saldo"]),
+            "saldo_poder_adquisitivo": columna(proyeccion["saldo_poder_adquisitivo"]),
+        }
+
+    @staticmethod
+    def _validar_ahorro(
+        monto_inicial: float, aporte_mensual: float, tasa_anual: float, meses: int, tasa_impuesto: float
+    ):
+        ServicioAhorroInversion.validar_parametros_ahorro(
+            monto_inicial, aporte_mensual, tasa_anual, meses
+        )
+        if tasa_impuesto < 0 or tasa_impuesto > 100:
+            raise ValueError("La tasa de impuesto debe estar entre 0 y 100%")
+
+    @staticmethod
+    def calcular_ahorro_con_aportes(
+        monto_inicial: float,
+        aporte_mensual: float,
+        tasa_anual: float,
+        meses: int,
+        tasa_impuesto: float = 0,
+        inflacion_anual: float = 0,
+        resolucion: str = "anual",
+    ) -> Dict[str, Any]:
+        """
+        Simula crecimiento de ahorro con aportes periódicos y capitalización compuesta
+
+        Args:
+            monto_inicial: Monto inicial de ahorro
+            aporte_mensual: Aporte mensual
+            tasa_anual: Tasa de rendimiento anual (%)
+            meses: Número de meses
+            tasa_impuesto: Tasa de impuesto sobre intereses (%)
+            inflacion_anual: Inflación anual (%) - Para poder adquisitivo
+            resolucion: Filas de la proyección: 'mensual', 'trimestral' o 'anual'
+
+        Returns:
+            Dict con proyección detallada
+        """
+        ServicioAhorroInversion._validar_ahorro(
+            monto_inicial, aporte_mensual, tasa_anual, meses, tasa_impuesto
+        )
+
+        proyeccion = ServicioAhorroInversion.proyectar_ahorro(
+            monto_inicial, aporte_mensual, tasa_anual, meses, tasa_impuesto, inflacion_anual
+        )
+        columnas = ServicioAhorroInversion._columnas_proyeccion(proyeccion, aporte_mensual, resolucion)
+        resultado = ServicioAhorroInversion._resumen_ahorro(
+            proyeccion, monto_inicial, aporte_mensual, tasa_anual, meses, inflacion_anual
+        )
+        resultado["proyeccion"] = [dict(zip(columnas, fila)) for fila in zip(*columnas.values())]
+        return resultado
+
+    @staticmethod
+    def proyeccion_en_bloques(
+        monto_inicial: float,
+        aporte_mensual: float,
+        tasa_anual: float,
+        meses: int,
+        tasa_impuesto: float = 0,
+        inflacion_anual: float = 0,
+        resolucion: str = "mensual",
+        formato: str = "json",
+        filas_por_bloque: int = 240,
+    ) -> Iterator[str]:
+        """
+        Proyección serializada por bloques para respuestas en streaming
+
+        Valida y calcula la proyección al llamarse (los errores se lanzan
+        antes de empezar a responder) y devuelve un generador de texto: CSV
+        con encabezado, o el mismo JSON que la respuesta normal de /ahorro.
+
+        Args:
+            formato: 'json' o 'csv'
+            filas_por_bloque: Filas serializadas por cada fragmento
+        """
+        if formato not in ("json", "csv"):
+            raise ValueError(f"Formato no válido: {formato}. Opciones: json, csv")
+        ServicioAhorroInversion._validar_ahorro(
+            monto_inicial, aporte_mensual, tasa_anual, meses, tasa_impuesto
+        )
+        proyeccion = ServicioAhorroInversion.proyectar_ahorro(
+            monto_inicial, aporte_mensual, tasa_anual, meses, tasa_impuesto, inflacion_anual
+        )
+        columnas = ServicioAhorroInversion._columnas_proyeccion(proyeccion, aporte_mensual, resolucion)
+        filas = list(zip(*columnas.values()))
+        nombres = list(columnas)
+
+        if formato == "csv":
+            def generar():
+                salida = io.StringIO()
+                escritor = csv.writer(salida)
+                escritor.writerow(nombres)
+                for inicio in range(0, len(filas), filas_por_bloque):
+                    escritor.writerows(filas[inicio:inicio + filas_por_bloque])
+                    yield salida.getvalue()
+                    salida.seek(0)
+                    salida.truncate()
+            return generar()
+
+        resumen = ServicioAhorroInversion._resumen_ahorro(
+            proyeccion, monto_inicial, aporte_mensual, tasa_anual, meses, inflacion_anual
+        )
+
+        def generar():
+            yield json.dumps({"success": True, "data": resumen})[:-2] + ', "proyeccion": ['
+            for inicio in range(0, len(filas), filas_por_bloque):
+                separador = ", " if inicio else ""
+                yield separador + ", ".join(
+                    json.dumps(dict(zip(nombres, fila))) for fila in filas[inicio:inicio + filas_por_bloque]
+                )
+            yield "]}}"
+        return generar()
+
     @staticmethod
     def calcular_valor_futuro_con_aportes(
         monto_inicial: float, aporte_mensual: float, tasa_anual: float, meses: int
@@ -205,30 +333,41 @@ class ServicioAhorroInversion:
         """
         comparativa = []
 
-        for instrumento in instrumentos:
-            nombre = instrumento.get("nombre", "Instrumento")
-            tasa = instrumento.get("tasa_anual", 0)
-            tasa_impuesto = instrumento.get("tasa_impuesto", 0)
-            descripcion = instrumento.get("descripcion", "")
+        if instrumentos:
+            tasas = [instrumento.get("tasa_anual", 0) for instrumento in instrumentos]
+            impuestos = [instrumento.get("tasa_impuesto", 0) for instrumento in instrumentos]
+            for tasa, tasa_impuesto in zip(tasas, impuestos):
+                ServicioAhorroInversion._validar_ahorro(
+                    monto_inicial, aporte_mensual, tasa, meses, tasa_impuesto
+                )
 
-            resultado = ServicioAhorroInversion.calcular_ahorro_con_aportes(
-                monto_inicial, aporte_mensual, tasa, meses, tasa_impuesto
-            )
-
-            comparativa.append(
-                {
-                    "nombre": nombre,
-                    "descripcion": descripcion,
-                    "tasa_anual": round(tasa, 2),
-                    "tasa_impuesto": round(tasa_impuesto, 2),
-                    "saldo_final": resultado["resumen"]["saldo_final"],
-                    "interes_ganado": resultado["resumen"]["interes_ganado"],
-                    "ganancia_neta": resultado["resumen"]["ganancia_neta"],
-                    "rendimiento_porcentaje": resultado["indicadores"][
-                        "rendimiento_porcentaje"
-                    ],
-                }
+            # Todos los instrumentos en una sola matriz instrumentos × meses
+            proyeccion = ServicioAhorroInversion.proyectar_ahorro(
+                monto_inicial, aporte_mensual, tasas, meses, impuestos
             )
+            interes = proyeccion["interes_mes"].sum(axis=1)
+            ganancia = interes - proyeccion["impuesto_mes"].sum(axis=1)
+            capital = aporte_mensual * meses + monto_inicial
+            rendimiento = ganancia / capital * 100 if capital else np.zeros(len(tasas))
+
+            saldos = np.round(proyeccion["saldo"][:, -1], 2).tolist()
+            intereses = np.round(interes, 2).tolist()
+            ganancias = np.round(ganancia, 2).tolist()
+            rendimientos = np.round(rendimiento, 2).tolist()
+
+            for i, instrumento in enumerate(instrumentos):
+                comparativa.append(
+                    {
+                        "nombre": instrumento.get("nombre", "Instrumento"),
+                        "descripcion": instrumento.get("descripcion", ""),
+                        "tasa_anual": round(tasas[i], 2),
+                        "tasa_impuesto": round(impuestos[i], 2),
+                        "saldo_final": saldos[i],
+                        "interes_ganado": intereses[i],
+                        "ganancia_neta": ganancias[i],
+                        "rendimiento_porcentaje": rendimientos[i],
+                    }
+                )
 
         # Ordenar por saldo final descendente
         comparativa.sort(key=lambda x: x["saldo_final"], reverse=True)
@@ -253,12 +392,94 @@ class ServicioAhorroInversion:
             },
         }
 
+    @staticmethod
+    def _saldo_con_aportes(monto_inicial, aporte_mensual, tasa_mensual, meses):
+        """
+        Saldo tras n meses aportando al inicio de cada mes (forma cerrada,
+        con broadcasting): S_n = P·g^n + A·g·(g^n - 1) / r, con g = 1 + r
+        """
+        tasa_mensual = np.asarray(tasa_mensual, dtype=np.float64)
+        meses = np.asarray(meses, dtype=np.float64)
+        with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+            log_g = np.log1p(tasa_mensual)
+            crecimiento = np.exp(meses * log_g)
+            # (g^n - 1) / r, que tiende a n cuando r -> 0
+            factor = np.where(tasa_mensual == 0, meses, np.expm1(meses * log_g) / tasa_mensual)
+        return monto_inicial * crecimiento + aporte_mensual * (1 + tasa_mensual) * factor
+
+    @staticmethod
+    def resolver_meses_meta(
+        montos_objetivo,
+        montos_iniciales,
+        tasas_anuales,
+        aportes_mensuales,
+        tasas_impuesto=0,
+        inflaciones_anuales=0,
+    ) -> np.ndarray:
+        """
+        Meses necesarios para alcanzar cada meta (np.inf si no se alcanza en
+        MAX_MESES_META), con broadcasting sobre todos los argumentos
+
+        Sin inflación, S_n = (P + K)·g^n - K con K = A·g / r, así que
+        n = ln((T + K) / (P + K)) / ln(g) (n = (T - P) / A si r = 0), redondeado
+        al mes entero y corregido un mes si el redondeo cae en el borde. El
+        impuesto sobre intereses reduce la tasa a r·(1 - t). Con inflación la
+        meta es en poder adquisitivo, S_n / (1 + i)^n >= T, que no tiene
+        despeje en n: se evalúa la forma cerrada en todos los meses a la vez.
+        """
+        objetivo, inicial, tasa_anual, aporte, impuesto, inflacion = np.broadcast_arrays(
+            *(np.asarray(x, dtype=np.float64) for x in (
+                montos_objetivo, montos_iniciales, tasas_anuales,
+                aportes_mensuales, tasas_impuesto, inflaciones_anuales))
+        )
+        tasa = tasa_anual / 1200 * (1 - impuesto / 100)
+        maximo = ServicioAhorroInversion.MAX_MESES_META
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            k = np.where(tasa == 0, 0.0, aporte * (1 + tasa) / tasa)
+            cociente = (objetivo + k) / (inicial + k)
+            # Solo hay solución si el saldo crece hacia la meta
+            creciente = (inicial + k) * tasa > 0
+            analitico = np.where(creciente & (cociente > 0), np.log(cociente) / np.log1p(tasa), np.inf)
+            lineal = np.where(aporte > 0, (objetivo - inicial) / aporte, np.inf)
+        meses = np.ceil(np.where(tasa == 0, lineal, analitico))
+        meses = np.where(inicial >= objetivo, 0.0, meses)
+
+        # Corrección de un mes por redondeo en el borde
+        finitos = np.isfinite(meses) & (meses > 0)
+        n = np.where(finitos, meses, 1.0)
+        anterior = ServicioAhorroInversion._saldo_con_aportes(inicial, aporte, tasa, n - 1)
+        actual = ServicioAhorroInversion._saldo_con_aportes(inicial, aporte, tasa, n)
+        meses = np.where(finitos & (anterior >= objetivo), meses - 1, meses)
+        meses = np.where(finitos & (actual < objetivo), meses + 1, meses)
+
+        # Con inflación se recorren tramos de 10 años; cada meta sale del
+        # recorrido en el primer tramo donde se alcanza
+        pendientes = np.flatnonzero((inflacion != 0) & (inicial < objetivo))
+        meses[pendientes] = np.inf
+        for desde in range(1, maximo + 1, 120):
+            if not len(pendientes):
+                break
+            tramo = np.arange(desde, min(desde + 120, maximo + 1), dtype=np.float64)
+            saldos = ServicioAhorroInversion._saldo_con_aportes(
+                inicial[pendientes, None], aporte[pendientes, None], tasa[pendientes, None], tramo
+            )
+            reales = saldos / (1 + inflacion[pendientes, None] / 1200) ** tramo
+            alcanzada = reales >= objetivo[pendientes, None]
+            hallada = alcanzada.any(axis=1)
+            meses[pendientes[hallada]] = tramo[np.argmax(alcanzada[hallada], axis=1)]
+            pendientes = pendientes[~hallada]
+
+        return np.where(meses > maximo, np.inf, meses)
+
     @staticmethod
     def analizar_meta_ahorro(
         monto_objetivo: float,
         monto_inicial: float,
         tasa_anual: float,
         aporte_mensual: float,
+        tasa_impuesto: float = 0,
+        inflacion_anual: float = 0,
     ) -> Dict[str, Any]:
         """
         Calcula cuánto tiempo se necesita para alcanzar una meta de ahorro
@@ -268,46 +489,133 @@ class ServicioAhorroInversion:
             monto_inicial: Monto inicial de ahorro
             tasa_anual: Tasa de rendimiento anual
             aporte_mensual: Aporte mensual
+            tasa_impuesto: Tasa de impuesto sobre intereses (%)
+            inflacion_anual: Inflación anual (%); la meta pasa a ser en poder adquisitivo
 
         Returns:
             Dict con análisis de tiempo necesario
         """
-        if monto_inicial > monto_objetivo:
-            return {
-                "meta_alcanzada": True,
-                "meses_necesarios": 0,
-                "anos_necesarios": 0,
-                "mensaje": "Ya tienes el monto objetivo",
-            }
+        return ServicioAhorroInversion.analizar_metas_lote(
+            [
+                {
+                    "monto_objetivo": monto_objetivo,
+                    "monto_inicial": monto_inicial,
+                    "tasa_anual": tasa_anual,
+                    "aporte_mensual": aporte_mensual,
+                    "tasa_impuesto": tasa_impuesto,
+                    "inflacion_anual": inflacion_anual,
+                }
+            ]
+        )["metas"][0]
 
-        tasa_mensual = (tasa_anual / 100) / 12
-        saldo = monto_inicial
-        meses = 0
-        max_meses = 1200  # 100 años
-
-        while saldo < monto_objetivo and meses < max_meses:
-            meses += 1
-            saldo += aporte_mensual
-            saldo = saldo * (1 + tasa_mensual)
-
-        if meses >= max_meses:
-            return {
-                "meta_alcanzable": False,
-                "mensaje": "La meta no es alcanzable con los parámetros especificados en 100 años",
+    @staticmethod
+    def analizar_metas_lote(
+        metas: List[Dict[str, Any]], valores_comunes: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        """
+        Resuelve muchas metas de ahorro a la vez
+
+        Args:
+            metas: Lista de dicts con monto_objetivo, monto_inicial, tasa_anual,
+                aporte_mensual y opcionalmente tasa_impuesto e inflacion_anual
+            valores_comunes: Valores por defecto para los campos que una meta omite
+
+        Returns:
+            Dict con el análisis de cada meta (mismo formato que analizar_meta_ahorro)
+        """
+        if not metas:
+            raise ValueError("Se requiere al menos una meta")
+        if len(metas) > ServicioAhorroInversion.MAX_METAS_LOTE:
+            raise ValueError(f"Máximo {ServicioAhorroInversion.MAX_METAS_LOTE} metas por solicitud")
+
+        campos = ("monto_objetivo", "monto_inicial", "tasa_anual", "aporte_mensual")
+        opcionales = {"tasa_impuesto": 0, "inflacion_anual": 0}
+        columnas = {campo: [] for campo in campos + tuple(opcionales)}
+        for i, meta in enumerate(metas):
+            meta = {**opcionales, **(valores_comunes or {}), **meta}
+            faltantes = [campo for campo in campos if meta.get(campo) is None]
+            if faltantes:
+                raise ValueError(f"Meta {i}: faltan parámetros requeridos: {', '.join(faltantes)}")
+            ServicioAhorroInversion.validar_parametros_ahorro(
+                meta["monto_inicial"], meta["aporte_mensual"], meta["tasa_anual"], 1
+            )
+            if not 0 <= meta["tasa_impuesto"] <= 100:
+                raise ValueError("La tasa de impuesto debe estar entre 0 y 100%")
+            if meta["inflacion_anual"] <= -1200:
+                raise ValueError("La inflación anual es inválida")
+            for campo in columnas:
+                columnas[campo].append(float(meta[campo]))
+
+        arrays = {campo: np.array(valores) for campo, valores in columnas.items()}
+        objetivo = arrays["monto_objetivo"]
+        inicial = arrays["monto_inicial"]
+        aporte = arrays["aporte_mensual"]
+        impuesto = arrays["tasa_impuesto"]
+        inflacion = arrays["inflacion_anual"]
+        tasa_bruta = arrays["tasa_anual"] / 1200
+        tasa = tasa_bruta * (1 - impuesto / 100)
+
+        meses = ServicioAhorroInversion.resolver_meses_meta(
+            objetivo, inicial, arrays["tasa_anual"], aporte, impuesto, inflacion
+        )
+        n = np.where(np.isfinite(meses), meses, 0.0)
+        saldo = ServicioAhorroInversion._saldo_con_aportes(inicial, aporte, tasa, n)
+        interes_neto = saldo - inicial - aporte * n
+        # Interés bruto = neto / (1 - t); sin tasa la división no aplica
+        with np.errstate(divide="ignore", invalid="ignore"):
+            impuestos = np.where(tasa != 0, interes_neto * tasa_bruta / tasa, 0.0) - interes_neto
+        poder_adquisitivo = saldo / (1 + inflacion / 1200) ** n
+
+        # Columnas redondeadas de una vez (round sobre escalares NumPy es lento)
+        def columna(valores):
+            return np.round(valores, 2).tolist()
+
+        alcanzables = np.isfinite(meses).tolist()
+        meses_enteros = n.astype(int).tolist()
+        anos = np.round(n / 12, 1).tolist()
+        saldos, objetivos = columna(saldo), columna(objetivo)
+        diferencias = columna(np.where(inflacion != 0, poder_adquisitivo, saldo) - objetivo)
+        aportes, intereses = columna(aporte * n), columna(interes_neto)
+        impuestos, reales = columna(impuestos), columna(poder_adquisitivo)
+
+        resultados = []
+        for i in range(len(metas)):
+            if inicial[i] > objetivo[i]:
+                resultados.append(
+                    {
+                        "meta_alcanzada": True,
+                        "meses_necesarios": 0,
+                        "anos_necesarios": 0,
+                        "mensaje": "Ya tienes el monto objetivo",
+                    }
+                )
+                continue
+            if not alcanzables[i]:
+                resultados.append(
+                    {
+                        "meta_alcanzable": False,
+                        "mensaje": "La meta no es alcanzable con los parámetros especificados en 100 años",
+                    }
+                )
+                continue
+
+            resultado = {
+                "meta_alcanzada": True,
+                "meses_necesarios": meses_enteros[i],
+                "anos_necesarios": anos[i],
+                "saldo_final": saldos[i],
+                "saldo_objetivo": objetivos[i],
+                "diferencia": diferencias[i],
+                "aporte_total": aportes[i],
+                "interes_ganado": intereses[i],
             }
+            if impuesto[i]:
+                resultado["impuestos_pagados"] = impuestos[i]
+            if inflacion[i]:
+                resultado["saldo_poder_adquisitivo"] = reales[i]
+            resultados.append(resultado)
 
-        return {
-            "meta_alcanzada": True,
-            "meses_necesarios": meses,
-            "anos_necesarios": round(meses / 12, 1),
-            "saldo_final": round(saldo, 2),
-            "saldo_objetivo": round(monto_objetivo, 2),
-            "diferencia": round(saldo - monto_objetivo, 2),
-            "aporte_total": round(aporte_mensual * meses, 2),
-            "interes_ganado": round(
-                saldo - monto_inicial - (aporte_mensual * meses), 2
-            ),
-        }
+        return {"metas": resultados, "n_metas": len(resultados)}
 
     @staticmethod
     def analizar_sensibilidad_ahorro(
@@ -330,12 +638,10 @@ class ServicioAhorroInversion:
         Returns:
             Dict con escenarios de sensibilidad
         """
-        resultado_base = ServicioAhorroInversion.calcular_ahorro_con_aportes(
+        ServicioAhorroInversion.validar_parametros_ahorro(
             monto_inicial, aporte_mensual, tasa_anual, meses
         )
-        saldo_base = resultado_base["resumen"]["saldo_final"]
 
-        escenarios = []
         tasas_analiticas = [
             tasa_anual - variacion_tasa * 2,
             tasa_anual - variacion_tasa,
@@ -343,30 +649,31 @@ class ServicioAhorroInversion:
             tasa_anual + variacion_tasa,
             tasa_anual + variacion_tasa * 2,
         ]
+        tasas_analiticas = [tasa for tasa in tasas_analiticas if tasa >= -100]
 
-        for tasa in tasas_analiticas:
-            if tasa < -100:
-                continue
-
-            try:
-                resultado = ServicioAhorroInversion.calcular_ahorro_con_aportes(
-                    monto_inicial, aporte_mensual, tasa, meses
-                )
-                saldo = resultado["resumen"]["saldo_final"]
-                variacion = ((saldo - saldo_base) / saldo_base) * 100
+        # Base y escenarios en una sola matriz tasas × meses
+        proyeccion = ServicioAhorroInversion.proyectar_ahorro(
+            monto_inicial, aporte_mensual, [tasa_anual] + tasas_analiticas, meses
+        )
+        saldos = np.round(proyeccion["saldo"][:, -1], 2).tolist()
+        saldo_base = saldos[0]
 
-                escenarios.append(
-                    {
-                        "tasa": round(tasa, 2),
-                        "saldo_final": round(saldo, 2),
-                        "variacion_porcentaje": round(variacion, 2),
-                        "escenario": "Base"
-                        if tasa == tasa_anual
-                        else ("Pesimista" if tasa < tasa_anual else "Optimista"),
-                    }
-                )
-            except:
+        escenarios = []
+        for tasa, saldo in zip(tasas_analiticas, saldos[1:]):
+            if saldo_base == 0:
                 continue
+            variacion = ((saldo - saldo_base) / saldo_base) * 100
+
+            escenarios.append(
+                {
+                    "tasa": round(tasa, 2),
+                    "saldo_final": round(saldo, 2),
+                    "variacion_porcentaje": round(variacion, 2),
+                    "escenario": "Base"
+                    if tasa == tasa_anual
+                    else ("Pesimista" if tasa < tasa_anual else "Optimista"),
+                }
+            )
 
         return {
             "tasa_actual": round(tasa_anual, 2),
@@ -395,3 +702,209 @@ class ServicioAhorroInversion:
                 2,
             ),
         }
+
+    @staticmethod
+    def _sortear_rendimientos(
+        rng: np.random.Generator,
+        modelo: str,
+        meses: int,
+        n_simulaciones: int,
+        media_mensual: float,
+        volatilidad_mensual: float,
+        serie: Optional[np.ndarray],
+    ) -> np.ndarray:
+        """Rendimientos mensuales (fracción) de un bloque, en forma meses × escenarios"""
+        if modelo == "bootstrap":
+            return serie[rng.integers(len(serie), size=(meses, n_simulaciones))]
+        normales = rng.standard_normal((meses, n_simulaciones))
+        if modelo == "lognormal":
+            # log(1 + r) normal con la misma media y varianza de 1 + r
+            s2 = np.log1p(volatilidad_mensual ** 2 / (1 + media_mensual) ** 2)
+            normales *= np.sqrt(s2)
+            normales += np.log1p(media_mensual) - s2 / 2
+            return np.expm1(normales)
+        normales *= volatilidad_mensual
+        normales += media_mensual
+        # El modelo normal no puede perder más que el saldo en un mes
+        return np.maximum(normales, -0.99, out=normales)
+
+    @staticmethod
+    def simular_ahorro_monte_carlo(
+        monto_inicial: float,
+        aporte_mensual: float,
+        tasa_anual: float,
+        meses: int,
+        volatilidad_anual: float = 15.0,
+        modelo: str = "normal",
+        serie_rendimientos: Optional[List[float]] = None,
+        inflacion_anual: float = 0,
+        volatilidad_inflacion: float = 0,
+        tasa_impuesto: float = 0,
+        monto_objetivo: Optional[float] = None,
+        n_simulaciones: int = 10000,
+        resolucion: str = "anual",
+        semilla: int = 42,
+    ) -> Dict[str, Any]:
+        """
+        Simulación Monte Carlo del ahorro con rendimientos e inflación aleatorios
+
+        Cada escenario sortea un rendimiento mensual ('normal' o 'lognormal'
+        con la media y volatilidad anuales dadas, o 'bootstrap' remuestreando
+        serie_rendimientos) y una inflación mensual normal. Los meses se
+        recorren en bloques meses × escenarios acotados por
+        MEMORIA_MAX_BLOQUE; dentro de cada bloque
+            S_k = P_k · (S_0 + A · Σ_(j≤k) 1 / P_(j-1)),  P_k = Π_(i≤k) g_i
+        de modo que entre bloques solo se conserva el saldo de cada escenario
+        y los percentiles de los meses reportados. Rendimientos e inflación
+        usan flujos aleatorios propios, así que el resultado depende de la
+        semilla y no del tamaño de bloque.
+
+        Args:
+            monto_inicial: Monto inicial
+            aporte_mensual: Aporte al inicio de cada mes
+            tasa_anual: Rendimiento anual esperado (%) (no se usa en 'bootstrap')
+            meses: Horizonte en meses
+            volatilidad_anual: Volatilidad anual del rendimiento (%)
+            modelo: 'normal', 'lognormal' o 'bootstrap'
+            serie_rendimientos: Rendimientos mensuales históricos (%) para 'bootstrap'
+            inflacion_anual: Inflación anual esperada (%)
+            volatilidad_inflacion: Volatilidad anual de la inflación (%)
+            tasa_impuesto: Impuesto sobre intereses (%)
+            monto_objetivo: Meta de ahorro (opcional)
+            n_simulaciones: Número de escenarios
+            resolucion: Meses reportados: 'mensual', 'trimestral' o 'anual'
+            semilla: Semilla de la simulación
+
+        Returns:
+            Dict con resumen del saldo final, bandas de percentiles por mes
+            reportado (abanico) y probabilidad de alcanzar monto_objetivo
+        """
+        ServicioAhorroInversion._validar_ahorro(
+            monto_inicial, aporte_mensual, 0 if modelo == "bootstrap" else tasa_anual, meses, tasa_impuesto
+        )
+        if modelo not in ServicioAhorroInversion.MODELOS_MONTE_CARLO:
+            raise ValueError(
+                f"Modelo no válido: {modelo}. Opciones: {list(ServicioAhorroInversion.MODELOS_MONTE_CARLO)}"
+            )
+        if resolucion not in ServicioAhorroInversion.RESOLUCIONES:
+            raise ValueError(
+                f"Resolución no válida: {resolucion}. Opciones: {list(ServicioAhorroInversion.RESOLUCIONES)}"
+            )
+        if not 1 <= n_simulaciones <= ServicioAhorroInversion.MAX_SIMULACIONES_AHORRO:
+            raise ValueError(
+                f"n_simulaciones debe estar entre 1 y {ServicioAhorroInversion.MAX_SIMULACIONES_AHORRO}"
+            )
+        if not 0 <= volatilidad_anual <= 100 or not 0 <= volatilidad_inflacion <= 100:
+            raise ValueError("Las volatilidades deben estar entre 0 y 100%")
+        if monto_objetivo is not None and monto_objetivo <= 0:
+            raise ValueError("El monto objetivo debe ser mayor a 0")
+
+        serie = None
+        if modelo == "bootstrap":
+            if not serie_rendimientos:
+                raise ValueError("El modelo 'bootstrap' requiere serie_rendimientos")
+            serie = np.asarray(serie_rendimientos, dtype=np.float64) / 100
+            if serie.ndim != 1 or not np.all(np.isfinite(serie)) or np.any(serie <= -1):
+                raise ValueError("serie_rendimientos debe ser una lista de rendimientos mensuales mayores a -100%")
+
+        media = tasa_anual / 1200
+        volatilidad = volatilidad_anual / 100 / np.sqrt(12)
+        inflacion_media = inflacion_anual / 1200
+        inflacion_volatilidad = volatilidad_inflacion / 100 / np.sqrt(12)
+        factor_neto = 1 - tasa_impuesto / 100
+
+        mes = np.arange(1, int(meses) + 1)
+        paso = ServicioAhorroInversion.RESOLUCIONES[resolucion]
+        reportados = (mes % paso == 0) | (mes == 1) | (mes == meses)
+        niveles = ServicioAhorroInversion.PERCENTILES_ABANICO
+        bandas = np.empty((len(niveles), int(reportados.sum())))
+        bandas_reales = np.empty_like(bandas)
+        probabilidad = np.empty(bandas.shape[1])
+
+        # ~6 matrices meses × escenarios vivas por bloque
+        meses_bloque = max(
+            1,
+            min(
+                ServicioAhorroInversion.MAX_MESES_BLOQUE,
+                ServicioAhorroInversion.MEMORIA_MAX_BLOQUE // (6 * 8 * n_simulaciones),
+            ),
+        )
+        rng_rendimiento, rng_inflacion = (
+            np.random.default_rng(s) for s in np.random.SeedSequence(semilla).spawn(2)
+        )
+        saldo = np.full(n_simulaciones, float(monto_inicial))
+        deflactor = np.ones(n_simulaciones)
+        columna = 0
+
+        for inicio in range(0, int(meses), meses_bloque):
+            bloque = min(meses_bloque, int(meses) - inicio)
+            rendimientos = ServicioAhorroInversion._sortear_rendimientos(
+                rng_rendimiento, modelo, bloque, n_simulaciones, media, volatilidad, serie
+            )
+            crecimiento = np.cumprod(1 + rendimientos * factor_neto, axis=0)
+            inversos = np.empty_like(crecimiento)
+            inversos[0] = 1
+            np.divide(1, crecimiento[:-1], out=inversos[1:])
+            saldos = crecimiento * (saldo + aporte_mensual * np.cumsum(inversos, axis=0))
+
+            if inflacion_volatilidad > 0:
+                inflacion = rng_inflacion.standard_normal((bloque, n_simulaciones))
+                inflacion *= inflacion_volatilidad
+                inflacion += 1 + inflacion_media
+                deflactores = deflactor * np.cumprod(inflacion, axis=0)
+            else:
+                deflactores = np.outer((1 + inflacion_media) ** np.arange(1, bloque + 1), deflactor)
+
+            seleccion = reportados[inicio:inicio + bloque]
+            if seleccion.any():
+                fin = columna + int(seleccion.sum())
+                saldos_reportados = saldos[seleccion]
+                bandas[:, columna:fin] = np.percentile(saldos_reportados, niveles, axis=1)
+                bandas_reales[:, columna:fin] = np.percentile(
+                    saldos_reportados / deflactores[seleccion], niveles, axis=1
+                )
+                if monto_objetivo is not None:
+                    probabilidad[columna:fin] = (saldos_reportados >= monto_objetivo).mean(axis=1)
+                columna = fin
+
+            saldo, deflactor = saldos[-1], deflactores[-1]
+
+        saldo_real = saldo / deflactor
+        finales = np.percentile(saldo, [5, 50, 95])
+        etiquetas = [f"p{nivel}" for nivel in niveles]
+        abanico = {
+            "mes": mes[reportados].tolist(),
+            "percentiles": list(niveles),
+            "saldo": dict(zip(etiquetas, np.round(bandas, 2).tolist())),
+            "saldo_poder_adquisitivo": dict(zip(etiquetas, np.round(bandas_reales, 2).tolist())),
+        }
+        resumen = {
+            "saldo_final_medio": round(float(saldo.mean()), 2),
+            "saldo_final_mediana": round(float(finales[1]), 2),
+            "saldo_final_p5": round(float(finales[0]), 2),
+            "saldo_final_p95": round(float(finales[2]), 2),
+            "saldo_real_mediana": round(float(np.median(saldo_real)), 2),
+            "capital_aportado": round(monto_inicial + aporte_mensual * meses, 2),
+            "probabilidad_perdida": round(float(np.mean(saldo < monto_inicial + aporte_mensual * meses)), 4),
+        }
+        if monto_objetivo is not None:
+            abanico["probabilidad_meta"] = np.round(probabilidad, 4).tolist()
+            resumen["monto_objetivo"] = round(monto_objetivo, 2)
+            resumen["probabilidad_meta"] = round(float(np.mean(saldo >= monto_objetivo)), 4)
+            resumen["probabilidad_meta_real"] = round(float(np.mean(saldo_real >= monto_objetivo)), 4)
+
+        return {
+            "parametros": {
+                "modelo": modelo,
+                "tasa_anual": None if modelo == "bootstrap" else round(tasa_anual, 2),
+                "volatilidad_anual": None if modelo == "bootstrap" else round(volatilidad_anual, 2),
+                "inflacion_anual": round(inflacion_anual, 2),
+                "volatilidad_inflacion": round(volatilidad_inflacion, 2),
+                "tasa_impuesto": round(tasa_impuesto, 2),
+                "periodo_meses": meses,
+                "n_simulaciones": n_simulaciones,
+                "semilla": semilla,
+            },
+            "resumen": resumen,
+            "abanico": abanico,
+        }
@@ -0,0 +1,373 @@
+"""
+Inferencia de ensambles de árboles con NumPy
+
+Convierte los modelos entrenados en entrenar_modelos.py (RandomForest y
+GradientBoosting de sklearn, XGBoost) a un conjunto de arrays planos con
+todos los nodos de todos los árboles, y los evalúa recorriendo a la vez
+todas las filas y todos los árboles: un paso por nivel de profundidad, sin
+llamadas al booster ni al pool de hilos de sklearn.
+
+En pocas filas (el caso de /predecir/*) evita el coste fijo por llamada de
+sklearn/XGBoost (decenas de veces más rápido). En lotes grandes el código
+compilado del modelo original recorre los árboles más rápido que NumPy, así
+que por encima de max_filas se delega en él. Las predicciones coinciden con
+las del modelo original (mismas comparaciones en float32, mismas hojas, NaN
+por la rama de faltantes de cada nodo) salvo el orden de la suma de las
+hojas; al compilar se comprueba contra el modelo original sobre un lote de
+sonda y, si difieren, la conversión falla.
+"""
+import json
+import numpy as np
+from typing import Any, Dict, List, Optional
+
+
+class EnsambleCompilado:
+    """
+    Ensamble de árboles en arrays planos, con la interfaz predict /
+    predict_proba del modelo original.
+    """
+
+    TAMANO_BLOQUE = 4096  # filas evaluadas a la vez (acota la matriz filas × árboles)
+    # Tolerancia frente al modelo original (orden de la suma y salidas en float32)
+    TOLERANCIA_RELATIVA = 1e-4
+    TOLERANCIA_ABSOLUTA = 1e-5
+
+    def __init__(self, arboles: List[Dict[str, np.ndarray]], agregacion: str,
+                 n_caracteristicas: int, base=0.0, escala: float = 1.0,
+                 clases: Optional[np.ndarray] = None, estricta: bool = False,
+                 origen: str = '', respaldo=None, max_filas: int = 64):
+        """
+        Args:
+            arboles: Por árbol, arrays 'izquierda', 'derecha' (-1 en hojas),
+                'caracteristica', 'umbral' y 'valor' (n_nodos × n_salidas);
+                opcionalmente 'faltante', el hijo al que va un NaN (por
+                defecto el izquierdo)
+            agregacion: 'media' (bosques), 'suma' (boosting de regresión),
+                'softmax' o 'logistica' (boosting de clasificación)
+            n_caracteristicas: Columnas esperadas en X
+            base: Valor inicial del boosting (en escala del margen), común o
+                uno por salida
+            escala: Factor de cada árbol (learning_rate en sklearn)
+            clases: Etiquetas de clase (clasificadores)
+            estricta: True si la rama izquierda es x < umbral (XGBoost),
+                False si es x <= umbral (sklearn)
+            origen: Nombre de la clase del modelo convertido
+            respaldo: Modelo original, usado en lotes de más de max_filas filas
+            max_filas: Filas a partir de las cuales se usa el respaldo
+        """
+        self.agregacion = agregacion
+        self.n_features_in_ = n_caracteristicas
+        self.base = base
+        self.escala = escala
+        self.classes_ = clases
+        self.estricta = estricta
+        self.origen = origen
+        self.respaldo = respaldo
+        self.max_filas = max_filas
+        self.acepta_faltantes = True
+        self.n_arboles = len(arboles)
+
+        tamanos = [len(a['caracteristica']) for a in arboles]
+        desplazamientos = np.concatenate([[0], np.cumsum(tamanos)[:-1]]).astype(np.intp)
+        self.raices = desplazamientos
+
+        # Las hojas apuntan a sí mismas: recorrer de más no cambia el resultado
+        hijos, caracteristicas, umbrales, valores = [], [], [], []
+        for arbol, desplazamiento in zip(arboles, desplazamientos):
+            indices = np.arange(len(arbol['caracteristica']), dtype=np.intp) + desplazamiento
+            hoja = arbol['izquierda'] < 0
+            izquierda = np.where(hoja, indices, arbol['izquierda'] + desplazamiento)
+            derecha = np.where(hoja, indices, arbol['derecha'] + desplazamiento)
+            faltante = np.where(hoja, indices, arbol.get('faltante', arbol['izquierda']) + desplazamiento)
+            hijos.append(np.column_stack([izquierda, derecha, faltante]))
+            caracteristicas.append(np.where(hoja, 0, arbol['caracteristica']))
+            umbrales.append(np.where(hoja, 0.0, arbol['umbral']))
+            valores.append(arbol['valor'])
+        self.hijos = np.concatenate(hijos).astype(np.intp)
+        self.caracteristica = np.concatenate(caracteristicas).astype(np.intp)
+        self.umbral = np.concatenate(umbrales).astype(np.float64)
+        self.valor = np.concatenate(valores).astype(np.float64)
+        self.profundidad = max(_profundidad(a['izquierda'], a['derecha']) for a in arboles)
+
+    @property
+    def n_nodos(self) -> int:
+        return len(self.caracteristica)
+
+    @property
+    def tamano_bytes(self) -> int:
+        return sum(a.nbytes for a in (self.hijos, self.caracteristica, self.umbral, self.valor, self.raices))
+
+    def _sumar_hojas(self, X: np.ndarray) -> np.ndarray:
+        """Suma, por fila, los valores de la hoja alcanzada en cada árbol (n × n_salidas)."""
+        # Los árboles comparan en float32, como sklearn y XGBoost
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim != 2 or X.shape[1] != self.n_features_in_:
+            raise ValueError(f"Se esperaban {self.n_features_in_} características, llegaron {X.shape}")
+
+        faltantes = np.isnan(X).any()
+        if faltantes and not self.acepta_faltantes:
+            raise ValueError(f"{self.origen} no admite valores faltantes (NaN)")
+
+        suma = np.empty((len(X), self.valor.shape[1]), dtype=np.float64)
+        for inicio in range(0, len(X), self.TAMANO_BLOQUE):
+            bloque = X[inicio:inicio + self.TAMANO_BLOQUE]
+            filas = np.arange(len(bloque))[:, None]
+            nodos = np.broadcast_to(self.raices, (len(bloque), self.n_arboles))
+            for _ in range(self.profundidad):
+                x = bloque[filas, self.caracteristica[nodos]]
+                a_derecha = x >= self.umbral[nodos] if self.estricta else x > self.umbral[nodos]
+                rama = a_derecha.view(np.int8)
+                if faltantes:
+                    rama = np.where(np.isnan(x), 2, rama)
+                nodos = self.hijos[nodos, rama]
+            suma[inicio:inicio + len(bloque)] = self.valor[nodos].sum(axis=1)
+        return suma
+
+    def _salida(self, X: np.ndarray) -> np.ndarray:
+        """Predicción de regresión (n) o probabilidades de clase (n × k)."""
+        suma = self._sumar_hojas(X)
+        if self.agregacion == 'media':
+            return suma / self.n_arboles
+        margen = self.base + self.escala * suma
+        if self.agregacion == 'suma':
+            return margen
+        if self.agregacion == 'logistica':
+            p = 1.0 / (1.0 + np.exp(-margen[:, 0]))
+            return np.column_stack([1.0 - p, p])
+        margen -= margen.max(axis=1, keepdims=True)
+        exp = np.exp(margen)
+        return exp / exp.sum(axis=1, keepdims=True)
+
+    def _usar_respaldo(self, X) -> bool:
+        return self.respaldo is not None and len(X) > self.max_filas
+
+    def predict(self, X) -> np.ndarray:
+        if self._usar_respaldo(X):
+            return self.respaldo.predict(X)
+        salida = self._salida(X)
+        if self.classes_ is None:
+            return salida[:, 0]
+        return self.classes_[np.argmax(salida, axis=1)]
+
+    def predict_proba(self, X) -> np.ndarray:
+        if self.classes_ is None:
+            raise AttributeError("predict_proba solo está disponible en clasificadores")
+        if self._usar_respaldo(X):
+            return self.respaldo.predict_proba(X)
+        return self._salida(X)
+
+    def lote_sonda(self, n_filas: int = 64, con_faltantes: bool = False, semilla: int = 0) -> np.ndarray:
+        """
+        Filas de prueba sobre los umbrales de los árboles: cada valor cae en
+        un umbral o justo a un lado, lo que distingue x < u de x <= u; con
+        con_faltantes, una de cada cinco celdas es NaN.
+        """
+        rng = np.random.default_rng(semilla)
+        internos = self.hijos[:, 0] != np.arange(self.n_nodos)
+        # sklearn usa umbral infinito en los cortes "faltante o no"
+        internos &= np.abs(self.umbral) < np.finfo(np.float32).max
+        X = np.zeros((n_filas, self.n_features_in_), dtype=np.float32)
+        for j in np.unique(self.caracteristica[internos]):
+            umbrales = rng.choice(self.umbral[internos & (self.caracteristica == j)], n_filas).astype(np.float32)
+            lado = rng.integers(-1, 2, n_filas)
+            X[:, j] = np.where(lado < 0, np.nextafter(umbrales, np.float32(-np.inf)),
+                               np.where(lado > 0, np.nextafter(umbrales, np.float32(np.inf)), umbrales))
+        X = np.nan_to_num(X, posinf=np.finfo(np.float32).max, neginf=-np.finfo(np.float32).max)
+        if con_faltantes:
+            X[rng.random(X.shape) < 0.2] = np.nan
+        return X
+
+    def describir(self) -> Dict[str, Any]:
+        return {
+            'origen': self.origen,
+            'arboles': self.n_arboles,
+            'nodos': self.n_nodos,
+            'profundidad': self.profundidad,
+            'max_filas': self.max_filas if self.respaldo is not None else None,
+            'tamano_kb': round(self.tamano_bytes / 1024, 1)
+        }
+
+
+def _profundidad(izquierda: np.ndarray, derecha: np.ndarray) -> int:
+    """Profundidad máxima de un árbol (número de decisiones hasta la hoja más honda)."""
+    profundidad = np.zeros(len(izquierda), dtype=np.intp)
+    for nodo in range(len(izquierda)):  # los hijos siempre tienen índice mayor que el padre
+        if izquierda[nodo] >= 0:
+            profundidad[izquierda[nodo]] = profundidad[derecha[nodo]] = profundidad[nodo] + 1
+    return int(profundidad.max())
+
+
+def _arbol_sklearn(arbol, normalizar: bool = False) -> Dict[str, np.ndarray]:
+    valor = arbol.value[:, 0, :].astype(np.float64)
+    if normalizar:
+        valor = valor / valor.sum(axis=1, keepdims=True)
+    convertido = {
+        'izquierda': arbol.children_left,
+        'derecha': arbol.children_right,
+        'caracteristica': arbol.feature,
+        'umbral': arbol.threshold,
+        'valor': valor
+    }
+    # sklearn >= 1.3 guarda por nodo a qué hijo van los NaN
+    if hasattr(arbol, 'missing_go_to_left'):
+        convertido['faltante'] = np.where(arbol.missing_go_to_left, arbol.children_left, arbol.children_right)
+    return convertido
+
+
+def _arboles_xgboost(booster, n_clases: int, n_paralelos: int = 1) -> List[Dict[str, np.ndarray]]:
+    """
+    Convierte el volcado JSON de un booster (un dict de nodos anidados por árbol).
+
+    Cada ronda tiene n_paralelos árboles por clase, en orden de clase: el
+    árbol i suma a la clase (i // n_paralelos) % n_clases.
+    """
+    nombres = list(booster.feature_names or [])
+    arboles = []
+    for i, volcado in enumerate(booster.get_dump(dump_format='json')):
+        nodos = []
+        pendientes = [json.loads(volcado)]
+        while pendientes:  # preorden: el índice de cada hijo es mayor que el del padre
+            nodos.append(pendientes.pop())
+            pendientes.extend(reversed(nodos[-1].get('children', [])))
+        posicion = {nodo['nodeid']: j for j, nodo in enumerate(nodos)}
+
+        arbol = {
+            'izquierda': np.full(len(nodos), -1, dtype=np.intp),
+            'derecha': np.full(len(nodos), -1, dtype=np.intp),
+            'caracteristica': np.zeros(len(nodos), dtype=np.intp),
+            'umbral': np.zeros(len(nodos), dtype=np.float64),
+            'valor': np.zeros((len(nodos), n_clases), dtype=np.float64),
+            'faltante': np.full(len(nodos), -1, dtype=np.intp)
+        }
+        for j, nodo in enumerate(nodos):
+            if 'leaf' in nodo:
+                arbol['valor'][j, (i // n_paralelos) % n_clases] = nodo['leaf']
+                continue
+            division = nodo['split']
+            arbol['caracteristica'][j] = nombres.index(division) if division in nombres else int(division.lstrip('f'))
+            arbol['umbral'][j] = np.float32(nodo['split_condition'])
+            arbol['izquierda'][j] = posicion[nodo['yes']]
+            arbol['derecha'][j] = posicion[nodo['no']]
+            arbol['faltante'][j] = posicion[nodo.get('missing', nodo['yes'])]
+        arboles.append(arbol)
+    return arboles
+
+
+def _compilar_xgboost(modelo) -> EnsambleCompilado:
+    booster = modelo.get_booster()
+    parametros = json.loads(booster.save_config())['learner']
+    objetivo = parametros['objective']['name']
+    # base_score puede venir como "5E-1" o "[5E-1]", o uno por clase "[a,b,c]", según la versión
+    base = np.array([float(v) for v in str(parametros['learner_model_param']['base_score']).strip('[]').split(',')])
+    gbtree = parametros.get('gradient_booster', {'name': 'gbtree'})
+    if gbtree['name'] != 'gbtree':
+        raise ValueError(f"Booster de XGBoost no soportado: {gbtree['name']}")
+    n_paralelos = int(gbtree.get('gbtree_model_param', {}).get('num_parallel_tree', 1))
+    n_caracteristicas = booster.num_features()
+    origen = type(modelo).__name__
+
+    if objetivo in ('multi:softprob', 'multi:softmax'):
+        n_clases = int(parametros['learner_model_param']['num_class'])
+        return EnsambleCompilado(_arboles_xgboost(booster, n_clases, n_paralelos), 'softmax', n_caracteristicas,
+                                 base=base, clases=np.arange(n_clases), estricta=True, origen=origen)
+    if objetivo == 'binary:logistic':
+        return EnsambleCompilado(_arboles_xgboost(booster, 1, n_paralelos), 'logistica', n_caracteristicas,
+                                 base=np.log(base / (1 - base)), clases=np.arange(2),
+                                 estricta=True, origen=origen)
+    if objetivo == 'reg:squarederror':
+        return EnsambleCompilado(_arboles_xgboost(booster, 1, n_paralelos), 'suma', n_caracteristicas,
+                                 base=base, estricta=True, origen=origen)
+    raise ValueError(f"Objetivo de XGBoost no soportado: {objetivo}")
+
+
+def compilar_modelo(modelo, max_filas: Optional[int] = None) -> EnsambleCompilado:
+    """
+    Convierte un ensamble entrenado a EnsambleCompilado.
+
+    Soporta RandomForest / ExtraTrees (regresión y clasificación),
+    GradientBoostingRegressor y XGBoost (regresión, binario y multiclase).
+    Si el modelo original puede predecir, el resultado se compara con él
+    sobre un lote de sonda (ver _verificar).
+
+    Args:
+        modelo: Ensamble entrenado
+        max_filas: Si se indica, los lotes mayores se delegan en el modelo
+            original (None: siempre NumPy)
+
+    Raises:
+        ValueError: Si el tipo de modelo no es convertible o la conversión
+            no reproduce sus predicciones
+    """
+    if isinstance(modelo, EnsambleCompilado):
+        return modelo
+    compilado = _compilar(modelo)
+    if hasattr(modelo, 'predict'):
+        _verificar(compilado, modelo)
+    if max_filas is not None:
+        compilado.respaldo = modelo
+        compilado.max_filas = max_filas
+    return compilado
+
+
+def _verificar(compilado: EnsambleCompilado, modelo):
+    """
+    Compara el ensamble con el modelo original (predict_proba o predict) en
+    un lote de sonda sin NaN y otro con NaN. Si el original rechaza los NaN,
+    el ensamble también los rechazará.
+
+    Raises:
+        ValueError: Si alguna predicción difiere más que la tolerancia
+    """
+    clasificador = compilado.classes_ is not None
+    for con_faltantes in (False, True):
+        X = compilado.lote_sonda(con_faltantes=con_faltantes)
+        try:
+            esperadas = modelo.predict_proba(X) if clasificador else modelo.predict(X)
+        except ValueError:
+            if not con_faltantes:
+                raise
+            compilado.acepta_faltantes = False
+            continue
+        obtenidas = compilado._salida(X)
+        if not clasificador:
+            obtenidas = obtenidas[:, 0]
+        esperadas = np.asarray(esperadas, dtype=np.float64).reshape(obtenidas.shape)
+        if not np.allclose(obtenidas, esperadas, rtol=compilado.TOLERANCIA_RELATIVA,
+                           atol=compilado.TOLERANCIA_ABSOLUTA):
+            diferencia = float(np.max(np.abs(obtenidas - esperadas)))
+            raise ValueError(
+                f"La conversión de {compilado.origen} no reproduce sus predicciones "
+                f"({'con' if con_faltantes else 'sin'} NaN, diferencia máxima {diferencia:.3g})"
+            )
+
+
+def _compilar(modelo) -> EnsambleCompilado:
+    if hasattr(modelo, 'get_booster'):
+        return _compilar_xgboost(modelo)
+
+    origen = type(modelo).__name__
+    estimadores = getattr(modelo, 'estimators_', None)
+    if estimadores is None:
+        raise ValueError(f"Modelo no convertible: {origen}")
+
+    if origen == 'GradientBoostingRegressor':
+        if isinstance(modelo.init_, str) and modelo.init_ == 'zero':
+            base = 0.0
+        elif hasattr(modelo.init_, 'constant_'):
+            base = float(np.ravel(modelo.init_.constant_)[0])
+        else:
+            raise ValueError("GradientBoostingRegressor con estimador inicial no constante")
+        arboles = [_arbol_sklearn(e.tree_) for e in np.ravel(estimadores)]
+        return EnsambleCompilado(arboles, 'suma', modelo.n_features_in_, base=base,
+                                 escala=float(modelo.learning_rate), origen=origen)
+
+    if origen in ('RandomForestRegressor', 'ExtraTreesRegressor'):
+        arboles = [_arbol_sklearn(e.tree_) for e in estimadores]
+        return EnsambleCompilado(arboles, 'media', modelo.n_features_in_, origen=origen)
+
+    if origen in ('RandomForestClassifier', 'ExtraTreesClassifier') and getattr(modelo, 'n_outputs_', 1) == 1:
+        arboles = [_arbol_sklearn(e.tree_, normalizar=True) for e in estimadores]
+        return EnsambleCompilado(arboles, 'media', modelo.n_features_in_,
+                                 clases=np.asarray(modelo.classes_), origen=origen)
+
+    raise ValueError(f"Modelo no convertible: {origen}")
@@ -0,0 +1,88 @@
+"""
+Caché LRU con caducidad (TTL) para resultados de predicción
+
+Guarda hasta `capacidad` entradas; al llenarse descarta la usada hace más
+tiempo y cada entrada caduca `ttl` segundos después de guardarse. Cuenta
+aciertos, fallos, caducadas y desalojos para exponerlos en /ml/estado.
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional
+
+
+class CacheLRUTTL:
+    """
+    Caché LRU + TTL segura entre hilos (un lock corto por operación).
+    """
+
+    def __init__(self, capacidad: int = 4096, ttl: float = 300.0, reloj=time.monotonic):
+        """
+        Args:
+            capacidad: Máximo de entradas (0 deshabilita la caché)
+            ttl: Segundos de vida de cada entrada (0 = sin caducidad)
+            reloj: Función de tiempo (inyectable en pruebas)
+        """
+        self.capacidad = max(int(capacidad), 0)
+        self.ttl = float(ttl)
+        self._reloj = reloj
+        self._entradas = OrderedDict()
+        self._lock = threading.Lock()
+        self.aciertos = 0
+        self.fallos = 0
+        self.caducadas = 0
+        self.desalojos = 0
+
+    @property
+    def habilitada(self) -> bool:
+        return self.capacidad > 0
+
+    def obtener(self, clave: Hashable) -> Optional[Any]:
+        """Valor guardado para la clave, o None si no está o caducó."""
+        if not self.habilitada:
+            return None
+        with self._lock:
+            entrada = self._entradas.get(clave)
+            if entrada is None:
+                self.fallos += 1
+                return None
+            valor, expira = entrada
+            if expira is not None and self._reloj() >= expira:
+                del self._entradas[clave]
+                self.caducadas += 1
+                self.fallos += 1
+                return None
+            self._entradas.move_to_end(clave)
+            self.aciertos += 1
+            return valor
+
+    def guardar(self, clave: Hashable, valor: Any):
+        """Guarda un valor, desalojando la entrada menos reciente si hace falta."""
+        if not self.habilitada:
+            return
+        expira = self._reloj() + self.ttl if self.ttl > 0 else None
+        with self._lock:
+            self._entradas[clave] = (valor, expira)
+            self._entradas.move_to_end(clave)
+            while len(self._entradas) > self.capacidad:
+                self._entradas.popitem(last=False)
+                self.desalojos += 1
+
+    def limpiar(self):
+        """Vacía la caché (p. ej. al cambiar de modelos); conserva los contadores."""
+        with self._lock:
+            self._entradas.clear()
+
+    def estadisticas(self) -> Dict[str, Any]:
+        consultas = self.aciertos + self.fallos
+        return {
+            'habilitada': self.habilitada,
+            'capacidad': self.capacidad,
+            'ttl_segundos': self.ttl,
+            'entradas': len(self._entradas),
+            'aciertos': self.aciertos,
+            'fallos': self.fallos,
+            'caducadas': self.caducadas,
+            'desalojos': self.desalojos,
+            'tasa_aciertos': round(self.aciertos / consultas, 4) if consultas else 0.0
+        }
@@ -0,0 +1,169 @@
+"""
+Estadísticas en streaming para simulaciones Monte Carlo
+
+Permite resumir millones de resultados sin guardarlos: cada fragmento de la
+simulación acumula sus lotes en un EstadisticasStreaming y los fragmentos se
+combinan al final (por ejemplo, al volver de un pool de procesos).
+
+- Media y varianza (AcumuladorWelford): actualización por lotes de Welford /
+  Chan, exacta y numéricamente estable.
+- Cuantiles y CVaR: histograma de bordes fijos con la suma de valores por
+  clase. Dos sketches con los mismos bordes se combinan sumando conteos; los
+  valores fuera de rango caen en clases de desborde acotadas por el mínimo y
+  el máximo exactos.
+"""
+import numpy as np
+from typing import Optional
+
+
+class AcumuladorWelford:
+    """
+    Media y varianza en streaming (Welford por lotes / fórmula de Chan).
+    """
+
+    def __init__(self):
+        self.n = 0
+        self.media = 0.0
+        self.m2 = 0.0
+
+    def _combinar_momentos(self, n: int, media: float, m2: float):
+        if n == 0:
+            return
+        total = self.n + n
+        delta = media - self.media
+        self.m2 += m2 + delta * delta * self.n * n / total
+        self.media += delta * n / total
+        self.n = total
+
+    def agregar(self, valores: np.ndarray) -> 'AcumuladorWelford':
+        """Incorpora un lote de valores."""
+        valores = np.asarray(valores, dtype=np.float64).ravel()
+        if len(valores):
+            media = float(np.mean(valores))
+            self._combinar_momentos(len(valores), media, float(np.sum((valores - media) ** 2)))
+        return self
+
+    def combinar(self, otra: 'AcumuladorWelford') -> 'AcumuladorWelford':
+        """Combina otro acumulador en este."""
+        self._combinar_momentos(otra.n, otra.media, otra.m2)
+        return self
+
+    @property
+    def varianza(self) -> float:
+        """Varianza poblacional (ddof=0, como np.std por defecto)."""
+        return self.m2 / self.n if self.n else float('nan')
+
+    @property
+    def desviacion(self) -> float:
+        return float(np.sqrt(self.varianza))
+
+    def error_estandar(self) -> Optional[float]:
+        """Error estándar de la media (con la varianza muestral, ddof=1)."""
+        return float(np.sqrt(self.m2 / (self.n - 1) / self.n)) if self.n > 1 else None
+
+
+class EstadisticasStreaming(AcumuladorWelford):
+    """
+    Acumulador combinable de media, varianza, extremos y cuantiles.
+    """
+
+    def __init__(self, bordes: np.ndarray):
+        """
+        Args:
+            bordes: Bordes crecientes del histograma (todos los acumuladores
+                que se vayan a combinar deben compartirlos)
+        """
+        super().__init__()
+        self.bordes = np.asarray(bordes, dtype=np.float64)
+        self.minimo = np.inf
+        self.maximo = -np.inf
+        self.n_positivos = 0
+        self.n_negativos = 0
+        # Clase 0: valores < bordes[0]; última clase: valores >= bordes[-1]
+        self.conteos = np.zeros(len(self.bordes) + 1, dtype=np.int64)
+        self.sumas = np.zeros(len(self.bordes) + 1, dtype=np.float64)
+
+    @classmethod
+    def con_rango(cls, minimo: float, maximo: float, n_clases: int = 8192,
+                  holgura: float = 0.5) -> 'EstadisticasStreaming':
+        """Crea un acumulador cuyo histograma cubre [minimo, maximo] con holgura relativa."""
+        ancho = max(maximo - minimo, 1e-9 * max(1.0, abs(minimo), abs(maximo)))
+        return cls(np.linspace(minimo - holgura * ancho, maximo + holgura * ancho, n_clases + 1))
+
+    def agregar(self, valores: np.ndarray) -> 'EstadisticasStreaming':
+        """Incorpora un lote de valores."""
+        valores = np.asarray(valores, dtype=np.float64).ravel()
+        if len(valores) == 0:
+            return self
+
+        super().agregar(valores)
+        self.minimo = min(self.minimo, float(np.min(valores)))
+        self.maximo = max(self.maximo, float(np.max(valores)))
+        self.n_positivos += int(np.count_nonzero(valores > 0))
+        self.n_negativos += int(np.count_nonzero(valores < 0))
+
+        clases = np.searchsorted(self.bordes, valores, side='right')
+        self.conteos += np.bincount(clases, minlength=len(self.bordes) + 1)
+        self.sumas += np.bincount(clases, weights=valores, minlength=len(self.bordes) + 1)
+        return self
+
+    def combinar(self, otra: 'EstadisticasStreaming') -> 'EstadisticasStreaming':
+        """Combina otro acumulador (con los mismos bordes) en este."""
+        if otra.n == 0:
+            return self
+        if len(otra.bordes) != len(self.bordes) or not np.array_equal(otra.bordes, self.bordes):
+            raise ValueError("Solo se pueden combinar estadísticas con los mismos bordes")
+
+        super().combinar(otra)
+        self.minimo = min(self.minimo, otra.minimo)
+        self.maximo = max(self.maximo, otra.maximo)
+        self.n_positivos += otra.n_positivos
+        self.n_negativos += otra.n_negativos
+        self.conteos += otra.conteos
+        self.sumas += otra.sumas
+        return self
+
+    def _limites_clase(self, i: int):
+        """Intervalo [a, b] que cubre la clase i, acotado por los extremos observados."""
+        if i == 0:
+            return self.minimo, min(self.bordes[0], self.maximo)
+        if i == len(self.bordes):
+            return max(self.bordes[-1], self.minimo), self.maximo
+        return max(self.bordes[i - 1], self.minimo), min(self.bordes[i], self.maximo)
+
+    def _posicion(self, q: float):
+        """Clase y fracción dentro de ella donde cae el cuantil q ∈ [0, 1]."""
+        objetivo = q * self.n
+        acumulado = np.cumsum(self.conteos)
+        i = int(np.searchsorted(acumulado, objetivo, side='left'))
+        i = min(i, len(self.conteos) - 1)
+        previo = acumulado[i - 1] if i > 0 else 0
+        fraccion = (objetivo - previo) / self.conteos[i] if self.conteos[i] else 0.0
+        return i, min(max(fraccion, 0.0), 1.0)
+
+    def percentil(self, p: float) -> float:
+        """Percentil p ∈ [0, 100], interpolando linealmente dentro de la clase."""
+        if self.n == 0:
+            return float('nan')
+        if p <= 0:
+            return self.minimo
+        if p >= 100:
+            return self.maximo
+        i, fraccion = self._posicion(p / 100)
+        a, b = self._limites_clase(i)
+        return float(a + fraccion * (b - a))
+
+    def media_cola_inferior(self, p: float) -> float:
+        """Media de los valores por debajo del percentil p (CVaR)."""
+        if self.n == 0:
+            return float('nan')
+        i, fraccion = self._posicion(p / 100)
+        suma = float(np.sum(self.sumas[:i]))
+        cantidad = float(np.sum(self.conteos[:i]))
+        if self.conteos[i]:
+            # Parte de la clase i: se asume distribución uniforme dentro de ella
+            a, b = self._limites_clase(i)
+            parte = fraccion * self.conteos[i]
+            suma += parte * (a + 0.5 * fraccion * (b - a))
+            cantidad += parte
+        return suma / cantidad if cantidad else self.minimo
@@ -3,23 +3,29 @@ Implementa cálculos de:
 - VAN (Valor Actual Neto)
 - TIR (Tasa Interna de Retorno)
 - WACC (Costo Promedio Ponderado de Capital)
-- Análisis de Portafolio
+- Análisis y Optimización de Portafolio (frontera eficiente)
+- Riesgo de Portafolio (VaR/CVaR paramétrico, histórico y Monte Carlo)
 - Reemplazo de Activos
 
 Incluye integración con gamificación
 """
 import numpy as np
-from scipy.optimize import newton
 from typing import List, Dict, Any, Tuple
 from app.utils.validadores import (
     validar_flujos_caja, validar_tasa, validar_inversion_inicial,
-    validar_numero_positivo, validar_ponderaciones, validar_wacc_params
+    validar_numero_positivo, validar_ponderaciones, validar_wacc_params,
+    validar_matriz_flujos, validar_vector_lote
 )
 from app.servicios.gamification_servicio import GamificationService
+from app.servicios.solver_tir import flujos_con_inversion, resolver_tir, resolver_tir_lote
+from app.servicios import optimizador_portafolio, riesgo_portafolio
 
 class FinancieroServicio:
     """Servicio para cálculos financieros avanzados"""
     
+    MAX_PUNTOS_FRONTERA = 500
+    MAX_ESCENARIOS_RIESGO = 1000000
+    
     @staticmethod
     def calcular_van(inversion_inicial: float, flujos_caja: List[float], 
                      tasa_descuento: float) -> Dict[str, Any]:
@@ -86,34 +92,28 @@ class FinancieroServicio:
         flujos = validar_flujos_caja(flujos_caja)
         tasa_ref = validar_tasa(tasa_referencia)
         
-        # Función VAN para optimización
-        def van_funcion(tasa):
-            van = -inv
-            for t, flujo in enumerate(flujos, start=1):
-                van += flujo / ((1 + tasa) ** t)
-            return van
-        
-        try:
-            # Calcular TIR usando método de Newton-Raphson
-            tir = newton(van_funcion, x0=0.1, maxiter=100)
-            
-            # Si la TIR es muy alta o muy baja, puede ser irreal
-            if tir < -0.99 or tir > 10:
-                tir = None
-                decision = "NO CALCULABLE"
-                interpretacion = "No se pudo calcular una TIR razonable para este proyecto"
-            else:
-                decision = "ACEPTAR" if tir > tasa_ref else "RECHAZAR"
-                interpretacion = f"El proyecto rinde {tir*100:.2f}% anual, " + \
-                               f"{'superior' if tir > tasa_ref else 'inferior'} a la tasa de referencia ({tasa_ref*100:.2f}%)"
-        except:
-            tir = None
+        # Halley acotado; si hay varios cambios de signo, raíces de la matriz compañera
+        solucion = resolver_tir(flujos_con_inversion(inv, flujos))
+        tir = solucion['tir']
+
+        if tir is None:
             decision = "NO CALCULABLE"
-            interpretacion = "No existe TIR o los flujos no permiten calcularla"
+            if solucion['cambios_signo'] == 0:
+                interpretacion = "No existe TIR o los flujos no permiten calcularla"
+            else:
+                interpretacion = "No se pudo calcular una TIR razonable para este proyecto"
+        else:
+            decision = "ACEPTAR" if tir > tasa_ref else "RECHAZAR"
+            interpretacion = f"El proyecto rinde {tir*100:.2f}% anual, " + \
+                           f"{'superior' if tir > tasa_ref else 'inferior'} a la tasa de referencia ({tasa_ref*100:.2f}%)"
+            if solucion['multiples']:
+                otras = ", ".join(f"{t*100:.2f}%" for t in solucion['tirs'])
+                interpretacion += f". Atención: los flujos admiten varias TIR ({otras}); use el VAN para decidir"
         
         return {
-            'tir': round(tir, 4) if tir else None,
-            'tir_porcentaje': round(tir * 100, 2) if tir else None,
+            'tir': round(tir, 4) if tir is not None else None,
+            'tir_porcentaje': round(tir * 100, 2) if tir is not None else None,
+            'tirs_multiples': [round(t, 4) for t in solucion['tirs']] if solucion['multiples'] else None,
             'inversion_inicial': inv,
             'flujos_caja': flujos,
             'tasa_referencia': tasa_ref,
@@ -122,6 +122,65 @@ class FinancieroServicio:
             'interpretacion': interpretacion
         }
     
+    @staticmethod
+    def calcular_van_lote(inversiones_iniciales: Any, flujos_caja: List[List[float]],
+                          tasas_descuento: Any, tasa_referencia: float = 0.10) -> Dict[str, Any]:
+        """
+        Calcula VAN, TIR y decisión de N proyectos en una sola pasada
+
+        Los factores de descuento (1 + rᵢ)⁻ᵗ se obtienen como una matriz N×T
+        por broadcasting, de modo que el costo no depende de bucles en Python;
+        las TIR se resuelven con el modo vectorizado de solver_tir.
+
+        Args:
+            inversiones_iniciales: Escalar o lista de N inversiones (positivas)
+            flujos_caja: Matriz N×T de flujos (filas de distinta longitud se completan con ceros)
+            tasas_descuento: Escalar o lista de N tasas de descuento
+            tasa_referencia: Tasa contra la que se compara la TIR
+
+        Returns:
+            Dict con listas de VAN, TIR y decisiones, más un resumen del lote
+        """
+        flujos, periodos = validar_matriz_flujos(flujos_caja)
+        n = flujos.shape[0]
+        inversiones = validar_vector_lote(inversiones_iniciales, n, "Inversiones iniciales")
+        if np.any(inversiones == 0):
+            raise ValueError("Inversión inicial no puede ser cero")
+        tasas = validar_vector_lote(tasas_descuento, n, "Tasas de descuento", es_tasa=True)
+        tasa_ref = validar_tasa(tasa_referencia)
+
+        # Factores de descuento N×T y VAN por fila
+        t = np.arange(1, flujos.shape[1] + 1)
+        factores = (1.0 + tasas)[:, None] ** -t
+        vans = np.einsum('ij,ij->i', flujos, factores) - inversiones
+
+        tirs, _ = resolver_tir_lote(np.column_stack([-inversiones, flujos]))
+
+        decisiones = np.where(vans > 0, "ACEPTAR", np.where(vans < 0, "RECHAZAR", "INDIFERENTE"))
+        decisiones_tir = np.where(
+            np.isnan(tirs), "NO CALCULABLE", np.where(tirs > tasa_ref, "ACEPTAR", "RECHAZAR")
+        )
+
+        aceptados = int(np.sum(vans > 0))
+        mejor = int(np.argmax(vans))
+
+        return {
+            'n_proyectos': n,
+            'periodos': periodos.tolist(),
+            'van': np.round(vans, 2).tolist(),
+            'tir': [None if np.isnan(x) else round(float(x), 4) for x in tirs],
+            'decision': decisiones.tolist(),
+            'decision_tir': decisiones_tir.tolist(),
+            'tasa_referencia': tasa_ref,
+            'resumen': {
+                'aceptados': aceptados,
+                'rechazados': n - aceptados,
+                'van_total_aceptados': round(float(np.sum(vans[vans > 0])), 2),
+                'mejor_proyecto': mejor,
+                'van_mejor_proyecto': round(float(vans[mejor]), 2)
+            }
+        }
+
     @staticmethod
     def calcular_wacc(capital_propio: float, deuda: float, costo_capital: float,
                       costo_deuda: float, tasa_impuesto: float) -> Dict[str, Any]:
@@ -196,7 +255,10 @@ class FinancieroServicio:
     @staticmethod
     def analizar_portafolio(retornos: List[float], ponderaciones: List[float],
                            volatilidades: List[float] = None,
-                           matriz_correlacion: List[List[float]] = None) -> Dict[str, Any]:
+                           matriz_correlacion: List[List[float]] = None,
+                           tasa_libre_riesgo: float = 0.0,
+                           matriz_retornos: List[List[float]] = None,
+                           nivel_confianza: float = 0.95) -> Dict[str, Any]:
         """
         Analiza un portafolio de inversión
         
@@ -204,12 +266,16 @@ class FinancieroServicio:
         - Retorno esperado del portafolio
         - Riesgo (volatilidad) del portafolio
         - Ratio de Sharpe (si se proporciona tasa libre de riesgo)
+        - VaR/CVaR y contribuciones al riesgo (si se proporciona matriz_retornos)
         
         Args:
             retornos: Lista de retornos esperados de cada activo
             ponderaciones: Lista de ponderaciones (deben sumar 1)
             volatilidades: Lista de volatilidades de cada activo (opcional)
             matriz_correlacion: Matriz de correlación entre activos (opcional)
+            tasa_libre_riesgo: Tasa libre de riesgo del ratio de Sharpe
+            matriz_retornos: Retornos históricos periodos × activos (opcional)
+            nivel_confianza: Nivel del VaR/CVaR
             
         Returns:
             Dict con análisis del portafolio
@@ -270,8 +336,8 @@ class FinancieroServicio:
                 resultado['riesgo_porcentaje'] = round(riesgo_portafolio * 100, 2)
                 resultado['volatilidades_individuales'] = vols
                 
-                # Ratio de Sharpe (asumiendo tasa libre de riesgo = 0)
-                ratio_sharpe = retorno_portafolio / riesgo_portafolio if riesgo_portafolio > 0 else 0
+                # Ratio de Sharpe
+                ratio_sharpe = (retorno_portafolio - tasa_libre_riesgo) / riesgo_portafolio if riesgo_portafolio > 0 else 0
                 resultado['ratio_sharpe'] = round(ratio_sharpe, 4)
                 resultado['interpretacion'] = f"Portafolio con retorno esperado de {retorno_portafolio*100:.2f}% " + \
                                              f"y riesgo de {riesgo_portafolio*100:.2f}%. Sharpe: {ratio_sharpe:.2f}"
@@ -283,6 +349,126 @@ class FinancieroServicio:
         else:
             resultado['interpretacion'] = f"Portafolio con retorno esperado de {retorno_portafolio*100:.2f}%"
         
+        if matriz_retornos:
+            resultado['riesgo_detallado'] = FinancieroServicio.analizar_riesgo_portafolio(
+                matriz_retornos, ponds, nivel_confianza
+            )
+        
+        return resultado
+    
+    @staticmethod
+    def analizar_riesgo_portafolio(matriz_retornos: List[List[float]], ponderaciones: List[float],
+                                   nivel_confianza: float = 0.95, valor_portafolio: float = 1.0,
+                                   n_escenarios: int = 100000, semilla: int = 42) -> Dict[str, Any]:
+        """
+        Calcula VaR y CVaR de un portafolio y la contribución de cada activo
+        
+        Métodos paramétrico (normal), histórico y Monte Carlo con escenarios
+        correlacionados por Cholesky. VaR y CVaR son pérdidas (positivas) por
+        periodo de la matriz de retornos.
+        
+        Args:
+            matriz_retornos: Retornos históricos, una fila por periodo y una columna por activo
+            ponderaciones: Lista de ponderaciones (deben sumar 1)
+            nivel_confianza: Nivel del VaR (entre 0.5 y 1, p. ej. 0.95)
+            valor_portafolio: Valor del portafolio para expresar pérdidas en dinero
+            n_escenarios: Escenarios Monte Carlo (0 = sin Monte Carlo)
+            semilla: Semilla de la simulación
+            
+        Returns:
+            Dict con VaR/CVaR por método y contribuciones al riesgo
+        """
+        ponds = np.array(validar_ponderaciones(ponderaciones))
+        try:
+            retornos = np.array(matriz_retornos, dtype=np.float64)
+        except (TypeError, ValueError) as e:
+            raise ValueError(f"La matriz de retornos contiene valores inválidos: {e}")
+        if retornos.ndim != 2 or retornos.shape[0] < 2:
+            raise ValueError("La matriz de retornos debe tener al menos 2 periodos (filas) con un retorno por activo")
+        if retornos.shape[1] != len(ponds):
+            raise ValueError("El número de columnas de la matriz de retornos debe coincidir con el número de ponderaciones")
+        if not np.all(np.isfinite(retornos)):
+            raise ValueError("La matriz de retornos contiene valores no finitos")
+        if not 0.5 <= nivel_confianza < 1:
+            raise ValueError("El nivel de confianza debe estar entre 0.5 y 1")
+        if valor_portafolio <= 0:
+            raise ValueError("El valor del portafolio debe ser positivo")
+        if not 0 <= n_escenarios <= FinancieroServicio.MAX_ESCENARIOS_RIESGO:
+            raise ValueError(f"n_escenarios debe estar entre 0 y {FinancieroServicio.MAX_ESCENARIOS_RIESGO}")
+        
+        return riesgo_portafolio.analizar_riesgo(
+            retornos, ponds, nivel_confianza, valor_portafolio, n_escenarios, semilla
+        )
+    
+    @staticmethod
+    def optimizar_portafolio(retornos: List[float], volatilidades: List[float],
+                             matriz_correlacion: List[List[float]], tasa_libre_riesgo: float = 0.0,
+                             n_puntos: int = 50, solo_largos: bool = True) -> Dict[str, Any]:
+        """
+        Optimiza un portafolio media-varianza
+        
+        Calcula el portafolio de mínima varianza, el de máximo Sharpe y la
+        frontera eficiente (n_puntos con retornos equiespaciados desde el de
+        mínima varianza hasta el mayor retorno individual). Sin solo_largos
+        se permiten posiciones cortas y todo sale en forma cerrada; con
+        solo_largos se usa gradiente proyectado sobre w ≥ 0.
+        
+        Args:
+            retornos: Retornos esperados de cada activo (decimal)
+            volatilidades: Volatilidades de cada activo (decimal)
+            matriz_correlacion: Matriz de correlación entre activos
+            tasa_libre_riesgo: Tasa libre de riesgo para el ratio de Sharpe
+            n_puntos: Puntos de la frontera eficiente
+            solo_largos: Prohibir posiciones cortas (ponderaciones ≥ 0)
+            
+        Returns:
+            Dict con mínima varianza, máximo Sharpe y frontera eficiente
+        """
+        rets = np.array(validar_flujos_caja(retornos, "retornos"))
+        vols = np.array(validar_flujos_caja(volatilidades, "volatilidades"))
+        if len(vols) != len(rets):
+            raise ValueError("El número de volatilidades debe coincidir con el número de activos")
+        if not matriz_correlacion:
+            raise ValueError("Se requiere la matriz de correlación")
+        try:
+            correlacion = np.array(matriz_correlacion, dtype=np.float64)
+        except (TypeError, ValueError) as e:
+            raise ValueError(f"La matriz de correlación contiene valores inválidos: {e}")
+        if not 2 <= n_puntos <= FinancieroServicio.MAX_PUNTOS_FRONTERA:
+            raise ValueError(f"n_puntos debe estar entre 2 y {FinancieroServicio.MAX_PUNTOS_FRONTERA}")
+        
+        covarianza, cholesky = optimizador_portafolio.factorizar_covarianza(vols, correlacion)
+        if solo_largos:
+            optimo = optimizador_portafolio.frontera_solo_largos(
+                rets, covarianza, cholesky, n_puntos, tasa_libre_riesgo
+            )
+        else:
+            optimo = optimizador_portafolio.frontera_sin_restricciones(
+                rets, cholesky, n_puntos, tasa_libre_riesgo
+            )
+        
+        def describir(ponderaciones):
+            if ponderaciones is None:
+                return None
+            return optimizador_portafolio.describir_portafolio(
+                ponderaciones, rets, cholesky, tasa_libre_riesgo
+            )
+        
+        resultado = {
+            'activos': len(rets),
+            'solo_largos': solo_largos,
+            'tasa_libre_riesgo': tasa_libre_riesgo,
+            'metodo': 'gradiente_proyectado' if solo_largos else 'forma_cerrada',
+            'iteraciones': optimo['iteraciones'],
+            'minima_varianza': describir(optimo['minima_varianza']),
+            'maximo_sharpe': describir(optimo['maximo_sharpe']),
+            'frontera': optimizador_portafolio.describir_frontera(
+                optimo['frontera'], rets, cholesky, tasa_libre_riesgo
+            )
+        }
+        if optimo['maximo_sharpe'] is None:
+            resultado['advertencia'] = ("No existe portafolio de máximo Sharpe: la tasa libre de riesgo "
+                                        "no es menor que el retorno alcanzable")
         return resultado
     
     @staticmethod
@@ -9,11 +9,28 @@ Este módulo proporciona servicios de ML para:
 - Análisis de sensibilidad (Monte Carlo, Tornado, Escenarios)
 """
 
+import copy
+import gc
+import hashlib
+import multiprocessing
 import os
+import re
+import threading
+import time
+import warnings
+from datetime import datetime
 import numpy as np
 import pandas as pd
 from typing import Dict, List, Any, Tuple, Optional
 from scipy import stats
+from scipy.stats import qmc
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from app.servicios.solver_tir import resolver_tir, resolver_tir_lote, flujos_con_inversion
+from app.servicios.estadisticas_streaming import AcumuladorWelford, EstadisticasStreaming
+from app.servicios.cache_lru import CacheLRUTTL
+from app.servicios.arboles_compilados import compilar_modelo
 
 # Intentar cargar joblib para modelos pre-entrenados
 try:
@@ -23,56 +40,330 @@ except ImportError:
     JOBLIB_AVAILABLE = False
 
 
+def _memoria_residente() -> Optional[int]:
+    """Memoria residente del proceso en bytes (Linux; None si no se puede leer)."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError, AttributeError):
+        return None
+
+
+class _ArtefactoPerezoso:
+    """Atributo de ServicioML que carga su artefacto de ml/modelos al primer acceso."""
+    
+    def __set_name__(self, propietario, nombre):
+        self.nombre = nombre
+    
+    def __get__(self, instancia, propietario=None):
+        if instancia is None:
+            return self
+        return instancia._obtener_artefacto(self.nombre)
+    
+    def __set__(self, instancia, valor):
+        instancia._artefactos[self.nombre] = valor
+        instancia.cache.limpiar()
+
+
 class ServicioML:
     """
     Servicio principal de Machine Learning para predicciones financieras.
     Carga modelos pre-entrenados y proporciona métodos de predicción.
     """
     
-    def __init__(self):
-        """Inicializa el servicio y carga los modelos si están disponibles."""
-        self.modelos_dir = os.path.join(os.path.dirname(__file__), '..', '..', 'ml', 'modelos')
-        self.modelos_cargados = False
-        self.modelo_ingresos = None
-        self.modelo_crecimiento = None
-        self.modelo_riesgo = None
-        self.scaler_ingresos = None
-        self.label_encoder_riesgo = None
-        self.metadatos = None
-        
-        self._cargar_modelos()
-    
-    def _cargar_modelos(self):
-        """Intenta cargar los modelos pre-entrenados."""
+    MODELOS = ('ingresos', 'crecimiento', 'riesgo')
+    CAMPOS_REQUERIDOS = ('ingresos_anuales', 'gastos_operativos', 'activos_totales', 'pasivos_totales')
+    VALORES_POR_DEFECTO = {
+        'antiguedad_anios': 5,
+        'num_empleados': 50,
+        'num_clientes': 500,
+        'tasa_retencion_clientes': 0.8,
+        'inflacion': 0.04,
+        'tasa_interes_referencia': 0.08,
+        'crecimiento_pib_sector': 0.03
+    }
+    INDICADORES = ['margen_bruto', 'ratio_endeudamiento', 'roi', 'liquidez']
+    
+    # Orden de columnas con el que se entrenó cada modelo
+    COLUMNAS_INGRESOS = [
+        'ingresos_anuales', 'gastos_operativos', 'activos_totales', 'pasivos_totales',
+        'antiguedad_anios', 'num_empleados', 'num_clientes', 'tasa_retencion_clientes',
+        'margen_bruto', 'ratio_endeudamiento', 'roi', 'liquidez',
+        'inflacion', 'tasa_interes_referencia', 'crecimiento_pib_sector'
+    ]
+    COLUMNAS_CRECIMIENTO = [
+        'ingresos_anuales', 'gastos_operativos', 'activos_totales',
+        'antiguedad_anios', 'num_empleados', 'tasa_retencion_clientes',
+        'margen_bruto', 'ratio_endeudamiento', 'roi', 'liquidez',
+        'inflacion', 'tasa_interes_referencia', 'crecimiento_pib_sector'
+    ]
+    COLUMNAS_RIESGO = [
+        'ingresos_anuales', 'gastos_operativos', 'activos_totales', 'pasivos_totales',
+        'antiguedad_anios', 'num_empleados', 'tasa_retencion_clientes',
+        'margen_bruto', 'ratio_endeudamiento', 'roi', 'liquidez',
+        'inflacion', 'tasa_interes_referencia'
+    ]
+    
+    PROBABILIDADES_HEURISTICAS = {
+        'Alto': {'Alto': 0.8, 'Medio': 0.15, 'Bajo': 0.05},
+        'Medio': {'Alto': 0.2, 'Medio': 0.6, 'Bajo': 0.2},
+        'Bajo': {'Alto': 0.05, 'Medio': 0.2, 'Bajo': 0.75}
+    }
+    
+    # Atributo -> archivo en ml/modelos; cada uno se carga la primera vez que se usa
+    ARTEFACTOS = {
+        'modelo_ingresos': 'modelo_ingresos_xgb.joblib',
+        'modelo_crecimiento': 'modelo_crecimiento_xgb.joblib',
+        'modelo_riesgo': 'modelo_riesgo_xgb.joblib',
+        'scaler_ingresos': 'scaler_ingresos.joblib',
+        'label_encoder_riesgo': 'label_encoder_riesgo.joblib',
+        'metadatos': 'metadatos_modelos.joblib'
+    }
+    modelo_ingresos = _ArtefactoPerezoso()
+    modelo_crecimiento = _ArtefactoPerezoso()
+    modelo_riesgo = _ArtefactoPerezoso()
+    scaler_ingresos = _ArtefactoPerezoso()
+    label_encoder_riesgo = _ArtefactoPerezoso()
+    metadatos = _ArtefactoPerezoso()
+    
+    BACKENDS_INFERENCIA = ('nativo', 'numpy')
+    DIRECTORIO_MODELOS = os.path.join(os.path.dirname(__file__), '..', '..', 'ml', 'modelos')
+    
+    def __init__(self, mmap_modo: Optional[str] = 'r', modelos_dir: Optional[str] = None,
+                 cache_tamano: int = 4096, cache_ttl: float = 300.0,
+                 backend_inferencia: str = 'nativo', numpy_max_filas: int = 64):
+        """
+        Inicializa el servicio sin leer todavía los modelos del disco.
+        
+        Args:
+            mmap_modo: mmap_mode de joblib.load ('r' comparte los arrays de los
+                modelos entre workers a través de la caché de páginas; None
+                los copia en la memoria de cada proceso)
+            modelos_dir: Directorio con los artefactos (por defecto ml/modelos)
+            cache_tamano: Predicciones guardadas en la caché LRU (0 = sin caché)
+            cache_ttl: Segundos de vida de cada predicción en caché
+            backend_inferencia: 'nativo' (predict del modelo cargado) o 'numpy'
+                (árboles convertidos a arrays, ver arboles_compilados)
+            numpy_max_filas: Con 'numpy', lotes mayores usan el modelo nativo
+        """
+        if backend_inferencia not in self.BACKENDS_INFERENCIA:
+            raise ValueError(f"Backend de inferencia no válido: {backend_inferencia}. "
+                             f"Opciones: {list(self.BACKENDS_INFERENCIA)}")
+        self.modelos_dir = modelos_dir or self.DIRECTORIO_MODELOS
+        self.version = None
+        self.cache = CacheLRUTTL(cache_tamano, cache_ttl)
+        self.backend_inferencia = backend_inferencia
+        self.numpy_max_filas = numpy_max_filas
+        self.mmap_modo = mmap_modo
+        self._artefactos = {}
+        self._estado_carga = {}
+        self._lock_carga = threading.Lock()
+        
         if not JOBLIB_AVAILABLE:
             print("⚠️ joblib no disponible, usando modelos simulados")
-            return
-            
+        self.modelos_cargados = JOBLIB_AVAILABLE and os.path.exists(self.modelos_dir)
+    
+    def _obtener_artefacto(self, nombre: str):
+        """Devuelve el artefacto, cargándolo del disco la primera vez (None si no hay)."""
+        if nombre in self._artefactos:
+            return self._artefactos[nombre]
+        with self._lock_carga:
+            if nombre not in self._artefactos:
+                self._artefactos[nombre] = self._cargar_artefacto(nombre) if self.modelos_cargados else None
+            return self._artefactos[nombre]
+    
+    def _cargar_artefacto(self, nombre: str):
+        """Carga un artefacto con joblib y registra tiempo y memoria de la carga."""
+        ruta = os.path.join(self.modelos_dir, self.ARTEFACTOS[nombre])
+        estado = {'archivo': self.ARTEFACTOS[nombre], 'cargado': False}
+        memoria_previa = _memoria_residente()
+        inicio = time.perf_counter()
         try:
-            if os.path.exists(self.modelos_dir):
-                self.modelo_ingresos = joblib.load(
-                    os.path.join(self.modelos_dir, 'modelo_ingresos_xgb.joblib')
-                )
-                self.modelo_crecimiento = joblib.load(
-                    os.path.join(self.modelos_dir, 'modelo_crecimiento_xgb.joblib')
-                )
-                self.modelo_riesgo = joblib.load(
-                    os.path.join(self.modelos_dir, 'modelo_riesgo_xgb.joblib')
-                )
-                self.scaler_ingresos = joblib.load(
-                    os.path.join(self.modelos_dir, 'scaler_ingresos.joblib')
-                )
-                self.label_encoder_riesgo = joblib.load(
-                    os.path.join(self.modelos_dir, 'label_encoder_riesgo.joblib')
-                )
-                self.metadatos = joblib.load(
-                    os.path.join(self.modelos_dir, 'metadatos_modelos.joblib')
-                )
-                self.modelos_cargados = True
-                print("✅ Modelos ML cargados exitosamente")
+            artefacto = joblib.load(ruta, mmap_mode=self.mmap_modo)
+            estado['cargado'] = True
         except Exception as e:
-            print(f"⚠️ No se pudieron cargar modelos: {e}")
-            self.modelos_cargados = False
+            print(f"⚠️ No se pudo cargar {self.ARTEFACTOS[nombre]}: {e}")
+            artefacto = None
+            estado['error'] = str(e)
+        
+        if artefacto is not None and nombre.startswith('modelo_'):
+            artefacto = self._preparar_modelo(artefacto, estado)
+        
+        estado['tiempo_carga_ms'] = round((time.perf_counter() - inicio) * 1000, 2)
+        if estado['cargado']:
+            estado['tamano_archivo_mb'] = round(os.path.getsize(ruta) / 2**20, 3)
+            memoria = _memoria_residente()
+            if memoria is not None and memoria_previa is not None:
+                estado['memoria_residente_mb'] = round(max(memoria - memoria_previa, 0) / 2**20, 3)
+        self._estado_carga[nombre] = estado
+        return artefacto
+    
+    def _preparar_modelo(self, modelo, estado: Dict[str, Any]):
+        """Convierte el modelo al backend NumPy si está configurado (si no se puede, queda nativo)."""
+        estado['backend'] = 'nativo'
+        if self.backend_inferencia != 'numpy':
+            return modelo
+        try:
+            compilado = compilar_modelo(modelo, max_filas=self.numpy_max_filas)
+        except Exception as e:
+            print(f"⚠️ Modelo {type(modelo).__name__} sin conversión a NumPy, se usa nativo: {e}")
+            estado['error_conversion'] = str(e)
+            return modelo
+        estado['backend'] = 'numpy'
+        estado['arboles'] = compilado.describir()
+        return compilado
+    
+    def precargar_modelos(self) -> Dict[str, Any]:
+        """
+        Carga ya todos los artefactos (p. ej. en el proceso maestro de gunicorn
+        con --preload, para que los workers compartan las páginas tras el fork).
+        """
+        for nombre in self.ARTEFACTOS:
+            self._obtener_artefacto(nombre)
+        if self.modelos_cargados and all(e['cargado'] for e in self._estado_carga.values()):
+            print("✅ Modelos ML cargados exitosamente")
+        return self.estado_modelos()
+    
+    def estado_modelos(self) -> Dict[str, Any]:
+        """Estado de carga por artefacto: tiempo, tamaño en disco y memoria residente añadida."""
+        return {
+            'directorio_disponible': self.modelos_cargados,
+            'mmap_modo': self.mmap_modo,
+            'backend_inferencia': self.backend_inferencia,
+            'artefactos': {
+                nombre: dict(self._estado_carga.get(nombre, {'archivo': archivo, 'cargado': False, 'pendiente': True}))
+                for nombre, archivo in self.ARTEFACTOS.items()
+            }
+        }
+    
+    def construir_caracteristicas(self, empresas) -> pd.DataFrame:
+        """
+        Construye la matriz de características de un conjunto de empresas.
+        
+        Completa los campos opcionales con sus valores por defecto y calcula
+        una sola vez los indicadores derivados (margen_bruto,
+        ratio_endeudamiento, roi, liquidez) para todas las filas.
+        
+        Args:
+            empresas: Lista de diccionarios (como datos_empresa) o DataFrame
+            
+        Returns:
+            DataFrame float64 con las columnas de todos los modelos
+        """
+        if isinstance(empresas, pd.DataFrame):
+            df = empresas.copy()
+        else:
+            if not isinstance(empresas, (list, tuple)) or not all(isinstance(e, dict) for e in empresas):
+                raise ValueError("Se esperaba una lista de empresas (objetos con indicadores financieros)")
+            df = pd.DataFrame(list(empresas))
+        if len(df) == 0:
+            raise ValueError("La lista de empresas está vacía")
+        
+        faltantes = [campo for campo in self.CAMPOS_REQUERIDOS if campo not in df.columns]
+        if faltantes:
+            raise ValueError(f"Campos requeridos faltantes: {faltantes}")
+        for campo in self.CAMPOS_REQUERIDOS:
+            if df[campo].isna().any():
+                filas = df.index[df[campo].isna()].tolist()[:5]
+                raise ValueError(f"Campo requerido faltante: {campo} (empresas {filas})")
+        
+        for campo, defecto in self.VALORES_POR_DEFECTO.items():
+            df[campo] = df[campo].fillna(defecto) if campo in df.columns else defecto
+        
+        columnas = list(self.CAMPOS_REQUERIDOS) + list(self.VALORES_POR_DEFECTO)
+        try:
+            X = df[columnas].astype(np.float64)
+        except (TypeError, ValueError) as e:
+            raise ValueError(f"Los indicadores deben ser numéricos: {e}")
+        
+        if (X['ingresos_anuales'] <= 0).any() or (X['activos_totales'] <= 0).any():
+            raise ValueError("ingresos_anuales y activos_totales deben ser mayores a 0")
+        
+        # Indicadores derivados, calculados una vez para todas las empresas
+        utilidad = X['ingresos_anuales'] - X['gastos_operativos']
+        X['margen_bruto'] = utilidad / X['ingresos_anuales']
+        X['ratio_endeudamiento'] = X['pasivos_totales'] / X['activos_totales']
+        X['roi'] = utilidad / X['activos_totales']
+        X['liquidez'] = X['activos_totales'] / (X['pasivos_totales'] + 1)
+        return X.reset_index(drop=True)
+    
+    def predecir_lote(self, empresas, modelos: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        """
+        Predice ingresos, crecimiento y riesgo de muchas empresas a la vez.
+        
+        La matriz de características se construye una sola vez y cada modelo
+        se evalúa sobre todas las filas en una única llamada a predict /
+        predict_proba (o con las fórmulas heurísticas vectorizadas). Las
+        empresas ya evaluadas con los mismos datos y modelos salen de la caché.
+        
+        Args:
+            empresas: Lista de diccionarios (como datos_empresa) o DataFrame
+            modelos: Subconjunto de ['ingresos', 'crecimiento', 'riesgo']
+                (por defecto todos)
+            
+        Returns:
+            Lista, en el orden de entrada, con un dict por empresa cuyas claves
+            son los modelos pedidos y cuyos valores tienen el mismo formato que
+            predecir_ingresos / predecir_crecimiento / clasificar_riesgo
+        """
+        modelos = list(modelos or self.MODELOS)
+        desconocidos = [m for m in modelos if m not in self.MODELOS]
+        if desconocidos:
+            raise ValueError(f"Modelos no reconocidos: {desconocidos}. Opciones: {list(self.MODELOS)}")
+        
+        # Resultados ya calculados para el mismo vector de características y modelos
+        claves = None
+        if self.cache.habilitada and isinstance(empresas, (list, tuple)) and empresas:
+            claves = [self._clave_cache(e) for e in empresas]
+            resultados = [{} for _ in claves]
+            pendientes = []
+            for i, clave in enumerate(claves):
+                for modelo in modelos:
+                    guardado = self.cache.obtener((modelo,) + clave) if clave is not None else None
+                    if guardado is None:
+                        pendientes.append(i)
+                        break
+                    resultados[i][modelo] = copy.deepcopy(guardado)
+            if not pendientes:
+                return resultados
+        
+        if claves is None or len(pendientes) == len(claves):
+            X = self.construir_caracteristicas(empresas)
+            resultados = [{} for _ in range(len(X))]
+            pendientes = range(len(X))
+        else:
+            X = self.construir_caracteristicas([empresas[i] for i in pendientes])
+        predictores = {
+            'ingresos': self._predecir_ingresos_matriz,
+            'crecimiento': self._predecir_crecimiento_matriz,
+            'riesgo': self._clasificar_riesgo_matriz
+        }
+        for modelo in modelos:
+            for i, prediccion in zip(pendientes, predictores[modelo](X)):
+                if claves is not None and claves[i] is not None:
+                    self.cache.guardar((modelo,) + claves[i], prediccion)
+                    prediccion = copy.deepcopy(prediccion)
+                resultados[i][modelo] = prediccion
+        return resultados
+    
+    def _clave_cache(self, datos_empresa) -> Optional[tuple]:
+        """
+        Clave canónica de una empresa: versión de los modelos y vector de
+        entradas en float con los valores por defecto aplicados (las columnas
+        derivadas dependen solo de él). None si los datos no son válidos, para
+        que construir_caracteristicas informe el error.
+        """
+        if not isinstance(datos_empresa, dict):
+            return None
+        try:
+            vector = tuple(float(datos_empresa[campo]) for campo in self.CAMPOS_REQUERIDOS) + tuple(
+                float(defecto if datos_empresa.get(campo) is None else datos_empresa[campo])
+                for campo, defecto in self.VALORES_POR_DEFECTO.items()
+            )
+        except (KeyError, TypeError, ValueError):
+            return None
+        version = self.version['checksum'] if self.version else None
+        return (version, self.modelos_cargados) + vector
     
     def predecir_ingresos(self, datos_empresa: Dict[str, float]) -> Dict[str, Any]:
         """
@@ -95,64 +386,53 @@ class ServicioML:
         Returns:
             Predicción de ingresos con intervalos de confianza
         """
-        # Calcular indicadores derivados
-        margen_bruto = (datos_empresa['ingresos_anuales'] - datos_empresa['gastos_operativos']) / datos_empresa['ingresos_anuales']
-        ratio_endeudamiento = datos_empresa['pasivos_totales'] / datos_empresa['activos_totales']
-        roi = (datos_empresa['ingresos_anuales'] - datos_empresa['gastos_operativos']) / datos_empresa['activos_totales']
-        liquidez = datos_empresa['activos_totales'] / (datos_empresa['pasivos_totales'] + 1)
-        
-        if self.modelos_cargados and self.modelo_ingresos is not None:
+        return self.predecir_lote([datos_empresa], ['ingresos'])[0]['ingresos']
+    
+    def _predecir_ingresos_matriz(self, X: pd.DataFrame) -> List[Dict[str, Any]]:
+        """Predicción de ingresos para todas las filas de X."""
+        usa_modelo = self.modelos_cargados and self.modelo_ingresos is not None
+        if usa_modelo:
             # Usar modelo entrenado
-            features = np.array([[
-                datos_empresa['ingresos_anuales'],
-                datos_empresa['gastos_operativos'],
-                datos_empresa['activos_totales'],
-                datos_empresa['pasivos_totales'],
-                datos_empresa.get('antiguedad_anios', 5),
-                datos_empresa.get('num_empleados', 50),
-                datos_empresa.get('num_clientes', 500),
-                datos_empresa.get('tasa_retencion_clientes', 0.8),
-                margen_bruto,
-                ratio_endeudamiento,
-                roi,
-                liquidez,
-                datos_empresa.get('inflacion', 0.04),
-                datos_empresa.get('tasa_interes_referencia', 0.08),
-                datos_empresa.get('crecimiento_pib_sector', 0.03)
-            ]])
-            
-            prediccion = self.modelo_ingresos.predict(features)[0]
+            predicciones = np.asarray(
+                self.modelo_ingresos.predict(X[self.COLUMNAS_INGRESOS].to_numpy()), dtype=np.float64
+            )
         else:
             # Modelo simplificado (fallback)
             crecimiento_estimado = (
                 0.02 +  # Base
-                margen_bruto * 0.12 +
-                roi * 0.08 +
-                datos_empresa.get('crecimiento_pib_sector', 0.03) * 0.4 +
-                datos_empresa.get('tasa_retencion_clientes', 0.8) * 0.06 -
-                ratio_endeudamiento * 0.04 -
-                datos_empresa.get('inflacion', 0.04) * 0.2
+                X['margen_bruto'] * 0.12 +
+                X['roi'] * 0.08 +
+                X['crecimiento_pib_sector'] * 0.4 +
+                X['tasa_retencion_clientes'] * 0.06 -
+                X['ratio_endeudamiento'] * 0.04 -
+                X['inflacion'] * 0.2
             )
-            prediccion = datos_empresa['ingresos_anuales'] * (1 + crecimiento_estimado)
+            predicciones = (X['ingresos_anuales'] * (1 + crecimiento_estimado)).to_numpy()
         
         # Calcular intervalos de confianza (±15% aproximado)
-        error_std = prediccion * 0.15
+        errores_std = predicciones * 0.15
+        columnas = np.round(np.column_stack([
+            predicciones,
+            predicciones - 1.645 * errores_std,
+            predicciones + 1.645 * errores_std,
+            (predicciones / X['ingresos_anuales'].to_numpy() - 1) * 100
+        ]), 2).tolist()
+        modelo_usado = 'XGBoost' if usa_modelo else 'Heurístico'
         
-        return {
-            'ingresos_predichos': round(prediccion, 2),
-            'intervalo_confianza_90': {
-                'inferior': round(prediccion - 1.645 * error_std, 2),
-                'superior': round(prediccion + 1.645 * error_std, 2)
-            },
-            'crecimiento_esperado_pct': round((prediccion / datos_empresa['ingresos_anuales'] - 1) * 100, 2),
-            'modelo_usado': 'XGBoost' if self.modelos_cargados else 'Heurístico',
-            'indicadores_calculados': {
-                'margen_bruto': round(margen_bruto, 4),
-                'ratio_endeudamiento': round(ratio_endeudamiento, 4),
-                'roi': round(roi, 4),
-                'liquidez': round(liquidez, 4)
+        return [
+            {
+                'ingresos_predichos': prediccion,
+                'intervalo_confianza_90': {
+                    'inferior': inferior,
+                    'superior': superior
+                },
+                'crecimiento_esperado_pct': crecimiento,
+                'modelo_usado': modelo_usado,
+                'indicadores_calculados': indicadores
             }
-        }
+            for (prediccion, inferior, superior, crecimiento), indicadores
+            in zip(columnas, self._indicadores(X))
+        ]
     
     def predecir_crecimiento(self, datos_empresa: Dict[str, float]) -> Dict[str, Any]:
         """
@@ -164,64 +444,53 @@ class ServicioML:
         Returns:
             Predicción de tasa de crecimiento
         """
-        # Calcular indicadores
-        margen_bruto = (datos_empresa['ingresos_anuales'] - datos_empresa['gastos_operativos']) / datos_empresa['ingresos_anuales']
-        ratio_endeudamiento = datos_empresa['pasivos_totales'] / datos_empresa['activos_totales']
-        roi = (datos_empresa['ingresos_anuales'] - datos_empresa['gastos_operativos']) / datos_empresa['activos_totales']
-        liquidez = datos_empresa['activos_totales'] / (datos_empresa['pasivos_totales'] + 1)
-        
-        if self.modelos_cargados and self.modelo_crecimiento is not None:
-            features = np.array([[
-                datos_empresa['ingresos_anuales'],
-                datos_empresa['gastos_operativos'],
-                datos_empresa['activos_totales'],
-                datos_empresa.get('antiguedad_anios', 5),
-                datos_empresa.get('num_empleados', 50),
-                datos_empresa.get('tasa_retencion_clientes', 0.8),
-                margen_bruto,
-                ratio_endeudamiento,
-                roi,
-                liquidez,
-                datos_empresa.get('inflacion', 0.04),
-                datos_empresa.get('tasa_interes_referencia', 0.08),
-                datos_empresa.get('crecimiento_pib_sector', 0.03)
-            ]])
-            
-            crecimiento = self.modelo_crecimiento.predict(features)[0]
+        return self.predecir_lote([datos_empresa], ['crecimiento'])[0]['crecimiento']
+    
+    def _predecir_crecimiento_matriz(self, X: pd.DataFrame) -> List[Dict[str, Any]]:
+        """Predicción de crecimiento para todas las filas de X."""
+        usa_modelo = self.modelos_cargados and self.modelo_crecimiento is not None
+        if usa_modelo:
+            crecimientos = np.asarray(
+                self.modelo_crecimiento.predict(X[self.COLUMNAS_CRECIMIENTO].to_numpy()), dtype=np.float64
+            )
         else:
             # Modelo heurístico
-            crecimiento = (
+            crecimientos = (
                 0.02 +
-                margen_bruto * 0.15 +
-                roi * 0.10 +
-                datos_empresa.get('crecimiento_pib_sector', 0.03) * 0.5 +
-                datos_empresa.get('tasa_retencion_clientes', 0.8) * 0.08 -
-                ratio_endeudamiento * 0.05 -
-                datos_empresa.get('inflacion', 0.04) * 0.3
-            )
+                X['margen_bruto'] * 0.15 +
+                X['roi'] * 0.10 +
+                X['crecimiento_pib_sector'] * 0.5 +
+                X['tasa_retencion_clientes'] * 0.08 -
+                X['ratio_endeudamiento'] * 0.05 -
+                X['inflacion'] * 0.3
+            ).to_numpy()
         
-        # Clasificar el crecimiento
-        if crecimiento > 0.15:
-            categoria = 'Alto'
-            color = 'green'
-        elif crecimiento > 0.05:
-            categoria = 'Moderado'
-            color = 'yellow'
-        elif crecimiento > 0:
-            categoria = 'Bajo'
-            color = 'orange'
-        else:
-            categoria = 'Negativo'
-            color = 'red'
-        
-        return {
-            'crecimiento_anual': round(crecimiento, 4),
-            'crecimiento_porcentaje': round(crecimiento * 100, 2),
-            'categoria': categoria,
-            'color': color,
-            'modelo_usado': 'XGBoost' if self.modelos_cargados else 'Heurístico',
-            'interpretacion': f"Se espera un crecimiento {categoria.lower()} del {crecimiento*100:.1f}% anual"
-        }
+        modelo_usado = 'XGBoost' if usa_modelo else 'Heurístico'
+        resultados = []
+        for crecimiento in crecimientos.tolist():
+            # Clasificar el crecimiento
+            if crecimiento > 0.15:
+                categoria = 'Alto'
+                color = 'green'
+            elif crecimiento > 0.05:
+                categoria = 'Moderado'
+                color = 'yellow'
+            elif crecimiento > 0:
+                categoria = 'Bajo'
+                color = 'orange'
+            else:
+                categoria = 'Negativo'
+                color = 'red'
+            
+            resultados.append({
+                'crecimiento_anual': round(crecimiento, 4),
+                'crecimiento_porcentaje': round(crecimiento * 100, 2),
+                'categoria': categoria,
+                'color': color,
+                'modelo_usado': modelo_usado,
+                'interpretacion': f"Se espera un crecimiento {categoria.lower()} del {crecimiento*100:.1f}% anual"
+            })
+        return resultados
     
     def clasificar_riesgo(self, datos_empresa: Dict[str, float]) -> Dict[str, Any]:
         """
@@ -233,93 +502,61 @@ class ServicioML:
         Returns:
             Clasificación de riesgo (Bajo, Medio, Alto) con probabilidades
         """
-        # Calcular indicadores
-        margen_bruto = (datos_empresa['ingresos_anuales'] - datos_empresa['gastos_operativos']) / datos_empresa['ingresos_anuales']
-        ratio_endeudamiento = datos_empresa['pasivos_totales'] / datos_empresa['activos_totales']
-        roi = (datos_empresa['ingresos_anuales'] - datos_empresa['gastos_operativos']) / datos_empresa['activos_totales']
-        liquidez = datos_empresa['activos_totales'] / (datos_empresa['pasivos_totales'] + 1)
-        
-        if self.modelos_cargados and self.modelo_riesgo is not None:
-            features = np.array([[
-                datos_empresa['ingresos_anuales'],
-                datos_empresa['gastos_operativos'],
-                datos_empresa['activos_totales'],
-                datos_empresa['pasivos_totales'],
-                datos_empresa.get('antiguedad_anios', 5),
-                datos_empresa.get('num_empleados', 50),
-                datos_empresa.get('tasa_retencion_clientes', 0.8),
-                margen_bruto,
-                ratio_endeudamiento,
-                roi,
-                liquidez,
-                datos_empresa.get('inflacion', 0.04),
-                datos_empresa.get('tasa_interes_referencia', 0.08)
-            ]])
-            
-            prediccion_encoded = self.modelo_riesgo.predict(features)[0]
-            nivel_riesgo = self.label_encoder_riesgo.inverse_transform([prediccion_encoded])[0]
+        return self.predecir_lote([datos_empresa], ['riesgo'])[0]['riesgo']
+    
+    def _clasificar_riesgo_matriz(self, X: pd.DataFrame) -> List[Dict[str, Any]]:
+        """Clasificación de riesgo para todas las filas de X."""
+        usa_modelo = self.modelos_cargados and self.modelo_riesgo is not None
+        if usa_modelo:
+            features = X[self.COLUMNAS_RIESGO].to_numpy()
+            niveles = list(self.label_encoder_riesgo.inverse_transform(self.modelo_riesgo.predict(features)))
             
             # Obtener probabilidades si el modelo lo soporta
             try:
-                probabilidades = self.modelo_riesgo.predict_proba(features)[0]
-                probs_dict = {
-                    clase: round(prob, 4) 
-                    for clase, prob in zip(self.label_encoder_riesgo.classes_, probabilidades)
-                }
-            except:
-                probs_dict = {nivel_riesgo: 1.0}
+                probabilidades = self.modelo_riesgo.predict_proba(features)
+                probs = [
+                    {clase: round(float(prob), 4) for clase, prob in zip(self.label_encoder_riesgo.classes_, fila)}
+                    for fila in probabilidades
+                ]
+            except Exception:
+                probs = [{nivel: 1.0} for nivel in niveles]
         else:
             # Clasificación heurística
-            score_riesgo = 0
-            
-            if ratio_endeudamiento > 0.7:
-                score_riesgo += 3
-            elif ratio_endeudamiento > 0.5:
-                score_riesgo += 1
-            
-            if margen_bruto < 0.1:
-                score_riesgo += 3
-            elif margen_bruto < 0.2:
-                score_riesgo += 1
-            
-            if liquidez < 1.2:
-                score_riesgo += 2
-            elif liquidez < 1.5:
-                score_riesgo += 1
+            score_riesgo = (
+                np.where(X['ratio_endeudamiento'] > 0.7, 3, np.where(X['ratio_endeudamiento'] > 0.5, 1, 0)) +
+                np.where(X['margen_bruto'] < 0.1, 3, np.where(X['margen_bruto'] < 0.2, 1, 0)) +
+                np.where(X['liquidez'] < 1.2, 2, np.where(X['liquidez'] < 1.5, 1, 0)) +
+                np.where(X['roi'] < 0.05, 2, np.where(X['roi'] < 0.1, 1, 0))
+            )
+            niveles = np.where(score_riesgo >= 5, 'Alto', np.where(score_riesgo >= 2, 'Medio', 'Bajo')).tolist()
+            probs = [dict(self.PROBABILIDADES_HEURISTICAS[nivel]) for nivel in niveles]
+        
+        modelo_usado = 'XGBoost' if usa_modelo else 'Heurístico'
+        resultados = []
+        filas = zip(niveles, probs, X[self.INDICADORES].to_numpy().tolist(), self._indicadores(X))
+        for nivel_riesgo, probs_dict, (margen_bruto, ratio_endeudamiento, roi, liquidez), indicadores in filas:
             
-            if roi < 0.05:
-                score_riesgo += 2
-            elif roi < 0.1:
-                score_riesgo += 1
+            # Generar recomendaciones
+            recomendaciones = self._generar_recomendaciones_riesgo(
+                nivel_riesgo, margen_bruto, ratio_endeudamiento, roi, liquidez
+            )
             
-            if score_riesgo >= 5:
-                nivel_riesgo = 'Alto'
-                probs_dict = {'Alto': 0.8, 'Medio': 0.15, 'Bajo': 0.05}
-            elif score_riesgo >= 2:
-                nivel_riesgo = 'Medio'
-                probs_dict = {'Alto': 0.2, 'Medio': 0.6, 'Bajo': 0.2}
-            else:
-                nivel_riesgo = 'Bajo'
-                probs_dict = {'Alto': 0.05, 'Medio': 0.2, 'Bajo': 0.75}
-        
-        # Generar recomendaciones
-        recomendaciones = self._generar_recomendaciones_riesgo(
-            nivel_riesgo, margen_bruto, ratio_endeudamiento, roi, liquidez
-        )
-        
-        return {
-            'nivel_riesgo': nivel_riesgo,
-            'probabilidades': probs_dict,
-            'color': {'Bajo': 'green', 'Medio': 'yellow', 'Alto': 'red'}[nivel_riesgo],
-            'indicadores': {
-                'margen_bruto': round(margen_bruto, 4),
-                'ratio_endeudamiento': round(ratio_endeudamiento, 4),
-                'roi': round(roi, 4),
-                'liquidez': round(liquidez, 4)
-            },
-            'recomendaciones': recomendaciones,
-            'modelo_usado': 'XGBoost' if self.modelos_cargados else 'Heurístico'
-        }
+            resultados.append({
+                'nivel_riesgo': nivel_riesgo,
+                'probabilidades': probs_dict,
+                'color': {'Bajo': 'green', 'Medio': 'yellow', 'Alto': 'red'}[nivel_riesgo],
+                'indicadores': indicadores,
+                'recomendaciones': recomendaciones,
+                'modelo_usado': modelo_usado
+            })
+        return resultados
+    
+    def _indicadores(self, X: pd.DataFrame) -> List[Dict[str, float]]:
+        """Indicadores derivados redondeados a 4 decimales, un dict por fila."""
+        return [
+            dict(zip(self.INDICADORES, fila))
+            for fila in np.round(X[self.INDICADORES].to_numpy(), 4).tolist()
+        ]
     
     def _generar_recomendaciones_riesgo(
         self, nivel: str, margen: float, endeudamiento: float, roi: float, liquidez: float
@@ -350,9 +587,49 @@ class SimulacionMonteCarlo:
     Clase para realizar simulaciones Monte Carlo en análisis financiero.
     """
     
-    def __init__(self, n_simulaciones: int = 10000, seed: int = 42):
+    # Memoria aproximada por bloque de simulaciones (matrices n × periodos)
+    MEMORIA_MAX_BLOQUE = 32 * 1024 * 1024
+    # Simulaciones por fragmento en modo paralelo y tamaño de la simulación piloto
+    TAMANO_FRAGMENTO = 100000
+    N_PILOTO = 10000
+    PRECISIONES = {'float64': np.float64, 'float32': np.float32}
+    METODOS = ('estandar', 'antitetico', 'variable_control', 'sobol')
+    # Secuencias de Sobol independientes para estimar el error estándar
+    REPLICAS_SOBOL = 16
+    # Cuantil normal del intervalo de confianza del 95%
+    Z_95 = float(stats.norm.ppf(0.975))
+    
+    def __init__(self, n_simulaciones: int = 10000, seed: Optional[int] = 42):
+        """
+        Args:
+            n_simulaciones: Número de simulaciones por llamada
+            seed: Semilla de la simulación (None = entropía del sistema)
+        
+        Cada instancia tiene su propio numpy.random.Generator, por lo que
+        solicitudes concurrentes no comparten el estado global de np.random.
+        """
         self.n_simulaciones = n_simulaciones
-        np.random.seed(seed)
+        if seed is None:
+            # Semilla aleatoria de 53 bits: se reporta en el JSON sin perder precisión
+            seed = int(np.random.SeedSequence().generate_state(1, np.uint64)[0] >> 11)
+        self.seed = int(seed)
+        self.secuencia_semilla = np.random.SeedSequence(self.seed)
+        self.rng = np.random.default_rng(self.secuencia_semilla)
+    
+    def generadores_independientes(self, n: int) -> List[np.random.Generator]:
+        """
+        Genera n flujos aleatorios independientes (SeedSequence.spawn).
+        
+        Permite repartir una simulación entre varios hilos o procesos de forma
+        reproducible: cada sub-flujo depende solo de la semilla y su índice.
+        """
+        return [np.random.default_rng(s) for s in self.secuencia_semilla.spawn(n)]
+    
+    def _tamano_bloque(self, periodos: int, dtype) -> int:
+        """Simulaciones por bloque para no superar MEMORIA_MAX_BLOQUE."""
+        # Se mantienen vivas ~3 matrices n × periodos: normales, flujos y factores
+        bytes_por_simulacion = 3 * max(1, periodos) * np.dtype(dtype).itemsize
+        return max(1, self.MEMORIA_MAX_BLOQUE // bytes_por_simulacion)
     
     def simular_van(
         self,
@@ -360,48 +637,399 @@ class SimulacionMonteCarlo:
         flujos_base: List[float],
         tasa_descuento_base: float,
         variacion_flujos: float = 0.15,
-        variacion_tasa: float = 0.02
+        variacion_tasa: float = 0.02,
+        precision: str = 'float64',
+        tamano_bloque: Optional[int] = None,
+        rng: Optional[np.random.Generator] = None,
+        n_procesos: Optional[int] = None,
+        metodo: str = 'estandar',
+        error_objetivo: Optional[float] = None,
+        semiancho_objetivo: Optional[float] = None,
+        tiempo_maximo: Optional[float] = None,
+        tamano_lote: int = 1024
     ) -> Dict[str, Any]:
         """
         Simula el VAN con variaciones en flujos de caja y tasa de descuento.
+        
+        Cada bloque sortea de una vez una matriz (simulaciones × periodos) de
+        flujos y un vector de tasas, y descuenta con factores (1 + r)⁻ᵗ por
+        broadcasting. precision='float32' reduce a la mitad memoria y ancho de
+        banda a costa de ~7 dígitos significativos. rng permite usar un
+        generador propio (p. ej. uno de generadores_independientes).
+        
+        Con n_procesos > 1 la simulación se reparte en fragmentos de
+        TAMANO_FRAGMENTO entre procesos (ver _simular_van_paralelo).
+        
+        metodo selecciona la técnica de reducción de varianza:
+            - 'estandar': muestreo aleatorio simple
+            - 'antitetico': cada sorteo Z se acompaña de -Z
+            - 'variable_control': corrige la media y las probabilidades con
+              el VAN descontado a la tasa base y el shock de la tasa, cuyas
+              esperanzas son conocidas
+            - 'sobol': cuasi Monte Carlo con REPLICAS_SOBOL secuencias de
+              Sobol aleatorizadas (scipy.stats.qmc)
+        En todos los casos se reporta el error estándar alcanzado.
+        
+        Parada adaptativa: si se indica error_objetivo (error estándar del VAN
+        medio), semiancho_objetivo (semiancho del intervalo de confianza del
+        95%) o tiempo_maximo (segundos), se simula en lotes de tamano_lote y
+        se para en cuanto se cumple el objetivo o se agota el tiempo;
+        n_simulaciones pasa a ser el máximo.
         """
-        resultados_van = []
+        if precision not in self.PRECISIONES:
+            raise ValueError(f"precision debe ser una de: {list(self.PRECISIONES)}")
+        if metodo not in self.METODOS:
+            raise ValueError(f"metodo debe ser uno de: {list(self.METODOS)}")
         
-        for _ in range(self.n_simulaciones):
-            # Simular flujos con distribución normal
-            flujos_simulados = [
-                max(0, np.random.normal(flujo, flujo * variacion_flujos))
-                for flujo in flujos_base
-            ]
+        parametros = (inversion_inicial, flujos_base, tasa_descuento_base,
+                      variacion_flujos, variacion_tasa, precision)
+        objetivo = self._objetivo_error(error_objetivo, semiancho_objetivo)
+        adaptativo = objetivo is not None or tiempo_maximo is not None
+        if n_procesos and n_procesos > 1 and self.n_simulaciones > self.TAMANO_FRAGMENTO and not adaptativo:
+            if metodo != 'estandar':
+                raise ValueError("El modo en procesos solo admite metodo='estandar'")
+            return self._simular_van_paralelo(parametros, n_procesos)
+        
+        rng = rng or self.rng
+        esperanza_control = None
+        if metodo == 'variable_control':
+            esperanza_control = np.array([self._esperanza_van_tasa_base(*parametros[:4]), 0.0])
+        
+        # Sin objetivo se simula todo en un único lote
+        lote = max(2, tamano_lote + tamano_lote % 2) if adaptativo else self.n_simulaciones
+        claves = ('van_medio', 'probabilidad_van_positivo', 'probabilidad_van_negativo')
+        acumuladores = {clave: AcumuladorWelford() for clave in claves}
+        coeficientes = {}
+        lotes = []
+        total = 0
+        inicio = time.perf_counter()
+        motivo = 'maximo'
+        
+        while total < self.n_simulaciones:
+            n = min(lote, self.n_simulaciones - total)
+            van, control = self._sortear_van(
+                n, *parametros, tamano_bloque=tamano_bloque, rng=rng, metodo=metodo
+            )
+            van = van.astype(np.float64, copy=False)
+            lotes.append(van)
+            total += n
             
-            # Simular tasa de descuento
-            tasa_simulada = max(0.01, np.random.normal(tasa_descuento_base, variacion_tasa))
+            valores = {
+                'van_medio': van,
+                'probabilidad_van_positivo': (van > 0).astype(np.float64),
+                'probabilidad_van_negativo': (van < 0).astype(np.float64)
+            }
+            for clave in claves:
+                if control is not None and clave not in coeficientes:
+                    # Coeficientes de la variable de control estimados con el primer lote
+                    coeficientes[clave] = self._coeficientes_control(valores[clave], control)
+                acumuladores[clave].agregar(self._unidades(
+                    valores[clave], metodo, control, coeficientes.get(clave), esperanza_control
+                ))
             
-            # Calcular VAN
-            van = -inversion_inicial
-            for t, flujo in enumerate(flujos_simulados, start=1):
-                van += flujo / ((1 + tasa_simulada) ** t)
+            motivo = self._criterio_parada(
+                acumuladores['van_medio'], objetivo, tiempo_maximo, inicio, len(lotes)
+            ) or motivo
+            if motivo != 'maximo':
+                break
+        
+        resultados_van = np.concatenate(lotes) if len(lotes) > 1 else lotes[0]
+        resultado = self._resumen_van(resultados_van)
+        
+        def acotar(p):
+            return min(max(p, 0.0), 1.0)
+        
+        resultado['van_medio'] = round(acumuladores['van_medio'].media, 2)
+        resultado['probabilidad_van_positivo'] = round(acotar(acumuladores['probabilidad_van_positivo'].media), 4)
+        resultado['probabilidad_van_negativo'] = round(acotar(acumuladores['probabilidad_van_negativo'].media), 4)
+        resultado['error_estandar'] = round(acumuladores['van_medio'].error_estandar() or 0.0, 4)
+        resultado['error_estandar_probabilidad'] = round(
+            acumuladores['probabilidad_van_positivo'].error_estandar() or 0.0, 6
+        )
+        resultado['metodo'] = metodo
+        resultado['precision'] = precision
+        resultado['semilla'] = self.seed
+        if adaptativo:
+            resultado['convergencia'] = self._resumen_convergencia(
+                acumuladores['van_medio'], motivo, error_objetivo, semiancho_objetivo,
+                tiempo_maximo, inicio, len(lotes), decimales=4
+            )
+        return resultado
+    
+    def _objetivo_error(self, error_objetivo: Optional[float],
+                        semiancho_objetivo: Optional[float]) -> Optional[float]:
+        """Error estándar objetivo combinando error y semiancho (el más exigente)."""
+        objetivos = []
+        for nombre, valor, divisor in (('error_objetivo', error_objetivo, 1.0),
+                                       ('semiancho_objetivo', semiancho_objetivo, self.Z_95)):
+            if valor is not None:
+                if valor <= 0:
+                    raise ValueError(f"{nombre} debe ser mayor a 0")
+                objetivos.append(valor / divisor)
+        return min(objetivos) if objetivos else None
+    
+    @staticmethod
+    def _criterio_parada(acumulador: AcumuladorWelford, objetivo: Optional[float],
+                         tiempo_maximo: Optional[float], inicio: float,
+                         n_lotes: int) -> Optional[str]:
+        """Motivo de parada ('precision' o 'tiempo') o None para seguir simulando."""
+        error = acumulador.error_estandar()
+        # Al menos dos lotes antes de confiar en la estimación del error
+        if objetivo is not None and n_lotes >= 2 and error is not None and error <= objetivo:
+            return 'precision'
+        if tiempo_maximo is not None and time.perf_counter() - inicio >= tiempo_maximo:
+            return 'tiempo'
+        return None
+    
+    def _resumen_convergencia(self, acumulador: AcumuladorWelford, motivo: str,
+                              error_objetivo: Optional[float], semiancho_objetivo: Optional[float],
+                              tiempo_maximo: Optional[float], inicio: float, n_lotes: int,
+                              decimales: int = 4) -> Dict[str, Any]:
+        error = acumulador.error_estandar() or 0.0
+        return {
+            'motivo_parada': motivo,
+            'objetivo_alcanzado': motivo == 'precision',
+            'error_objetivo': error_objetivo,
+            'semiancho_objetivo': semiancho_objetivo,
+            'semiancho_95': round(self.Z_95 * error, decimales),
+            'tiempo_maximo': tiempo_maximo,
+            'tiempo_segundos': round(time.perf_counter() - inicio, 4),
+            'lotes': n_lotes
+        }
+    
+    def _normales(self, n_simulaciones: int, dimension: int, dtype, bloque: int,
+                  rng: np.random.Generator, metodo: str):
+        """
+        Genera por bloques las normales estándar (simulaciones × dimension).
+        
+        'antitetico' intercala pares (Z, -Z) en filas consecutivas; 'sobol'
+        genera REPLICAS_SOBOL segmentos contiguos, cada uno con su propia
+        secuencia aleatorizada, para poder estimar el error estándar.
+        """
+        if metodo == 'sobol':
+            for segmento in np.array_split(np.arange(n_simulaciones), self.REPLICAS_SOBOL):
+                motor = qmc.Sobol(dimension, scramble=True, seed=rng)
+                for inicio in range(0, len(segmento), bloque):
+                    with warnings.catch_warnings():
+                        # Sobol advierte si n no es potencia de 2 (el estimador sigue siendo insesgado)
+                        warnings.simplefilter('ignore', UserWarning)
+                        u = motor.random(min(bloque, len(segmento) - inicio))
+                    yield stats.norm.ppf(np.clip(u, 1e-12, 1 - 1e-12)).astype(dtype, copy=False)
+            return
+        
+        for inicio in range(0, n_simulaciones, bloque):
+            n = min(bloque, n_simulaciones - inicio)
+            if metodo == 'antitetico':
+                z = rng.standard_normal(((n + 1) // 2, dimension), dtype=dtype)
+                normales = np.empty((2 * len(z), dimension), dtype=dtype)
+                normales[0::2] = z
+                normales[1::2] = -z
+                yield normales[:n]
+            else:
+                yield rng.standard_normal((n, dimension), dtype=dtype)
+    
+    def _sortear_van(
+        self,
+        n_simulaciones: int,
+        inversion_inicial: float,
+        flujos_base: List[float],
+        tasa_descuento_base: float,
+        variacion_flujos: float,
+        variacion_tasa: float,
+        precision: str,
+        tamano_bloque: Optional[int] = None,
+        rng: Optional[np.random.Generator] = None,
+        metodo: str = 'estandar'
+    ) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+        """
+        VAN de n_simulaciones trayectorias.
+        
+        Returns:
+            Tuple: (vector de VAN, matriz n×2 de variables de control si
+            metodo='variable_control', si no None)
+        """
+        rng = rng or self.rng
+        dtype = self.PRECISIONES[precision]
+        
+        flujos = np.asarray(flujos_base, dtype=dtype)
+        desviaciones = np.abs(flujos) * dtype(variacion_flujos)
+        periodos = np.arange(1, len(flujos) + 1, dtype=dtype)
+        factores_base = (1 + dtype(tasa_descuento_base)) ** -periodos
+        bloque = tamano_bloque or self._tamano_bloque(len(flujos), dtype)
+        if metodo == 'antitetico':
+            # Bloques pares para que ningún par (Z, -Z) quede partido
+            bloque += bloque % 2
+        
+        resultados_van = np.empty(n_simulaciones, dtype=dtype)
+        control = np.empty((n_simulaciones, 2), dtype=dtype) if metodo == 'variable_control' else None
+        inicio = 0
+        for normales in self._normales(n_simulaciones, len(flujos) + 1, dtype, bloque, rng, metodo):
+            n = len(normales)
             
-            resultados_van.append(van)
+            # Flujos ~ N(flujo, flujo · variación) truncados en 0
+            flujos_simulados = normales[:, :-1] * desviaciones
+            flujos_simulados += flujos
+            np.maximum(flujos_simulados, 0, out=flujos_simulados)
+            
+            # Tasa ~ N(tasa, variación) con piso de 1%
+            tasas = np.maximum(
+                0.01, tasa_descuento_base + variacion_tasa * normales[:, -1]
+            ).astype(dtype, copy=False)
+            
+            factores = (1 + tasas)[:, None] ** -periodos
+            resultados_van[inicio:inicio + n] = np.einsum('ij,ij->i', flujos_simulados, factores)
+            if control is not None:
+                # Mismos flujos descontados a la tasa base y el shock de la tasa
+                control[inicio:inicio + n, 0] = flujos_simulados @ factores_base
+                control[inicio:inicio + n, 1] = normales[:, -1]
+            inicio += n
+        
+        resultados_van -= dtype(inversion_inicial)
+        if control is not None:
+            control[:, 0] -= dtype(inversion_inicial)
+        return resultados_van, control
+    
+    @staticmethod
+    def _esperanza_van_tasa_base(inversion_inicial: float, flujos_base: List[float],
+                                 tasa_descuento_base: float, variacion_flujos: float) -> float:
+        """
+        Esperanza exacta de la variable de control: el VAN de los flujos
+        simulados descontados a la tasa base.
+        
+        Para F ~ N(μ, σ) truncado en 0: E[max(0, F)] = μ·Φ(μ/σ) + σ·φ(μ/σ).
+        """
+        mu = np.asarray(flujos_base, dtype=np.float64)
+        sigma = np.abs(mu) * variacion_flujos
+        with np.errstate(divide='ignore', invalid='ignore'):
+            z = np.where(sigma > 0, mu / sigma, 0.0)
+        esperanza = np.where(
+            sigma > 0, mu * stats.norm.cdf(z) + sigma * stats.norm.pdf(z), np.maximum(mu, 0.0)
+        )
+        periodos = np.arange(1, len(mu) + 1)
+        return float(esperanza @ (1 + tasa_descuento_base) ** -periodos - inversion_inicial)
+    
+    @staticmethod
+    def _coeficientes_control(valores: np.ndarray, control: np.ndarray) -> np.ndarray:
+        """Coeficientes b de la regresión de valores sobre las variables de control."""
+        x = control.astype(np.float64, copy=False)
+        if len(valores) < 2:
+            return np.zeros(x.shape[1])
+        return np.linalg.lstsq(x - x.mean(axis=0), valores - valores.mean(), rcond=None)[0]
+    
+    def _unidades(self, valores: np.ndarray, metodo: str,
+                  control: Optional[np.ndarray] = None,
+                  coeficientes: Optional[np.ndarray] = None,
+                  esperanza_control: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Observaciones independientes cuya media estima la de valores.
+        
+        Su desviación / √n es el error estándar de cada método:
+        - estandar: cada simulación
+        - antitetico: la media de cada par (Z, -Z)
+        - variable_control: Y - b·(X - E[X])
+        - sobol: la media de cada réplica aleatorizada
+        """
+        if metodo == 'antitetico':
+            return valores[:len(valores) - len(valores) % 2].reshape(-1, 2).mean(axis=1)
+        if metodo == 'sobol':
+            return np.array([r.mean() for r in np.array_split(valores, self.REPLICAS_SOBOL) if len(r)])
+        if metodo == 'variable_control' and control is not None:
+            return valores - (control.astype(np.float64, copy=False) - esperanza_control) @ coeficientes
+        return valores
+    
+    def _simular_van_paralelo(self, parametros: tuple, n_procesos: int) -> Dict[str, Any]:
+        """
+        Reparte la simulación del VAN entre procesos.
+        
+        Las simulaciones se dividen en fragmentos de tamaño fijo, cada uno con
+        su propia semilla hija (SeedSequence.spawn), de modo que el resultado
+        depende de la semilla y no del número de procesos. Cada proceso
+        devuelve un EstadisticasStreaming en lugar de sus valores; una
+        simulación piloto (que no se incluye en el resultado) fija los bordes
+        del histograma que comparten todos los fragmentos.
+        """
+        semillas = self.secuencia_semilla.spawn(1 + -(-self.n_simulaciones // self.TAMANO_FRAGMENTO))
+        piloto, _ = self._sortear_van(
+            self.N_PILOTO, *parametros, rng=np.random.default_rng(semillas[0])
+        )
+        bordes = EstadisticasStreaming.con_rango(float(piloto.min()), float(piloto.max())).bordes
+        
+        tamanos = [self.TAMANO_FRAGMENTO] * (len(semillas) - 1)
+        tamanos[-1] = self.n_simulaciones - self.TAMANO_FRAGMENTO * (len(tamanos) - 1)
+        
+        estadisticas = EstadisticasStreaming(bordes)
+        try:
+            ejecutor = _obtener_ejecutor_procesos(n_procesos)
+            futuros = [
+                ejecutor.submit(_fragmento_van, semilla, n, parametros, bordes)
+                for semilla, n in zip(semillas[1:], tamanos)
+            ]
+            for futuro in futuros:
+                estadisticas.combinar(futuro.result())
+        except BrokenProcessPool as e:
+            print(f"⚠️ Pool de procesos no disponible ({e}), simulando en este proceso")
+            _cerrar_ejecutor_procesos()
+            estadisticas = EstadisticasStreaming(bordes)
+            for semilla, n in zip(semillas[1:], tamanos):
+                estadisticas.combinar(_fragmento_van(semilla, n, parametros, bordes))
         
-        resultados_van = np.array(resultados_van)
+        resultado = self._resumen_streaming(estadisticas)
+        p = estadisticas.n_positivos / estadisticas.n
+        resultado['error_estandar'] = round(estadisticas.error_estandar() or 0.0, 4)
+        resultado['error_estandar_probabilidad'] = round(float(np.sqrt(p * (1 - p) / estadisticas.n)), 6)
+        resultado['metodo'] = 'estandar'
+        resultado['precision'] = parametros[-1]
+        resultado['semilla'] = self.seed
+        resultado['n_procesos'] = n_procesos
+        return resultado
+    
+    def _resumen_van(self, resultados_van: np.ndarray) -> Dict[str, Any]:
+        """Estadísticas de la distribución simulada del VAN."""
+        # Un solo cálculo de percentiles cubre mínimo, mediana, máximo, VaR e histograma
+        niveles = np.arange(0, 101, 5)
+        percentiles = np.percentile(resultados_van, niveles)
+        p5 = percentiles[1]
         
         return {
             'van_medio': round(float(np.mean(resultados_van)), 2),
-            'van_mediana': round(float(np.median(resultados_van)), 2),
+            'van_mediana': round(float(percentiles[10]), 2),
             'desviacion_estandar': round(float(np.std(resultados_van)), 2),
-            'van_minimo': round(float(np.min(resultados_van)), 2),
-            'van_maximo': round(float(np.max(resultados_van)), 2),
-            'percentil_5': round(float(np.percentile(resultados_van, 5)), 2),
-            'percentil_95': round(float(np.percentile(resultados_van, 95)), 2),
+            'van_minimo': round(float(percentiles[0]), 2),
+            'van_maximo': round(float(percentiles[-1]), 2),
+            'percentil_5': round(float(p5), 2),
+            'percentil_95': round(float(percentiles[19]), 2),
             'probabilidad_van_positivo': round(float(np.mean(resultados_van > 0)), 4),
             'probabilidad_van_negativo': round(float(np.mean(resultados_van < 0)), 4),
-            'var_95': round(float(np.percentile(resultados_van, 5)), 2),
-            'cvar_95': round(float(np.mean(resultados_van[resultados_van <= np.percentile(resultados_van, 5)])), 2),
-            'n_simulaciones': self.n_simulaciones,
+            'var_95': round(float(p5), 2),
+            'cvar_95': round(float(np.mean(resultados_van[resultados_van <= p5])), 2),
+            'n_simulaciones': len(resultados_van),
             'histograma_data': {
-                'valores': [round(v, 2) for v in np.percentile(resultados_van, np.arange(0, 101, 5)).tolist()],
-                'percentiles': list(range(0, 101, 5))
+                'valores': [round(v, 2) for v in percentiles.tolist()],
+                'percentiles': niveles.tolist()
+            }
+        }
+    
+    def _resumen_streaming(self, estadisticas: EstadisticasStreaming) -> Dict[str, Any]:
+        """Mismas claves que _resumen_van, calculadas sobre estadísticas combinadas."""
+        niveles = np.arange(0, 101, 5)
+        percentiles = [estadisticas.percentil(p) for p in niveles]
+        
+        return {
+            'van_medio': round(estadisticas.media, 2),
+            'van_mediana': round(percentiles[10], 2),
+            'desviacion_estandar': round(estadisticas.desviacion, 2),
+            'van_minimo': round(estadisticas.minimo, 2),
+            'van_maximo': round(estadisticas.maximo, 2),
+            'percentil_5': round(percentiles[1], 2),
+            'percentil_95': round(percentiles[19], 2),
+            'probabilidad_van_positivo': round(estadisticas.n_positivos / estadisticas.n, 4),
+            'probabilidad_van_negativo': round(estadisticas.n_negativos / estadisticas.n, 4),
+            'var_95': round(percentiles[1], 2),
+            'cvar_95': round(estadisticas.media_cola_inferior(5), 2),
+            'n_simulaciones': estadisticas.n,
+            'histograma_data': {
+                'valores': [round(v, 2) for v in percentiles],
+                'percentiles': niveles.tolist()
             }
         }
     
@@ -409,56 +1037,168 @@ class SimulacionMonteCarlo:
         self,
         inversion_inicial: float,
         flujos_base: List[float],
-        variacion_flujos: float = 0.15
+        variacion_flujos: float = 0.15,
+        rng: Optional[np.random.Generator] = None,
+        error_objetivo: Optional[float] = None,
+        semiancho_objetivo: Optional[float] = None,
+        tiempo_maximo: Optional[float] = None,
+        tamano_lote: int = 1024
     ) -> Dict[str, Any]:
         """
         Simula la TIR con variaciones en los flujos de caja.
+        
+        Admite la misma parada adaptativa que simular_van; error_objetivo y
+        semiancho_objetivo se expresan en puntos porcentuales de TIR.
         """
-        from scipy.optimize import newton
+        rng = rng or self.rng
+        objetivo = self._objetivo_error(error_objetivo, semiancho_objetivo)
+        adaptativo = objetivo is not None or tiempo_maximo is not None
+        lote = max(1, tamano_lote) if adaptativo else self.n_simulaciones
         
-        resultados_tir = []
+        acumulador = AcumuladorWelford()
+        lotes = []
+        total = 0
+        inicio = time.perf_counter()
+        motivo = 'maximo'
         
-        for _ in range(self.n_simulaciones):
-            flujos_simulados = [
-                max(0, np.random.normal(flujo, flujo * variacion_flujos))
-                for flujo in flujos_base
-            ]
-            
-            def van_funcion(tasa):
-                van = -inversion_inicial
-                for t, flujo in enumerate(flujos_simulados, start=1):
-                    van += flujo / ((1 + tasa) ** t)
-                return van
+        while total < self.n_simulaciones:
+            n = min(lote, self.n_simulaciones - total)
+            tirs = self._sortear_tir(n, inversion_inicial, flujos_base, variacion_flujos, rng)
+            # Solo se descartan trayectorias sin TIR en el rango del solver
+            tirs = tirs[~np.isnan(tirs)] * 100
+            lotes.append(tirs)
+            total += n
+            acumulador.agregar(tirs)
             
-            try:
-                tir = newton(van_funcion, x0=0.1, maxiter=50)
-                if -0.5 < tir < 2.0:  # TIR realista
-                    resultados_tir.append(tir)
-            except:
-                continue
+            motivo = self._criterio_parada(acumulador, objetivo, tiempo_maximo, inicio, len(lotes)) or motivo
+            if motivo != 'maximo':
+                break
         
-        if not resultados_tir:
+        if acumulador.n == 0:
             return {'error': 'No se pudo calcular la TIR en las simulaciones'}
         
-        resultados_tir = np.array(resultados_tir)
+        resultados_tir = np.concatenate(lotes)
         
-        return {
-            'tir_media': round(float(np.mean(resultados_tir)) * 100, 2),
-            'tir_mediana': round(float(np.median(resultados_tir)) * 100, 2),
-            'desviacion_estandar': round(float(np.std(resultados_tir)) * 100, 2),
-            'tir_minima': round(float(np.min(resultados_tir)) * 100, 2),
-            'tir_maxima': round(float(np.max(resultados_tir)) * 100, 2),
-            'percentil_5': round(float(np.percentile(resultados_tir, 5)) * 100, 2),
-            'percentil_95': round(float(np.percentile(resultados_tir, 95)) * 100, 2),
-            'simulaciones_exitosas': len(resultados_tir)
+        resultado = {
+            'tir_media': round(float(np.mean(resultados_tir)), 2),
+            'tir_mediana': round(float(np.median(resultados_tir)), 2),
+            'desviacion_estandar': round(float(np.std(resultados_tir)), 2),
+            'tir_minima': round(float(np.min(resultados_tir)), 2),
+            'tir_maxima': round(float(np.max(resultados_tir)), 2),
+            'percentil_5': round(float(np.percentile(resultados_tir, 5)), 2),
+            'percentil_95': round(float(np.percentile(resultados_tir, 95)), 2),
+            'error_estandar': round(acumulador.error_estandar() or 0.0, 4),
+            'simulaciones_exitosas': len(resultados_tir),
+            'simulaciones_sin_tir': total - len(resultados_tir),
+            'semilla': self.seed
         }
+        if adaptativo:
+            resultado['convergencia'] = self._resumen_convergencia(
+                acumulador, motivo, error_objetivo, semiancho_objetivo,
+                tiempo_maximo, inicio, len(lotes)
+            )
+        return resultado
+    
+    def _sortear_tir(self, n_simulaciones: int, inversion_inicial: float,
+                     flujos_base: List[float], variacion_flujos: float,
+                     rng: np.random.Generator) -> np.ndarray:
+        """
+        TIR (decimal) de n_simulaciones trayectorias de flujos; NaN si no existe.
+        
+        Se sortea la matriz (simulaciones × periodos) de flujos por bloques y
+        cada bloque se resuelve con resolver_tir_lote (Halley vectorizado con
+        máscara de convergencia por fila).
+        """
+        flujos = np.asarray(flujos_base, dtype=np.float64)
+        desviaciones = np.abs(flujos) * variacion_flujos
+        bloque = self._tamano_bloque(len(flujos) + 1, np.float64)
+        
+        tirs = np.empty(n_simulaciones)
+        for inicio in range(0, n_simulaciones, bloque):
+            n = min(bloque, n_simulaciones - inicio)
+            
+            # Misma distribución que simular_van: N(flujo, flujo · variación) truncada en 0
+            flujos_simulados = rng.standard_normal((n, len(flujos)))
+            flujos_simulados *= desviaciones
+            flujos_simulados += flujos
+            np.maximum(flujos_simulados, 0, out=flujos_simulados)
+            
+            coeficientes = np.column_stack([np.full(n, -float(inversion_inicial)), flujos_simulados])
+            tirs[inicio:inicio + n] = resolver_tir_lote(coeficientes)[0]
+        return tirs
+
+
+# Pool de procesos para Monte Carlo en paralelo (uno por proceso de gunicorn).
+# No se usa fork: los hilos de Flask/gunicorn pueden tener tomados locks (pool de
+# la base de datos, logging, BLAS) que los hijos heredarían bloqueados.
+_ejecutor_procesos = None
+_ejecutor_pid = None
+_ejecutor_lock = threading.Lock()
+_CONTEXTO_PROCESOS = multiprocessing.get_context(
+    'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+)
+
+
+def _obtener_ejecutor_procesos(n_procesos: int) -> ProcessPoolExecutor:
+    """Devuelve el pool de procesos compartido, creándolo si hace falta."""
+    global _ejecutor_procesos, _ejecutor_pid
+    with _ejecutor_lock:
+        # Un pool heredado por fork pertenece al proceso padre: no se reutiliza
+        if _ejecutor_procesos is not None and (
+            _ejecutor_pid != os.getpid() or _ejecutor_procesos._max_workers != n_procesos
+        ):
+            if _ejecutor_pid == os.getpid():
+                _ejecutor_procesos.shutdown(wait=False)
+            _ejecutor_procesos = None
+        if _ejecutor_procesos is None:
+            _ejecutor_procesos = ProcessPoolExecutor(max_workers=n_procesos, mp_context=_CONTEXTO_PROCESOS)
+            _ejecutor_pid = os.getpid()
+        return _ejecutor_procesos
+
+
+def _cerrar_ejecutor_procesos():
+    """Cierra el pool de procesos (se recrea en el siguiente uso)."""
+    global _ejecutor_procesos
+    with _ejecutor_lock:
+        if _ejecutor_procesos is not None and _ejecutor_pid == os.getpid():
+            _ejecutor_procesos.shutdown(wait=False)
+        _ejecutor_procesos = None
+
+
+def _fragmento_van(semilla: np.random.SeedSequence, n_simulaciones: int,
+                   parametros: tuple, bordes: np.ndarray) -> EstadisticasStreaming:
+    """Simula un fragmento del VAN y devuelve solo sus estadísticas (se ejecuta en otro proceso)."""
+    mc = SimulacionMonteCarlo(n_simulaciones=n_simulaciones, seed=0)
+    valores, _ = mc._sortear_van(n_simulaciones, *parametros, rng=np.random.default_rng(semilla))
+    return EstadisticasStreaming(bordes).agregar(valores)
 
 
 class AnalisisSensibilidad:
     """
     Clase para realizar análisis de sensibilidad en proyectos financieros.
+    
+    Las variables se evalúan sobre rejillas con broadcasting: cada variable
+    ocupa un eje y el VAN de todas las combinaciones se obtiene de
+        VAN = -I + m_flujos * (Σ_t F_t d_t(r) + Σ_{t variado} (F'_t - F_t) d_t(r))
+    con d_t(r) = (1 + r)^-t, sin bucles de Python por combinación.
+    
+    Variables: 'inversion', 'flujos' (multiplicador de todos los flujos),
+    'tasa' y 'flujo_<t>' (flujo del período t, desde 1).
     """
     
+    ETIQUETAS = {
+        'inversion': 'Inversión Inicial',
+        'flujos': 'Flujos de Caja',
+        'tasa': 'Tasa de Descuento'
+    }
+    TIPOS_REJILLA = ('multiplicador', 'absoluto')
+    PUNTOS_POR_DEFECTO = 21
+    MAX_PUNTOS_EJE = 10000
+    MAX_COMBINACIONES = 1000000
+    VARIABLES_EQUILIBRIO = ('inversion', 'flujos', 'tasa', 'horizonte')
+    # Cotas superiores sucesivas de la búsqueda de la tasa de equilibrio
+    TASAS_MAX_EQUILIBRIO = (10.0, 1000.0, 1000000.0)
+    
     @staticmethod
     def calcular_van(inversion: float, flujos: List[float], tasa: float) -> float:
         """Calcula el VAN de un proyecto."""
@@ -467,55 +1207,250 @@ class AnalisisSensibilidad:
             van += flujo / ((1 + tasa) ** t)
         return van
     
+    @staticmethod
+    def van_vectorizado(inversion, flujos, tasa) -> np.ndarray:
+        """
+        VAN de muchos escenarios a la vez.
+        
+        Args:
+            inversion: Escalar o array (n,)
+            flujos: Array (T,) o (n, T)
+            tasa: Escalar o array (n,)
+        """
+        flujos = np.asarray(flujos, dtype=np.float64)
+        tasa = np.asarray(tasa, dtype=np.float64)
+        periodos = np.arange(1, flujos.shape[-1] + 1)
+        descuento = (1 + tasa[..., None]) ** -periodos
+        return np.sum(flujos * descuento, axis=-1) - np.asarray(inversion, dtype=np.float64)
+    
+    def _valor_base(self, variable: str, inversion: float, flujos: List[float], tasa: float) -> float:
+        """Valor base de una variable (1.0 para el multiplicador 'flujos')."""
+        if variable == 'inversion':
+            return float(inversion)
+        if variable == 'tasa':
+            return float(tasa)
+        if variable == 'flujos':
+            return 1.0
+        if variable.startswith('flujo_'):
+            try:
+                periodo = int(variable[len('flujo_'):])
+            except ValueError:
+                periodo = 0
+            if 1 <= periodo <= len(flujos):
+                return float(flujos[periodo - 1])
+            raise ValueError(f"Período fuera de rango en '{variable}' (1 a {len(flujos)})")
+        raise ValueError(f"Variable no reconocida: {variable}. Opciones: "
+                         f"{list(self.ETIQUETAS)} o flujo_<período>")
+    
+    def etiqueta(self, variable: str) -> str:
+        if variable in self.ETIQUETAS:
+            return self.ETIQUETAS[variable]
+        return f"Flujo período {variable[len('flujo_'):]}"
+    
+    def _interpretar_variables(
+        self,
+        variables: Dict[str, Any],
+        inversion: float,
+        flujos: List[float],
+        tasa: float
+    ) -> List[Tuple[str, np.ndarray, float]]:
+        """
+        Convierte la especificación de cada variable en sus valores absolutos.
+        
+        Cada variable admite una lista de multiplicadores o un dict con
+        'valores', 'min'/'max'/'n' (rejilla uniforme) o 'bajo'/'alto', y
+        'tipo': 'multiplicador' (por defecto, relativo al valor base) o
+        'absoluto'.
+        
+        Returns:
+            Lista de (variable, valores absolutos, valor base)
+        """
+        if not isinstance(variables, dict) or not variables:
+            raise ValueError("Se requiere 'variables': objeto {variable: rejilla}")
+        
+        interpretadas = []
+        for variable, rejilla in variables.items():
+            base = self._valor_base(variable, inversion, flujos, tasa)
+            if isinstance(rejilla, (list, tuple)):
+                rejilla = {'valores': rejilla}
+            if not isinstance(rejilla, dict):
+                raise ValueError(f"Rejilla no válida para '{variable}'")
+            
+            tipo = rejilla.get('tipo', 'multiplicador')
+            if tipo not in self.TIPOS_REJILLA:
+                raise ValueError(f"Tipo de rejilla no válido: {tipo}. Opciones: {list(self.TIPOS_REJILLA)}")
+            if tipo == 'absoluto' and variable == 'flujos':
+                raise ValueError("'flujos' es un multiplicador; use flujo_<período> para valores absolutos")
+            
+            if 'valores' in rejilla:
+                valores = np.asarray(rejilla['valores'], dtype=np.float64)
+            elif 'min' in rejilla and 'max' in rejilla:
+                n = int(rejilla.get('n', self.PUNTOS_POR_DEFECTO))
+                if n < 2:
+                    raise ValueError(f"La rejilla de '{variable}' necesita al menos 2 puntos")
+                valores = np.linspace(float(rejilla['min']), float(rejilla['max']), n)
+            elif 'bajo' in rejilla and 'alto' in rejilla:
+                valores = np.array([rejilla['bajo'], rejilla['alto']], dtype=np.float64)
+            else:
+                raise ValueError(f"La rejilla de '{variable}' necesita 'valores', 'min'/'max' o 'bajo'/'alto'")
+            
+            if valores.ndim != 1 or not 0 < len(valores) <= self.MAX_PUNTOS_EJE:
+                raise ValueError(f"La rejilla de '{variable}' debe tener entre 1 y {self.MAX_PUNTOS_EJE} valores")
+            if not np.all(np.isfinite(valores)):
+                raise ValueError(f"La rejilla de '{variable}' contiene valores no numéricos")
+            if tipo == 'multiplicador':
+                valores = valores * base
+            if variable == 'tasa' and np.any(valores <= -1):
+                raise ValueError("La tasa de descuento debe ser mayor a -100%")
+            interpretadas.append((variable, valores, base))
+        return interpretadas
+    
+    @staticmethod
+    def _van_rejilla(
+        inversion: float,
+        flujos: List[float],
+        tasa: float,
+        variables: List[Tuple[str, np.ndarray, float]]
+    ) -> np.ndarray:
+        """VAN de todas las combinaciones de las variables; un eje por variable."""
+        k = len(variables)
+        forma = tuple(len(valores) for _, valores, _ in variables)
+        
+        ejes = {variable: i for i, (variable, _, _) in enumerate(variables)}
+        
+        def eje(variable):
+            """Valores de la variable con forma para broadcasting en su eje."""
+            i = ejes[variable]
+            return variables[i][1].reshape([-1 if j == i else 1 for j in range(k)])
+        
+        F = np.asarray(flujos, dtype=np.float64)
+        tasa_eje = eje('tasa') if 'tasa' in ejes else np.full([1] * k, float(tasa))
+        descuento = (1 + tasa_eje[..., None]) ** -np.arange(1, len(F) + 1)
+        valor_presente = descuento @ F
+        
+        for variable in ejes:
+            if variable.startswith('flujo_'):
+                periodo = int(variable[len('flujo_'):]) - 1
+                valor_presente = valor_presente + (eje(variable) - F[periodo]) * descuento[..., periodo]
+        if 'flujos' in ejes:
+            valor_presente = eje('flujos') * valor_presente
+        inversion_eje = eje('inversion') if 'inversion' in ejes else float(inversion)
+        
+        return np.broadcast_to(valor_presente - inversion_eje, forma)
+    
+    def superficie_sensibilidad(
+        self,
+        inversion_inicial: float,
+        flujos_base: List[float],
+        tasa_base: float,
+        variables: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        """
+        VAN sobre el producto cartesiano de las rejillas de las variables
+        (p. ej. 50×50 multiplicador de flujos × tasa para un mapa de calor).
+        
+        Returns:
+            'ejes' (variable y valores de cada eje, en orden) y 'van', lista
+            anidada con un nivel por eje: van[i][j] corresponde a
+            ejes[0].valores[i] y ejes[1].valores[j]
+        """
+        interpretadas = self._interpretar_variables(variables, inversion_inicial, flujos_base, tasa_base)
+        n_combinaciones = int(np.prod([len(valores) for _, valores, _ in interpretadas]))
+        if n_combinaciones > self.MAX_COMBINACIONES:
+            raise ValueError(f"Demasiadas combinaciones ({n_combinaciones}); máximo {self.MAX_COMBINACIONES}")
+        
+        van = self._van_rejilla(inversion_inicial, flujos_base, tasa_base, interpretadas)
+        peor = np.unravel_index(np.argmin(van), van.shape)
+        mejor = np.unravel_index(np.argmax(van), van.shape)
+        
+        return {
+            'van_base': round(self.calcular_van(inversion_inicial, flujos_base, tasa_base), 2),
+            'ejes': [self._describir_eje(variable, valores, base) for variable, valores, base in interpretadas],
+            'van': np.round(van, 2).tolist(),
+            'n_combinaciones': n_combinaciones,
+            'resumen': {
+                'van_minimo': round(float(van[peor]), 2),
+                'van_maximo': round(float(van[mejor]), 2),
+                'fraccion_positiva': round(float(np.mean(van > 0)), 4),
+                'peor_combinacion': {v: round(float(valores[i]), 6) for (v, valores, _), i in zip(interpretadas, peor)},
+                'mejor_combinacion': {v: round(float(valores[i]), 6) for (v, valores, _), i in zip(interpretadas, mejor)}
+            }
+        }
+    
+    def sensibilidad_univariada(
+        self,
+        inversion_inicial: float,
+        flujos_base: List[float],
+        tasa_base: float,
+        variables: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        """
+        VAN al mover cada variable por su rejilla con las demás en su valor
+        base (gráfico de araña). Las series se ordenan por rango de VAN.
+        """
+        interpretadas = self._interpretar_variables(variables, inversion_inicial, flujos_base, tasa_base)
+        
+        series = []
+        for variable, valores, base in interpretadas:
+            van = self._van_rejilla(inversion_inicial, flujos_base, tasa_base, [(variable, valores, base)])
+            series.append(dict(
+                self._describir_eje(variable, valores, base),
+                van=np.round(van, 2).tolist(),
+                van_minimo=round(float(van.min()), 2),
+                van_maximo=round(float(van.max()), 2),
+                rango=round(float(van.max() - van.min()), 2)
+            ))
+        series.sort(key=lambda x: x['rango'], reverse=True)
+        
+        return {
+            'van_base': round(self.calcular_van(inversion_inicial, flujos_base, tasa_base), 2),
+            'series': series,
+            'variable_mas_sensible': series[0]['etiqueta']
+        }
+    
+    def _describir_eje(self, variable: str, valores: np.ndarray, base: float) -> Dict[str, Any]:
+        return {
+            'variable': variable,
+            'etiqueta': self.etiqueta(variable),
+            'valor_base': round(base, 6),
+            'valores': np.round(valores, 6).tolist(),
+            'multiplicadores': np.round(valores / base, 6).tolist() if base != 0 else None
+        }
+    
     def analisis_tornado(
         self,
         inversion_inicial: float,
         flujos_base: List[float],
         tasa_base: float,
-        variacion: float = 0.20
+        variacion: float = 0.20,
+        variables: Optional[List[str]] = None
     ) -> Dict[str, Any]:
         """
         Análisis de tornado para comparar sensibilidad de múltiples variables.
+        
+        Args:
+            variables: Variables a mover ±variacion (por defecto inversión,
+                flujos y tasa; admite también flujo_<período>)
         """
-        van_base = self.calcular_van(inversion_inicial, flujos_base, tasa_base)
+        variables = variables or list(self.ETIQUETAS)
+        rejillas = {variable: [1 - variacion, 1 + variacion] for variable in variables}
+        interpretadas = self._interpretar_variables(rejillas, inversion_inicial, flujos_base, tasa_base)
         
         resultados_tornado = []
-        
-        # Análisis para inversión
-        van_inv_bajo = self.calcular_van(inversion_inicial * (1 - variacion), flujos_base, tasa_base)
-        van_inv_alto = self.calcular_van(inversion_inicial * (1 + variacion), flujos_base, tasa_base)
-        resultados_tornado.append({
-            'variable': 'Inversión Inicial',
-            'van_bajo': round(van_inv_alto, 2),
-            'van_alto': round(van_inv_bajo, 2),
-            'rango': round(abs(van_inv_alto - van_inv_bajo), 2)
-        })
-        
-        # Análisis para flujos
-        van_flujos_bajo = self.calcular_van(inversion_inicial, [f * (1 - variacion) for f in flujos_base], tasa_base)
-        van_flujos_alto = self.calcular_van(inversion_inicial, [f * (1 + variacion) for f in flujos_base], tasa_base)
-        resultados_tornado.append({
-            'variable': 'Flujos de Caja',
-            'van_bajo': round(van_flujos_bajo, 2),
-            'van_alto': round(van_flujos_alto, 2),
-            'rango': round(abs(van_flujos_alto - van_flujos_bajo), 2)
-        })
-        
-        # Análisis para tasa
-        van_tasa_bajo = self.calcular_van(inversion_inicial, flujos_base, tasa_base * (1 - variacion))
-        van_tasa_alto = self.calcular_van(inversion_inicial, flujos_base, tasa_base * (1 + variacion))
-        resultados_tornado.append({
-            'variable': 'Tasa de Descuento',
-            'van_bajo': round(van_tasa_alto, 2),
-            'van_alto': round(van_tasa_bajo, 2),
-            'rango': round(abs(van_tasa_alto - van_tasa_bajo), 2)
-        })
+        for variable, valores, base in interpretadas:
+            van = self._van_rejilla(inversion_inicial, flujos_base, tasa_base, [(variable, valores, base)])
+            resultados_tornado.append({
+                'variable': self.etiqueta(variable),
+                'van_bajo': round(float(van.min()), 2),
+                'van_alto': round(float(van.max()), 2),
+                'rango': round(float(van.max() - van.min()), 2)
+            })
         
         # Ordenar por impacto
         resultados_tornado.sort(key=lambda x: x['rango'], reverse=True)
         
         return {
-            'van_base': round(van_base, 2),
+            'van_base': round(self.calcular_van(inversion_inicial, flujos_base, tasa_base), 2),
             'variacion_aplicada': variacion,
             'resultados': resultados_tornado,
             'variable_mas_sensible': resultados_tornado[0]['variable']
@@ -530,6 +1465,9 @@ class AnalisisSensibilidad:
     ) -> Dict[str, Any]:
         """
         Análisis de escenarios: pesimista, base, optimista.
+        
+        Cada escenario indica flujos_mult y tasa_mult (e inversion_mult,
+        opcional); todos se evalúan en una sola operación vectorizada.
         """
         if escenarios_config is None:
             escenarios_config = {
@@ -538,16 +1476,20 @@ class AnalisisSensibilidad:
                 'optimista': {'flujos_mult': 1.25, 'tasa_mult': 0.85}
             }
         
-        resultados = {}
+        nombres = list(escenarios_config)
+        flujos_mult = np.array([escenarios_config[n]['flujos_mult'] for n in nombres], dtype=np.float64)
+        tasas = tasa_base * np.array([escenarios_config[n]['tasa_mult'] for n in nombres], dtype=np.float64)
+        inversiones = inversion_inicial * np.array(
+            [escenarios_config[n].get('inversion_mult', 1.0) for n in nombres], dtype=np.float64
+        )
+        flujos_esc = flujos_mult[:, None] * np.asarray(flujos_base, dtype=np.float64)
+        vans = self.van_vectorizado(inversiones, flujos_esc, tasas)
         
-        for nombre, config in escenarios_config.items():
-            flujos_esc = [f * config['flujos_mult'] for f in flujos_base]
-            tasa_esc = tasa_base * config['tasa_mult']
-            van = self.calcular_van(inversion_inicial, flujos_esc, tasa_esc)
-            
+        resultados = {}
+        for nombre, van, flujos, tasa_esc in zip(nombres, vans.tolist(), np.round(flujos_esc, 2).tolist(), tasas.tolist()):
             resultados[nombre] = {
                 'van': round(van, 2),
-                'flujos': [round(f, 2) for f in flujos_esc],
+                'flujos': flujos,
                 'tasa': round(tasa_esc, 4),
                 'decision': 'ACEPTAR' if van > 0 else 'RECHAZAR'
             }
@@ -580,54 +1522,409 @@ class AnalisisSensibilidad:
         variable: str = 'flujos'
     ) -> Dict[str, Any]:
         """
-        Calcula el punto de equilibrio (VAN = 0) para una variable.
+        Calcula el punto de equilibrio (VAN = 0) para una variable o para todas.
+        
+        Con VP = Σ F_t (1 + r)^-t el VAN es lineal en la inversión, en el
+        multiplicador de flujos y en cada flujo, así que esos equilibrios son
+        cerrados: I* = VP, m* = I / VP y F_t* = F_t - VAN (1 + r)^t. La tasa se
+        obtiene con el solver de TIR, ampliando el rango si no hay raíz, y el
+        horizonte es el primer período en que el VP acumulado cubre la
+        inversión. Descuentos y VP se calculan una sola vez para todas.
+        
+        Args:
+            variable: 'inversion', 'flujos', 'tasa', 'horizonte', 'flujo_<t>' o
+                'todas' (todos los equilibrios en una llamada)
         """
-        from scipy.optimize import brentq
+        if not flujos_base:
+            raise ValueError("Se requiere al menos un flujo de caja")
+        if tasa_base <= -1:
+            raise ValueError("La tasa de descuento debe ser mayor a -100%")
         
-        van_base = self.calcular_van(inversion_inicial, flujos_base, tasa_base)
+        inversion = float(inversion_inicial)
+        flujos = np.asarray(flujos_base, dtype=np.float64)
+        descuento = (1 + float(tasa_base)) ** -np.arange(1, len(flujos) + 1)
+        presentes = flujos * descuento
+        van_base = float(presentes.sum()) - inversion
         
-        if variable == 'flujos':
-            def objetivo(mult):
-                flujos_mod = [f * mult for f in flujos_base]
-                return self.calcular_van(inversion_inicial, flujos_mod, tasa_base)
-            
+        def equilibrio(nombre):
+            if nombre == 'inversion':
+                return self._equilibrio_inversion(inversion, van_base)
+            if nombre == 'flujos':
+                return self._equilibrio_flujos(inversion, van_base)
+            if nombre == 'tasa':
+                return self._equilibrio_tasa(inversion, flujos_base, tasa_base)
+            if nombre == 'horizonte':
+                return self._equilibrio_horizonte(inversion, presentes)
+            return self._equilibrio_flujo(nombre, flujos, descuento, van_base)
+        
+        if variable == 'todas':
+            nombres = list(self.VARIABLES_EQUILIBRIO) + [f'flujo_{t}' for t in range(1, len(flujos) + 1)]
+            return {
+                'van_base': round(van_base, 2),
+                'equilibrios': {nombre: equilibrio(nombre) for nombre in nombres}
+            }
+        if variable in self.VARIABLES_EQUILIBRIO or variable.startswith('flujo_'):
             try:
-                multiplicador = brentq(objetivo, 0.1, 3.0)
-                variacion_necesaria = (multiplicador - 1) * 100
-                return {
-                    'variable': 'Flujos de Caja',
-                    'multiplicador_equilibrio': round(multiplicador, 4),
-                    'variacion_necesaria_pct': round(variacion_necesaria, 2),
-                    'interpretacion': f"Los flujos pueden reducirse hasta {-variacion_necesaria:.1f}% antes de que el VAN sea negativo" if variacion_necesaria < 0 else f"Los flujos deben aumentar {variacion_necesaria:.1f}% para que el VAN sea positivo"
-                }
-            except:
-                return {'error': 'No se encontró punto de equilibrio en el rango analizado'}
-        
-        elif variable == 'tasa':
-            def objetivo(tasa):
-                return self.calcular_van(inversion_inicial, flujos_base, tasa)
-            
+                return equilibrio(variable)
+            except ValueError as e:
+                return {'error': str(e)}
+        return {'error': f'Variable no reconocida: {variable}'}
+    
+    @staticmethod
+    def _equilibrio_inversion(inversion: float, van_base: float) -> Dict[str, Any]:
+        """I* = VP: inversión máxima con la que el VAN no es negativo."""
+        equilibrio = inversion + van_base
+        resultado = {
+            'variable': 'Inversión Inicial',
+            'inversion_equilibrio': round(equilibrio, 2),
+            'variacion_necesaria_pct': round(van_base / inversion * 100, 2) if inversion else None
+        }
+        if van_base >= 0:
+            resultado['interpretacion'] = f"La inversión puede aumentar hasta {equilibrio:,.2f} antes de que el VAN sea negativo"
+        else:
+            resultado['interpretacion'] = f"La inversión debe reducirse a {equilibrio:,.2f} para que el VAN sea positivo"
+        return resultado
+    
+    @staticmethod
+    def _equilibrio_flujos(inversion: float, van_base: float) -> Dict[str, Any]:
+        """m* = I / VP: multiplicador común de los flujos que anula el VAN."""
+        valor_presente = inversion + van_base
+        if valor_presente == 0 or inversion / valor_presente <= 0:
+            return {'error': 'No existe un multiplicador positivo de los flujos que anule el VAN'}
+        multiplicador = inversion / valor_presente
+        variacion_necesaria = (multiplicador - 1) * 100
+        return {
+            'variable': 'Flujos de Caja',
+            'multiplicador_equilibrio': round(multiplicador, 4),
+            'variacion_necesaria_pct': round(variacion_necesaria, 2),
+            'interpretacion': f"Los flujos pueden reducirse hasta {-variacion_necesaria:.1f}% antes de que el VAN sea negativo" if variacion_necesaria < 0 else f"Los flujos deben aumentar {variacion_necesaria:.1f}% para que el VAN sea positivo"
+        }
+    
+    def _equilibrio_flujo(self, variable: str, flujos: np.ndarray, descuento: np.ndarray,
+                          van_base: float) -> Dict[str, Any]:
+        """F_t* = F_t - VAN (1 + r)^t: valor del flujo del período t que anula el VAN."""
+        flujo = self._valor_base(variable, 0.0, flujos, 0.0)
+        periodo = int(variable[len('flujo_'):])
+        equilibrio = flujo - van_base / descuento[periodo - 1]
+        resultado = {
+            'variable': self.etiqueta(variable),
+            'periodo': periodo,
+            'flujo_equilibrio': round(equilibrio, 2),
+            'variacion_necesaria_pct': round((equilibrio / flujo - 1) * 100, 2) if flujo else None
+        }
+        if van_base >= 0:
+            resultado['interpretacion'] = f"El flujo del período {periodo} puede bajar hasta {equilibrio:,.2f} antes de que el VAN sea negativo"
+        else:
+            resultado['interpretacion'] = f"El flujo del período {periodo} debe llegar a {equilibrio:,.2f} para que el VAN sea positivo"
+        return resultado
+    
+    def _equilibrio_tasa(self, inversion: float, flujos_base: List[float], tasa_base: float) -> Dict[str, Any]:
+        """
+        TIR por el solver de solver_tir; si no hay raíz en el rango habitual
+        se amplía la cota superior (proyectos con TIR muy altas).
+        """
+        coeficientes = flujos_con_inversion(inversion, flujos_base)
+        for tasa_max in self.TASAS_MAX_EQUILIBRIO:
+            solucion = resolver_tir(coeficientes, tasa_max=tasa_max, tasa_inicial=tasa_base)
+            if solucion['tir'] is not None or solucion['cambios_signo'] == 0:
+                break
+        
+        tasa_equilibrio = solucion['tir']
+        if tasa_equilibrio is None:
+            return {'error': 'No se encontró punto de equilibrio en el rango analizado'}
+        resultado = {
+            'variable': 'Tasa de Descuento',
+            'tasa_equilibrio': round(tasa_equilibrio, 4),
+            'tasa_equilibrio_pct': round(tasa_equilibrio * 100, 2),
+            'margen_seguridad': round((tasa_equilibrio - tasa_base) * 100, 2),
+            'interpretacion': f"La TIR del proyecto es {tasa_equilibrio*100:.2f}%, con un margen de {(tasa_equilibrio - tasa_base)*100:.2f}% sobre la tasa de descuento"
+        }
+        if solucion['multiples']:
+            resultado['tasas_equilibrio'] = [round(t, 4) for t in solucion['tirs']]
+            resultado['interpretacion'] += " (el proyecto tiene varias TIR; se reporta la más cercana a la tasa de descuento)"
+        return resultado
+    
+    @staticmethod
+    def _equilibrio_horizonte(inversion: float, presentes: np.ndarray) -> Dict[str, Any]:
+        """
+        Primer horizonte en que el VP acumulado iguala la inversión (payback
+        descontado), interpolando linealmente dentro del período del cruce.
+        """
+        periodos = len(presentes)
+        acumulado = np.concatenate(([-inversion], np.cumsum(presentes) - inversion))
+        if acumulado[0] >= 0:
+            horizonte = 0.0
+        else:
+            cruces = np.flatnonzero(acumulado[1:] >= 0)
+            if len(cruces) == 0:
+                return {'error': f'La inversión no se recupera dentro del horizonte de {periodos} períodos'}
+            k = int(cruces[0])
+            horizonte = k + float(-acumulado[k] / (acumulado[k + 1] - acumulado[k]))
+        return {
+            'variable': 'Horizonte',
+            'periodo_equilibrio': round(horizonte, 2),
+            'periodos_totales': periodos,
+            'margen_periodos': round(periodos - horizonte, 2),
+            'interpretacion': f"La inversión se recupera en valor presente a los {horizonte:.2f} de {periodos} períodos"
+        }
+
+
+class RegistroModelos:
+    """
+    Versiones de los modelos ML y cambio en caliente de la versión activa.
+    
+    Cada versión es un directorio con los artefactos de ServicioML: ml/modelos
+    mismo o un subdirectorio ml/modelos/<version>. El archivo VERSION_ACTIVA
+    de ml/modelos guarda el subdirectorio en uso, para que todos los workers
+    (cada uno con su registro) converjan a la misma versión.
+    
+    Una recarga construye y precarga un ServicioML nuevo fuera de las
+    predicciones y después reemplaza la referencia activa en una sola
+    asignación: las predicciones en curso terminan con el servicio que ya
+    tenían y las siguientes usan el nuevo, sin bloqueos ni arranque en frío.
+    """
+    
+    ARCHIVO_VERSION_ACTIVA = 'VERSION_ACTIVA'
+    PATRON_VERSION = re.compile(r'^[A-Za-z0-9][A-Za-z0-9._-]*$')
+    MAX_HISTORIAL = 20
+    
+    def __init__(self, directorio_base: Optional[str] = None, mmap_modo: Optional[str] = 'r',
+                 **opciones_servicio):
+        """
+        Args:
+            directorio_base: Directorio de versiones (por defecto ml/modelos)
+            mmap_modo, **opciones_servicio: Argumentos de cada ServicioML creado
+        """
+        self.directorio_base = directorio_base or ServicioML.DIRECTORIO_MODELOS
+        self.opciones_servicio = dict(opciones_servicio, mmap_modo=mmap_modo)
+        self.servicio = None
+        self.activa = None
+        self.historial = []
+        self.intervalo_vigilancia = 0.0
+        self._firma_activa = None
+        self._lock_recarga = threading.Lock()
+        self._pid_vigilancia = None
+    
+    def _directorio(self, version: Optional[str]) -> str:
+        """Directorio de una versión ('.' o None es ml/modelos mismo)."""
+        if version in (None, '', '.'):
+            return self.directorio_base
+        if not self.PATRON_VERSION.match(version):
+            raise ValueError(f"Nombre de versión no válido: {version}")
+        directorio = os.path.join(self.directorio_base, version)
+        if not os.path.isdir(directorio):
+            raise ValueError(f"No existe la versión de modelos: {version}")
+        return directorio
+    
+    def version_configurada(self) -> str:
+        """Versión indicada por VERSION_ACTIVA ('.' si no hay archivo)."""
+        try:
+            with open(os.path.join(self.directorio_base, self.ARCHIVO_VERSION_ACTIVA)) as f:
+                return f.read().strip() or '.'
+        except OSError:
+            return '.'
+    
+    def versiones_disponibles(self) -> List[str]:
+        """Directorios que contienen al menos un artefacto de modelo."""
+        if not os.path.isdir(self.directorio_base):
+            return []
+        candidatas = ['.'] + sorted(
+            nombre for nombre in os.listdir(self.directorio_base)
+            if self.PATRON_VERSION.match(nombre) and os.path.isdir(os.path.join(self.directorio_base, nombre))
+        )
+        return [
+            version for version in candidatas
+            if any(os.path.exists(os.path.join(self._directorio(version), archivo))
+                   for archivo in ServicioML.ARTEFACTOS.values())
+        ]
+    
+    @staticmethod
+    def _firma(directorio: str) -> tuple:
+        """Tamaño y fecha de modificación de los artefactos (comprobación barata de cambios)."""
+        firma = []
+        for archivo in ServicioML.ARTEFACTOS.values():
             try:
-                tasa_equilibrio = brentq(objetivo, 0.001, 1.0)
-                return {
-                    'variable': 'Tasa de Descuento',
-                    'tasa_equilibrio': round(tasa_equilibrio, 4),
-                    'tasa_equilibrio_pct': round(tasa_equilibrio * 100, 2),
-                    'margen_seguridad': round((tasa_equilibrio - tasa_base) * 100, 2),
-                    'interpretacion': f"La TIR del proyecto es {tasa_equilibrio*100:.2f}%, con un margen de {(tasa_equilibrio - tasa_base)*100:.2f}% sobre la tasa de descuento"
-                }
-            except:
-                return {'error': 'No se encontró punto de equilibrio en el rango analizado'}
+                info = os.stat(os.path.join(directorio, archivo))
+                firma.append((archivo, info.st_size, info.st_mtime_ns))
+            except OSError:
+                firma.append((archivo, None, None))
+        return tuple(firma)
+    
+    @staticmethod
+    def checksum(directorio: str) -> str:
+        """SHA-256 del contenido de todos los artefactos de un directorio."""
+        sha = hashlib.sha256()
+        for archivo in ServicioML.ARTEFACTOS.values():
+            ruta = os.path.join(directorio, archivo)
+            if not os.path.exists(ruta):
+                continue
+            sha.update(archivo.encode())
+            with open(ruta, 'rb') as f:
+                for bloque in iter(lambda: f.read(1 << 20), b''):
+                    sha.update(bloque)
+        return sha.hexdigest()
+    
+    def cargar(self, version: Optional[str] = None, forzar: bool = False,
+               precargar: bool = True, fijar: bool = False) -> Dict[str, Any]:
+        """
+        Carga una versión y la activa.
         
-        return {'error': f'Variable no reconocida: {variable}'}
+        Args:
+            version: Subdirectorio de ml/modelos ('.' para el raíz); por
+                defecto la indicada en VERSION_ACTIVA
+            forzar: Recargar aunque el contenido no haya cambiado
+            precargar: Cargar todos los artefactos antes del cambio
+            fijar: Escribir la versión en VERSION_ACTIVA para el resto de workers
+            
+        Returns:
+            Información de la versión activa y si hubo cambio
+        """
+        with self._lock_recarga:
+            version = version or self.version_configurada()
+            directorio = self._directorio(version)
+            firma = self._firma(directorio)
+            
+            if fijar:
+                self._fijar_version(version)
+            misma_version = not forzar and self.activa is not None and self.activa['directorio'] == version
+            if misma_version and firma == self._firma_activa:
+                return dict(self.activa, cambiada=False)
+            # El SHA-256 lee todos los artefactos: solo si la firma cambió
+            checksum = self.checksum(directorio)
+            if misma_version and self.activa['checksum'] == checksum:
+                self._firma_activa = firma
+                return dict(self.activa, cambiada=False)
+            
+            servicio = ServicioML(modelos_dir=directorio, **self.opciones_servicio)
+            inicio = time.perf_counter()
+            if precargar:
+                servicio.precargar_modelos()
+            
+            metadatos = servicio.metadatos if isinstance(servicio.metadatos, dict) else {}
+            info = {
+                'version': str(metadatos.get('version') or checksum[:12]),
+                'checksum': checksum,
+                'directorio': version,
+                'modelos_disponibles': servicio.modelos_cargados,
+                'metadatos': _valores_json(metadatos),
+                'tiempo_carga_ms': round((time.perf_counter() - inicio) * 1000, 2),
+                'cargada_en': datetime.now().isoformat(timespec='seconds')
+            }
+            servicio.version = info
+            
+            # Cambio atómico: una sola asignación de referencia; las predicciones
+            # en caché de la versión anterior dejan de servir
+            anterior, self.servicio = self.servicio, servicio
+            if anterior is not None:
+                anterior.cache.limpiar()
+            self.activa = info
+            self._firma_activa = firma
+            self.historial = (self.historial + [info])[-self.MAX_HISTORIAL:]
+            print(f"🔄 Modelos ML versión {info['version']} activos ({version})")
+            return dict(info, cambiada=True)
+    
+    def _fijar_version(self, version: str):
+        """Escribe VERSION_ACTIVA de forma atómica (archivo temporal + os.replace)."""
+        ruta = os.path.join(self.directorio_base, self.ARCHIVO_VERSION_ACTIVA)
+        temporal = f"{ruta}.{os.getpid()}.tmp"
+        with open(temporal, 'w') as f:
+            f.write(version)
+        os.replace(temporal, ruta)
+    
+    def comprobar_cambios(self) -> bool:
+        """Recarga si cambió la versión configurada o sus archivos. True si hubo cambio."""
+        version = self.version_configurada()
+        try:
+            directorio = self._directorio(version)
+        except ValueError as e:
+            print(f"⚠️ VERSION_ACTIVA no válida: {e}")
+            return False
+        if self.activa is not None and self.activa['directorio'] == version and self._firma(directorio) == self._firma_activa:
+            return False
+        return self.cargar(version)['cambiada']
+    
+    def asegurar_vigilancia(self):
+        """
+        Arranca (una vez por proceso) el hilo que comprueba cambios cada
+        intervalo_vigilancia segundos. Los hilos no sobreviven al fork, por
+        eso se arranca desde el worker al pedir el servicio.
+        """
+        if self.intervalo_vigilancia <= 0 or self._pid_vigilancia == os.getpid():
+            return
+        with self._lock_recarga:
+            if self._pid_vigilancia == os.getpid():
+                return
+            self._pid_vigilancia = os.getpid()
+        threading.Thread(target=self._vigilar, name='vigilancia-modelos-ml', daemon=True).start()
+    
+    def _vigilar(self):
+        while True:
+            time.sleep(self.intervalo_vigilancia)
+            try:
+                self.comprobar_cambios()
+            except Exception as e:
+                print(f"⚠️ Error comprobando nuevas versiones de modelos: {e}")
+
+
+def _valores_json(datos: Dict[str, Any]) -> Dict[str, Any]:
+    """Metadatos convertidos a tipos serializables en JSON."""
+    resultado = {}
+    for clave, valor in datos.items():
+        if isinstance(valor, np.generic):
+            valor = valor.item()
+        if isinstance(valor, dict):
+            valor = _valores_json(valor)
+        elif isinstance(valor, (list, tuple, np.ndarray)):
+            valor = [v.item() if isinstance(v, np.generic) else v for v in list(valor)]
+            if not all(isinstance(v, (str, int, float, bool, type(None))) for v in valor):
+                valor = str(valor)
+        elif not isinstance(valor, (str, int, float, bool, type(None))):
+            valor = str(valor)
+        resultado[str(clave)] = valor
+    return resultado
+
 
+# Instancia global del registro (singleton)
+_registro_modelos = None
+_registro_lock = threading.Lock()
 
-# Instancia global del servicio (singleton)
-_servicio_ml = None
+def obtener_registro_modelos() -> RegistroModelos:
+    """Obtiene el registro de versiones de modelos (patrón singleton)."""
+    global _registro_modelos
+    if _registro_modelos is None:
+        with _registro_lock:
+            # Otro hilo pudo crearlo mientras se esperaba el lock
+            if _registro_modelos is None:
+                registro = RegistroModelos()
+                registro.cargar(precargar=False)
+                _registro_modelos = registro
+    return _registro_modelos
 
 def obtener_servicio_ml() -> ServicioML:
-    """Obtiene la instancia del servicio ML (patrón singleton)."""
-    global _servicio_ml
-    if _servicio_ml is None:
-        _servicio_ml = ServicioML()
-    return _servicio_ml
+    """Obtiene el servicio ML de la versión de modelos activa."""
+    registro = obtener_registro_modelos()
+    registro.asegurar_vigilancia()
+    return registro.servicio
+
+
+def configurar_servicio_ml(mmap_modo: Optional[str] = 'r', precargar: bool = False,
+                           intervalo_recarga: float = 0, **opciones_servicio) -> ServicioML:
+    """
+    Crea el registro y el servicio con las opciones de carga de la aplicación.
+    
+    Con precargar=True los modelos se cargan ahora; si se llama antes del fork
+    (gunicorn --preload), los workers comparten esas páginas copy-on-write.
+    gc.freeze() saca los objetos ya cargados del recolector para que sus
+    pasadas no escriban en ellas y fuercen copias en cada worker.
+    Con intervalo_recarga > 0 cada worker vigila nuevas versiones de modelos.
+    El resto de opciones (caché, backend de inferencia) pasan a ServicioML.
+    """
+    global _registro_modelos
+    with _registro_lock:
+        registro = RegistroModelos(mmap_modo=mmap_modo, **opciones_servicio)
+        registro.intervalo_vigilancia = intervalo_recarga
+        registro.cargar(precargar=precargar)
+        _registro_modelos = registro
+    if precargar:
+        gc.freeze()
+    return registro.servicio
@@ -121,8 +121,8 @@ class SistemaNiveles:
                 logger.error("get_db_connection no disponible - archivo no importado correctamente")
                 return None
 
-            conn = _get_db_connection().conn
-            cursor = conn.cursor()
+            db = _get_db_connection()
+            cursor = db.conn.cursor()
 
             # Consulta principal de estadísticas
             cursor.execute("""
@@ -139,7 +139,8 @@ class SistemaNiveles:
             """, (usuario_id,))
 
             row = cursor.fetchone()
-            conn.close()
+            cursor.close()
+            db.disconnect()
 
             if not row:
                 return None
@@ -0,0 +1,237 @@
+"""
+Optimizador de portafolios media-varianza (Markowitz)
+
+La covarianza Σ = D·C·D (D = diag(volatilidades), C = correlación) se
+factoriza una sola vez con Cholesky, Σ = L·Lᵀ, y esa factorización se
+reutiliza para todo lo demás:
+
+- Sin restricciones de signo (solo Σw = 1) la frontera es cerrada: con
+  a = 1ᵀΣ⁻¹1, b = 1ᵀΣ⁻¹μ, c = μᵀΣ⁻¹μ y d = ac - b², el portafolio de
+  retorno m es w(m) = Σ⁻¹(λ·1 + γ·μ) con λ = (c - b·m)/d, γ = (a·m - b)/d;
+  basta resolver Σx = 1 y Σx = μ una vez (cho_solve).
+- Solo posiciones largas (w ≥ 0) se resuelve min ½wᵀΣw - δ·μᵀw sobre el
+  simplex con gradiente proyectado acelerado (FISTA con reinicio), todos
+  los δ de la frontera a la vez como una matriz puntos × activos.
+- El riesgo de muchos portafolios es ‖Lᵀw‖, una sola multiplicación W·L.
+"""
+import numpy as np
+from scipy import linalg
+from typing import Dict, Any, List, Optional, Tuple
+
+# Tolerancia y límite del gradiente proyectado (cambio máximo de ponderación); la
+# primera pasada de la frontera solo sirve para interpolar δ y arrancar la segunda
+TOLERANCIA = 1e-10
+TOLERANCIA_PRIMERA_PASADA = 1e-6
+MAX_ITERACIONES = 20000
+# Refinamiento del máximo Sharpe con posiciones largas: rondas × δ resueltos por ronda
+RONDAS_SHARPE = 6
+PUNTOS_RONDA_SHARPE = 16
+
+
+def factorizar_covarianza(volatilidades: np.ndarray,
+                          matriz_correlacion: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Arma Σ = D·C·D y su factor de Cholesky inferior.
+
+    Raises:
+        ValueError: Si la correlación no es simétrica, su diagonal no es 1 o
+            la covarianza no es definida positiva
+    """
+    n = len(volatilidades)
+    if matriz_correlacion.shape != (n, n):
+        raise ValueError(f"La matriz de correlación debe ser de {n}x{n}")
+    if not np.allclose(matriz_correlacion, matriz_correlacion.T, atol=1e-8):
+        raise ValueError("La matriz de correlación debe ser simétrica")
+    if not np.allclose(np.diag(matriz_correlacion), 1.0, atol=1e-8):
+        raise ValueError("La diagonal de la matriz de correlación debe ser 1")
+    if np.any(volatilidades <= 0):
+        raise ValueError("Las volatilidades deben ser positivas")
+
+    covarianza = np.outer(volatilidades, volatilidades) * matriz_correlacion
+    try:
+        cholesky = linalg.cholesky(covarianza, lower=True)
+    except linalg.LinAlgError:
+        raise ValueError("La matriz de covarianza no es definida positiva")
+    return covarianza, cholesky
+
+
+def riesgos(ponderaciones: np.ndarray, cholesky: np.ndarray) -> np.ndarray:
+    """Volatilidad √(wᵀΣw) = ‖Lᵀw‖ de cada fila de ponderaciones."""
+    return np.linalg.norm(ponderaciones @ cholesky, axis=-1)
+
+
+def proyectar_simplex(matriz: np.ndarray) -> np.ndarray:
+    """
+    Proyección euclídea de cada fila sobre {w ≥ 0, Σw = 1}.
+
+    Algoritmo por ordenamiento (Held et al.): el umbral θ es el mayor que
+    deja positivas las ρ componentes más grandes.
+    """
+    n = matriz.shape[1]
+    ordenadas = -np.sort(-matriz, axis=1)
+    acumuladas = np.cumsum(ordenadas, axis=1) - 1
+    validas = ordenadas - acumuladas / np.arange(1, n + 1) > 0
+    rho = n - 1 - np.argmax(validas[:, ::-1], axis=1)
+    theta = acumuladas[np.arange(len(matriz)), rho] / (rho + 1)
+    return np.maximum(matriz - theta[:, None], 0)
+
+
+def _gradiente_proyectado(covarianza: np.ndarray, retornos: np.ndarray, deltas: np.ndarray,
+                          paso: float, inicial: Optional[np.ndarray] = None,
+                          tolerancia: float = TOLERANCIA) -> Tuple[np.ndarray, int]:
+    """
+    Resuelve min ½wᵀΣw - δ·μᵀw con w en el simplex para cada δ (una fila cada uno).
+
+    Returns:
+        Tuple (ponderaciones puntos × activos, iteraciones usadas)
+    """
+    n = len(retornos)
+    actual = np.full((len(deltas), n), 1.0 / n) if inicial is None else inicial.copy()
+    extrapolado = actual
+    t = 1.0
+    lineal = deltas[:, None] * retornos
+
+    for iteracion in range(1, MAX_ITERACIONES + 1):
+        gradiente = extrapolado @ covarianza - lineal
+        siguiente = proyectar_simplex(extrapolado - paso * gradiente)
+        cambio = siguiente - actual
+        if np.abs(cambio).max() < tolerancia:
+            return siguiente, iteracion
+
+        # Reinicio adaptativo: si la inercia apunta contra el descenso, se anula
+        if np.sum((extrapolado - siguiente) * cambio) > 0:
+            t = 1.0
+        t_siguiente = (1 + np.sqrt(1 + 4 * t * t)) / 2
+        extrapolado = siguiente + ((t - 1) / t_siguiente) * cambio
+        actual, t = siguiente, t_siguiente
+
+    return actual, MAX_ITERACIONES
+
+
+def frontera_sin_restricciones(retornos: np.ndarray, cholesky: np.ndarray, n_puntos: int,
+                               tasa_libre_riesgo: float) -> Dict[str, Any]:
+    """
+    Mínima varianza, tangente (máximo Sharpe) y frontera en forma cerrada.
+
+    Returns:
+        Dict con 'minima_varianza', 'maximo_sharpe' (None si la tasa libre de
+        riesgo no queda por debajo del retorno de mínima varianza) y
+        'frontera' (matriz de ponderaciones puntos × activos)
+    """
+    factor = (cholesky, True)
+    inv_uno = linalg.cho_solve(factor, np.ones(len(retornos)))
+    inv_mu = linalg.cho_solve(factor, retornos)
+    a, b, c = inv_uno.sum(), inv_mu.sum(), retornos @ inv_mu
+    d = a * c - b * b
+
+    minima = inv_uno / a
+    exceso = b - tasa_libre_riesgo * a
+    tangente = (inv_mu - tasa_libre_riesgo * inv_uno) / exceso if exceso > 0 else None
+
+    # Si todos los retornos son iguales (d ≈ 0) la frontera es un solo punto
+    if d <= 1e-12 * a * c:
+        frontera = np.tile(minima, (n_puntos, 1))
+    else:
+        objetivos = np.linspace(b / a, retornos.max(), n_puntos)
+        lambdas = (c - b * objetivos) / d
+        gammas = (a * objetivos - b) / d
+        frontera = np.outer(lambdas, inv_uno) + np.outer(gammas, inv_mu)
+
+    return {'minima_varianza': minima, 'maximo_sharpe': tangente, 'frontera': frontera, 'iteraciones': 0}
+
+
+def _delta_maximo(retornos: np.ndarray, covarianza: np.ndarray) -> float:
+    """
+    Menor δ a partir del cual el activo de mayor retorno por sí solo es óptimo
+    (condición KKT de la esquina del simplex).
+    """
+    k = int(np.argmax(retornos))
+    diferencia = retornos[k] - retornos
+    menores = diferencia > 1e-12
+    if not menores.any():
+        return 0.0
+    return float(max(0.0, np.max((covarianza[k, k] - covarianza[k, menores]) / diferencia[menores])))
+
+
+def frontera_solo_largos(retornos: np.ndarray, covarianza: np.ndarray, cholesky: np.ndarray,
+                         n_puntos: int, tasa_libre_riesgo: float) -> Dict[str, Any]:
+    """
+    Mínima varianza, máximo Sharpe y frontera con w ≥ 0 por gradiente proyectado.
+
+    La frontera se barre en δ ∈ [0, δ_max] en dos pasadas: la primera con δ
+    equiespaciados y la segunda con los δ que, interpolando la primera, dan
+    retornos equiespaciados. El máximo Sharpe parte del mejor punto de la
+    frontera y se afina por rondas: cada una resuelve en lote una rejilla de
+    δ entre los vecinos del mejor punto anterior.
+    """
+    paso = 1.0 / linalg.eigh(covarianza, eigvals_only=True,
+                             subset_by_index=[len(retornos) - 1, len(retornos) - 1])[0]
+    delta_max = _delta_maximo(retornos, covarianza)
+
+    deltas = np.linspace(0, delta_max, n_puntos)
+    ponderaciones, iteraciones = _gradiente_proyectado(
+        covarianza, retornos, deltas, paso, tolerancia=TOLERANCIA_PRIMERA_PASADA
+    )
+    retornos_frontera = ponderaciones @ retornos
+    if retornos_frontera[-1] - retornos_frontera[0] > 1e-12:
+        objetivos = np.linspace(retornos_frontera[0], retornos_frontera[-1], n_puntos)
+        deltas = np.interp(objetivos, np.maximum.accumulate(retornos_frontera), deltas)
+        ponderaciones, extra = _gradiente_proyectado(covarianza, retornos, deltas, paso, ponderaciones)
+        iteraciones += extra
+
+    tangente = None
+    excesos = ponderaciones @ retornos - tasa_libre_riesgo
+    if excesos.max() > 0:
+        sharpe = excesos / riesgos(ponderaciones, cholesky)
+        mejor = int(np.argmax(sharpe))
+        tangente, sharpe_tangente = ponderaciones[mejor], sharpe[mejor]
+        candidatos_deltas, candidatos = deltas, ponderaciones
+        for _ in range(RONDAS_SHARPE):
+            bajo = candidatos_deltas[max(mejor - 1, 0)]
+            alto = candidatos_deltas[min(mejor + 1, len(candidatos_deltas) - 1)]
+            if alto - bajo <= 1e-12 * max(1.0, delta_max):
+                break
+            # Todos los δ de la ronda en un solo lote, partiendo del mejor punto
+            candidatos_deltas = np.linspace(bajo, alto, PUNTOS_RONDA_SHARPE)
+            inicial = np.repeat(candidatos[mejor:mejor + 1], PUNTOS_RONDA_SHARPE, axis=0)
+            candidatos, usadas = _gradiente_proyectado(covarianza, retornos, candidatos_deltas, paso, inicial)
+            iteraciones += usadas
+            sharpe = (candidatos @ retornos - tasa_libre_riesgo) / riesgos(candidatos, cholesky)
+            mejor = int(np.argmax(sharpe))
+            if sharpe[mejor] >= sharpe_tangente:
+                tangente, sharpe_tangente = candidatos[mejor], sharpe[mejor]
+
+    return {
+        'minima_varianza': ponderaciones[0],
+        'maximo_sharpe': tangente,
+        'frontera': ponderaciones,
+        'iteraciones': iteraciones
+    }
+
+
+def describir_portafolio(ponderaciones: np.ndarray, retornos: np.ndarray, cholesky: np.ndarray,
+                         tasa_libre_riesgo: float) -> Dict[str, Any]:
+    """Retorno, riesgo, Sharpe y ponderaciones redondeadas de un portafolio."""
+    retorno = float(ponderaciones @ retornos)
+    riesgo = float(riesgos(ponderaciones, cholesky))
+    return {
+        'ponderaciones': np.round(ponderaciones, 4).tolist(),
+        'retorno_esperado': round(retorno, 4),
+        'riesgo': round(riesgo, 4),
+        'ratio_sharpe': round((retorno - tasa_libre_riesgo) / riesgo, 4) if riesgo > 0 else 0.0
+    }
+
+
+def describir_frontera(frontera: np.ndarray, retornos: np.ndarray, cholesky: np.ndarray,
+                       tasa_libre_riesgo: float) -> Dict[str, List]:
+    """Columnas de la frontera eficiente (una entrada por punto)."""
+    retornos_frontera = frontera @ retornos
+    riesgos_frontera = riesgos(frontera, cholesky)
+    sharpe = np.divide(retornos_frontera - tasa_libre_riesgo, riesgos_frontera,
+                       out=np.zeros_like(riesgos_frontera), where=riesgos_frontera > 0)
+    return {
+        'retornos': np.round(retornos_frontera, 4).tolist(),
+        'riesgos': np.round(riesgos_frontera, 4).tolist(),
+        'ratios_sharpe': np.round(sharpe, 4).tolist(),
+        'ponderaciones': np.round(frontera, 4).tolist()
+    }
@@ -4,10 +4,12 @@ Autor: Sistema Econova
 
 Funcionalidades:
 - Cálculo de cuota mensual
-- Tabla de amortización completa
+- Tabla de amortización completa (vectorizada, con tramos por meses)
 - Análisis de costo total
 - TED (Tasa Efectiva de Deuda)
+- Simulación de prepagos, cambios de tasa y período de gracia
 - Análisis de sensibilidad
+- Rejillas de cuota y costo (monto × tasa × plazo)
 """
 
 import numpy as np
@@ -18,6 +20,11 @@ from app.utils.validadores import validar_numero_positivo, validar_tasa
 class ServicioPrestamo:
     """Servicio para cálculos de préstamos y créditos"""
 
+    MODALIDADES_PREPAGO = ("reducir_plazo", "reducir_cuota")
+    TIPOS_GRACIA = ("parcial", "total")
+    MAX_ESTRATEGIAS = 500
+    MAX_PUNTOS_REJILLA = 100000
+
     @staticmethod
     def validar_parametros_prestamo(monto: float, tasa_anual: float, plazo_meses: int):
         """Valida parámetros del préstamo"""
@@ -58,59 +65,100 @@ class ServicioPrestamo:
         return cuota
 
     @staticmethod
-    def calcular_tabla_amortizacion(
-        monto: float, tasa_anual: float, plazo_meses: int
-    ) -> List[Dict[str, Any]]:
+    def generar_cronograma(
+        monto: float,
+        tasa_anual: float,
+        plazo_meses: int,
+        desde_mes: int = 1,
+        hasta_mes: int = None,
+    ) -> Dict[str, np.ndarray]:
         """
-        Genera la tabla de amortización completa
+        Genera el cronograma de amortización como arrays NumPy
+
+        El saldo tras k cuotas es el valor presente de las n - k cuotas
+        restantes, que con L = log(1+r) queda
+            B_k = P·(1 - e^(-(n-k)L)) / (1 - e^(-nL))     (B_k = P - C·k si r = 0)
+        y se evalúa con expm1 sin restar términos grandes, así que no pierde
+        precisión aunque (1+r)^n sea enorme. Cualquier tramo de meses se
+        calcula sin recorrer los anteriores: interés_k = r·B_(k-1) y
+        capital_k = C - interés_k.
 
         Args:
             monto: Monto del préstamo
             tasa_anual: Tasa anual en porcentaje
             plazo_meses: Plazo en meses
+            desde_mes: Primer mes del tramo (desde 1)
+            hasta_mes: Último mes del tramo (por defecto el plazo)
 
         Returns:
-            Lista con desglose por cuota
+            Dict con arrays 'mes', 'cuota', 'capital', 'interes' y 'saldo_restante'
         """
         ServicioPrestamo.validar_parametros_prestamo(monto, tasa_anual, plazo_meses)
 
+        hasta_mes = plazo_meses if hasta_mes is None else min(int(hasta_mes), plazo_meses)
+        desde_mes = int(desde_mes)
+        if desde_mes < 1 or desde_mes > plazo_meses:
+            raise ValueError(f"El mes inicial debe estar entre 1 y {plazo_meses}")
+        if hasta_mes < desde_mes:
+            raise ValueError("El mes final no puede ser anterior al mes inicial")
+
         tasa_mensual = (tasa_anual / 100) / 12
         cuota = ServicioPrestamo.calcular_cuota_mensual(monto, tasa_anual, plazo_meses)
 
-        tabla = []
-        saldo = monto
-        interes_total = 0
-        capital_total = 0
-
-        for mes in range(1, plazo_meses + 1):
-            # Calcular interés sobre saldo actual
-            interes = saldo * tasa_mensual
-
-            # Calcular capital (cuota - interés)
-            capital = cuota - interes
-
-            # Actualizar saldo
-            saldo -= capital
+        # Saldos B_(desde-1) .. B_hasta
+        k = np.arange(desde_mes - 1, hasta_mes + 1, dtype=np.float64)
+        if tasa_mensual == 0:
+            saldos = monto - cuota * k
+        else:
+            log_factor = np.log1p(tasa_mensual)
+            saldos = monto * np.expm1(-(plazo_meses - k) * log_factor) / np.expm1(-plazo_meses * log_factor)
+        # Evitar números negativos por redondeo
+        saldos = np.maximum(saldos, 0.0)
+
+        interes = saldos[:-1] * tasa_mensual
+        return {
+            "mes": np.arange(desde_mes, hasta_mes + 1),
+            "cuota": np.full(len(interes), cuota),
+            "capital": cuota - interes,
+            "interes": interes,
+            "saldo_restante": saldos[1:],
+        }
 
-            # Evitar números negativos por redondeo
-            if saldo < 0:
-                saldo = 0
-                capital = cuota - interes
+    @staticmethod
+    def cronograma_a_tabla(cronograma: Dict[str, np.ndarray]) -> List[Dict[str, Any]]:
+        """Convierte los arrays de generar_cronograma en la lista de filas redondeadas"""
+        columnas = {
+            nombre: np.round(valores, 2).tolist() if nombre != "mes" else valores.tolist()
+            for nombre, valores in cronograma.items()
+        }
+        nombres = list(columnas)
+        return [dict(zip(nombres, fila)) for fila in zip(*columnas.values())]
 
-            interes_total += interes
-            capital_total += capital
+    @staticmethod
+    def calcular_tabla_amortizacion(
+        monto: float,
+        tasa_anual: float,
+        plazo_meses: int,
+        desde_mes: int = 1,
+        hasta_mes: int = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Genera la tabla de amortización completa (o el tramo de meses pedido)
 
-            tabla.append(
-                {
-                    "mes": mes,
-                    "cuota": round(cuota, 2),
-                    "capital": round(capital, 2),
-                    "interes": round(interes, 2),
-                    "saldo_restante": round(max(0, saldo), 2),
-                }
-            )
+        Args:
+            monto: Monto del préstamo
+            tasa_anual: Tasa anual en porcentaje
+            plazo_meses: Plazo en meses
+            desde_mes: Primer mes de la tabla (desde 1)
+            hasta_mes: Último mes de la tabla (por defecto el plazo)
 
-        return tabla
+        Returns:
+            Lista con desglose por cuota
+        """
+        cronograma = ServicioPrestamo.generar_cronograma(
+            monto, tasa_anual, plazo_meses, desde_mes, hasta_mes
+        )
+        return ServicioPrestamo.cronograma_a_tabla(cronograma)
 
     @staticmethod
     def calcular_ted(monto: float, tasa_anual: float, plazo_meses: int) -> float:
@@ -132,16 +180,25 @@ class ServicioPrestamo:
         plazo_meses: int,
         tasa_impuesto: float = 0,
         comision_inicial: float = 0,
+        incluir_tabla: bool = True,
+        desde_mes: int = 1,
+        limite: int = None,
     ) -> Dict[str, Any]:
         """
         Realiza análisis completo del préstamo
 
+        Los totales salen de la cuota en forma cerrada; la tabla de
+        amortización solo se genera si se pide, y puede limitarse a un tramo.
+
         Args:
             monto: Monto del préstamo
             tasa_anual: Tasa anual en porcentaje
             plazo_meses: Plazo en meses
             tasa_impuesto: Tasa de impuesto aplicable (%)
             comision_inicial: Comisión inicial (porcentaje del monto)
+            incluir_tabla: False para devolver solo resumen, costos e indicadores
+            desde_mes: Primer mes de la tabla (desde 1)
+            limite: Máximo de filas de la tabla (por defecto hasta el final)
 
         Returns:
             Dict con análisis completo
@@ -159,9 +216,6 @@ class ServicioPrestamo:
         cuota_mensual = ServicioPrestamo.calcular_cuota_mensual(
             monto, tasa_anual, plazo_meses
         )
-        tabla_amortizacion = ServicioPrestamo.calcular_tabla_amortizacion(
-            monto, tasa_anual, plazo_meses
-        )
         ted = ServicioPrestamo.calcular_ted(monto, tasa_anual, plazo_meses)
 
         # Calcular costos
@@ -174,7 +228,7 @@ class ServicioPrestamo:
         # Monto neto desembolsado
         monto_neto = monto - costo_comision
 
-        return {
+        resultado = {
             "resumen": {
                 "monto_solicitado": round(monto, 2),
                 "monto_neto_desembolsado": round(monto_neto, 2),
@@ -197,7 +251,441 @@ class ServicioPrestamo:
                 "interes_por_cuota_promedio": round(costo_interes / plazo_meses, 2),
                 "razon_interes_principal": round(costo_interes / monto, 2),
             },
-            "tabla_amortizacion": tabla_amortizacion,
+        }
+
+        if incluir_tabla:
+            if limite is not None and int(limite) < 1:
+                raise ValueError("El límite de filas debe ser mayor a 0")
+            hasta_mes = None if limite is None else int(desde_mes) + int(limite) - 1
+            cronograma = ServicioPrestamo.generar_cronograma(
+                monto, tasa_anual, plazo_meses, desde_mes, hasta_mes
+            )
+            resultado["tabla_amortizacion"] = ServicioPrestamo.cronograma_a_tabla(cronograma)
+            if int(desde_mes) != 1 or len(cronograma["mes"]) < plazo_meses:
+                resultado["paginacion"] = {
+                    "desde_mes": int(cronograma["mes"][0]),
+                    "hasta_mes": int(cronograma["mes"][-1]),
+                    "total_cuotas": plazo_meses,
+                    "hay_mas": int(cronograma["mes"][-1]) < plazo_meses,
+                }
+
+        return resultado
+
+    @staticmethod
+    def _tasas_mensuales(
+        tasa_anual: float, plazo_meses: int, cambios_tasa: List[Dict[str, Any]] = None
+    ) -> np.ndarray:
+        """Tasa mensual de cada mes; cada cambio rige desde su mes en adelante"""
+        tasas = np.full(plazo_meses, tasa_anual / 1200)
+        for cambio in sorted(cambios_tasa or [], key=lambda c: int(c["mes"])):
+            mes = int(cambio["mes"])
+            nueva_tasa = float(cambio["tasa_anual"])
+            ServicioPrestamo.validar_parametros_prestamo(1, nueva_tasa, plazo_meses)
+            if mes < 1 or mes > plazo_meses:
+                raise ValueError(f"El mes del cambio de tasa debe estar entre 1 y {plazo_meses}")
+            tasas[mes - 1:] = nueva_tasa / 1200
+        return tasas
+
+    @staticmethod
+    def _vector_prepagos(
+        prepagos: List[Dict[str, Any]], plazo_meses: int, gracia_meses: int
+    ) -> np.ndarray:
+        """
+        Monto prepagado al cierre de cada mes
+
+        Cada prepago es único ({"mes", "monto"}) o recurrente
+        ({"monto", "cada", "desde", "hasta"}); no se admiten durante la gracia.
+        """
+        extras = np.zeros(plazo_meses)
+        for prepago in prepagos or []:
+            monto = float(prepago["monto"])
+            if monto <= 0:
+                raise ValueError("El monto de cada prepago debe ser mayor a 0")
+            if "cada" in prepago:
+                cada = int(prepago["cada"])
+                desde = int(prepago.get("desde", gracia_meses + 1))
+                hasta = int(prepago.get("hasta", plazo_meses))
+                if cada < 1:
+                    raise ValueError("La periodicidad del prepago debe ser de al menos 1 mes")
+                meses = np.arange(max(desde, gracia_meses + 1), min(hasta, plazo_meses) + 1, cada)
+            else:
+                mes = int(prepago["mes"])
+                if mes <= gracia_meses or mes > plazo_meses:
+                    raise ValueError(
+                        f"El mes del prepago debe estar entre {gracia_meses + 1} y {plazo_meses}"
+                    )
+                meses = np.array([mes])
+            extras[meses - 1] += monto
+        return extras
+
+    @staticmethod
+    def _cuota_anualidad(saldo: np.ndarray, tasa_mensual: float, meses: np.ndarray) -> np.ndarray:
+        """Cuota francesa que amortiza cada saldo en sus meses restantes"""
+        if tasa_mensual == 0:
+            return saldo / meses
+        return saldo * tasa_mensual / (1 - (1 + tasa_mensual) ** -meses)
+
+    @staticmethod
+    def _simular_lote(
+        monto: float,
+        tasas: np.ndarray,
+        gracia_meses: int,
+        tipo_gracia: str,
+        extras: np.ndarray,
+        reducir_cuota: np.ndarray,
+    ) -> Dict[str, np.ndarray]:
+        """
+        Simula S estrategias de prepago sobre la misma trayectoria de tasas
+
+        El plazo se divide en tramos donde tasa y cuota son constantes (cortes
+        en el fin de la gracia, en cada cambio de tasa y tras cada prepago de
+        las estrategias que reducen cuota). Fuera de la gracia el saldo se
+        lleva como el valor presente de las M cuotas que faltan menos los
+        prepagos capitalizados D:
+            B_j = C·(1 - (1+r)^-(M-j)) / r - D_j,   D_j = (1+r)^j [D_0 + Σ_(i≤j) E_i(1+r)^-i]
+        La anualidad se evalúa con expm1 y no resta términos grandes, así que
+        el saldo no pierde precisión aunque (1+r)^M sea enorme. D se calcula
+        para todas las estrategias y meses con cumsum, por bloques para que
+        (1+r)^j no amplifique el redondeo.
+
+        Returns:
+            Dict de matrices S×plazo: 'cuota_vigente', 'cuota', 'interes',
+            'prepago' y 'saldo_restante'
+        """
+        n_estrategias, plazo_meses = extras.shape
+        # Un saldo menor a medio centavo se considera cancelado
+        tolerancia = min(0.005, monto * 1e-6)
+
+        cortes = {1, gracia_meses + 1, plazo_meses + 1}
+        cortes.update((np.flatnonzero(np.diff(tasas)) + 2).tolist())
+        cortes.update((np.flatnonzero(extras[reducir_cuota].any(axis=0)) + 2).tolist())
+        cortes = sorted(c for c in cortes if c <= plazo_meses + 1)
+
+        resultado = {
+            nombre: np.zeros((n_estrategias, plazo_meses))
+            for nombre in ("cuota_vigente", "cuota", "interes", "prepago", "saldo_restante")
+        }
+        saldo = np.full(n_estrategias, float(monto))
+        cuota = np.zeros(n_estrategias)
+        meses_cuota = np.zeros(n_estrategias)
+        capitalizado = np.zeros(n_estrategias)
+
+        for inicio, fin in zip(cortes[:-1], cortes[1:]):
+            tasa = tasas[inicio - 1]
+            restantes = plazo_meses - inicio + 1
+            if inicio <= gracia_meses:
+                # Gracia parcial: se pagan solo intereses; total: se capitalizan
+                cuota = saldo * tasa if tipo_gracia == "parcial" else np.zeros(n_estrategias)
+            elif inicio == gracia_meses + 1:
+                cuota = ServicioPrestamo._cuota_anualidad(saldo, tasa, restantes)
+                meses_cuota = np.full(n_estrategias, float(restantes))
+                capitalizado = np.zeros(n_estrategias)
+            else:
+                tasa_previa = tasas[inicio - 2]
+                if tasa != tasa_previa:
+                    # Las estrategias que reducen plazo conservan el plazo efectivo n,
+                    # con (1+r)^-n = (1+r)^-M + r·D/C (sin restas que cancelen)
+                    with np.errstate(divide="ignore", invalid="ignore"):
+                        if tasa_previa == 0:
+                            efectivos = meses_cuota - capitalizado / cuota
+                        else:
+                            log_previo = np.log1p(tasa_previa)
+                            efectivos = -np.log(
+                                np.exp(-meses_cuota * log_previo) + tasa_previa * capitalizado / cuota
+                            ) / log_previo
+                    efectivos = np.where(np.isfinite(efectivos), np.ceil(efectivos - 1e-6), restantes)
+                    meses = np.where(reducir_cuota, restantes, np.clip(efectivos, 1, restantes))
+                    cuota = ServicioPrestamo._cuota_anualidad(saldo, tasa, meses)
+                    meses_cuota = meses.astype(np.float64)
+                    capitalizado = np.zeros(n_estrategias)
+                else:
+                    recalcular = reducir_cuota & (extras[:, inicio - 2] > 0)
+                    cuota = np.where(
+                        recalcular, ServicioPrestamo._cuota_anualidad(saldo, tasa, restantes), cuota
+                    )
+                    meses_cuota = np.where(recalcular, restantes, meses_cuota)
+                    capitalizado = np.where(recalcular, 0.0, capitalizado)
+
+            log_tasa = np.log1p(tasa)
+            bloque = plazo_meses if tasa == 0 else max(int(np.log(1e4) / log_tasa), 1)
+            for desde in range(inicio, fin, bloque):
+                hasta = min(desde + bloque, fin)
+                columnas = slice(desde - 1, hasta - 1)
+                transcurridos = np.arange(1, hasta - desde + 1)
+                crecimiento = (1 + tasa) ** transcurridos
+                if inicio <= gracia_meses:
+                    # Gracia parcial: el saldo no cambia; total: se capitaliza
+                    saldos = saldo[:, None] * (crecimiento if tipo_gracia == "total" else np.ones_like(crecimiento))
+                else:
+                    faltantes = meses_cuota[:, None] - transcurridos
+                    if tasa == 0:
+                        anualidades = cuota[:, None] * faltantes
+                    else:
+                        anualidades = cuota[:, None] * -np.expm1(-faltantes * log_tasa) / tasa
+                    capitalizados = crecimiento * (
+                        capitalizado[:, None] + np.cumsum(extras[:, columnas] / crecimiento, axis=1)
+                    )
+                    saldos = anualidades - capitalizados
+                    meses_cuota = meses_cuota - len(transcurridos)
+                    capitalizado = capitalizados[:, -1]
+                terminado = np.maximum.accumulate(saldos <= tolerancia, axis=1)
+                saldos = np.where(terminado, 0.0, saldos)
+                # Un préstamo cancelado queda en saldo cero (a_0 - 0)
+                meses_cuota = np.where(terminado[:, -1], 0.0, meses_cuota)
+                capitalizado = np.where(terminado[:, -1], 0.0, capitalizado)
+
+                previos = np.concatenate([saldo[:, None], saldos[:, :-1]], axis=1)
+                interes = previos * tasa
+                deuda = previos + interes
+                cuota_pagada = np.minimum(cuota[:, None], deuda)
+                prepago = np.where(terminado, np.minimum(extras[:, columnas], deuda - cuota_pagada), extras[:, columnas])
+                cuota_pagada = np.where(terminado, deuda - prepago, cuota_pagada)
+
+                resultado["cuota_vigente"][:, columnas] = np.where(previos > 0, cuota[:, None], 0.0)
+                resultado["cuota"][:, columnas] = cuota_pagada
+                resultado["interes"][:, columnas] = interes
+                resultado["prepago"][:, columnas] = prepago
+                resultado["saldo_restante"][:, columnas] = saldos
+                saldo = saldos[:, -1]
+
+        # La última cuota del plazo liquida el residuo de redondeo
+        resultado["cuota"][:, -1] += saldo
+        resultado["saldo_restante"][:, -1] = 0.0
+        return resultado
+
+    @staticmethod
+    def simular_prestamo(
+        monto: float,
+        tasa_anual: float,
+        plazo_meses: int,
+        prepagos: List[Dict[str, Any]] = None,
+        modalidad: str = "reducir_plazo",
+        cambios_tasa: List[Dict[str, Any]] = None,
+        gracia_meses: int = 0,
+        tipo_gracia: str = "parcial",
+        estrategias: List[Dict[str, Any]] = None,
+        incluir_tabla: bool = True,
+        tasa_impuesto: float = 0,
+        comision_inicial: float = 0,
+    ) -> Dict[str, Any]:
+        """
+        Simula prepagos, cambios de tasa y período de gracia
+
+        Sin 'estrategias' compara el préstamo sin prepagos con los 'prepagos'
+        indicados. Con 'estrategias' (lista de {"nombre", "prepagos",
+        "modalidad"}) las evalúa todas en lote y señala la de menor costo en
+        intereses.
+
+        Args:
+            monto: Monto del préstamo
+            tasa_anual: Tasa anual inicial en porcentaje
+            plazo_meses: Plazo contractual en meses (incluye la gracia)
+            prepagos: Prepagos únicos {"mes", "monto"} o recurrentes
+                {"monto", "cada", "desde", "hasta"}
+            modalidad: 'reducir_plazo' (mantiene la cuota) o 'reducir_cuota'
+            cambios_tasa: Lista de {"mes", "tasa_anual"} vigentes desde ese mes
+            gracia_meses: Meses iniciales sin amortización
+            tipo_gracia: 'parcial' (se pagan intereses) o 'total' (se capitalizan)
+            estrategias: Estrategias de prepago a comparar
+            incluir_tabla: Incluir la tabla de la estrategia elegida
+            tasa_impuesto: Tasa de impuesto sobre los intereses (%)
+            comision_inicial: Comisión inicial (porcentaje del monto)
+
+        Returns:
+            Dict con resumen, resultados por estrategia y tabla de amortización
+        """
+        ServicioPrestamo.validar_parametros_prestamo(monto, tasa_anual, plazo_meses)
+        if comision_inicial < 0 or comision_inicial > 100:
+            raise ValueError("La comisión debe estar entre 0 y 100%")
+        if tasa_impuesto < 0 or tasa_impuesto > 100:
+            raise ValueError("La tasa de impuesto debe estar entre 0 y 100%")
+        gracia_meses = int(gracia_meses)
+        if gracia_meses < 0 or gracia_meses >= plazo_meses:
+            raise ValueError("Los meses de gracia deben ser menores al plazo")
+        if tipo_gracia not in ServicioPrestamo.TIPOS_GRACIA:
+            raise ValueError(
+                f"Tipo de gracia no válido: {tipo_gracia}. Opciones: {list(ServicioPrestamo.TIPOS_GRACIA)}"
+            )
+
+        if estrategias is None:
+            estrategias = [{"nombre": "Con prepagos", "prepagos": prepagos, "modalidad": modalidad}] if prepagos else []
+        if len(estrategias) > ServicioPrestamo.MAX_ESTRATEGIAS:
+            raise ValueError(f"Máximo {ServicioPrestamo.MAX_ESTRATEGIAS} estrategias por simulación")
+        estrategias = [{"nombre": "Sin prepagos", "prepagos": [], "modalidad": None}] + [
+            {
+                "nombre": e.get("nombre", f"Estrategia {i}"),
+                "prepagos": e.get("prepagos", []),
+                "modalidad": e.get("modalidad", modalidad),
+            }
+            for i, e in enumerate(estrategias, start=1)
+        ]
+        for estrategia in estrategias[1:]:
+            if estrategia["modalidad"] not in ServicioPrestamo.MODALIDADES_PREPAGO:
+                raise ValueError(
+                    f"Modalidad no válida: {estrategia['modalidad']}. "
+                    f"Opciones: {list(ServicioPrestamo.MODALIDADES_PREPAGO)}"
+                )
+
+        tasas = ServicioPrestamo._tasas_mensuales(tasa_anual, plazo_meses, cambios_tasa)
+        extras = np.array(
+            [ServicioPrestamo._vector_prepagos(e["prepagos"], plazo_meses, gracia_meses) for e in estrategias]
+        )
+        reducir_cuota = np.array([e["modalidad"] == "reducir_cuota" for e in estrategias])
+        simulacion = ServicioPrestamo._simular_lote(
+            monto, tasas, gracia_meses, tipo_gracia, extras, reducir_cuota
+        )
+
+        activos = simulacion["cuota_vigente"] > 0
+        meses_efectivos = np.where(
+            activos.any(axis=1), plazo_meses - np.argmax(activos[:, ::-1], axis=1), gracia_meses
+        )
+        intereses = simulacion["interes"].sum(axis=1)
+        prepagado = simulacion["prepago"].sum(axis=1)
+        pagado = simulacion["cuota"].sum(axis=1) + prepagado
+        # Mismos costos que calcular_prestamo_completo: comisión sobre el monto
+        # e impuesto sobre los intereses de cada estrategia
+        costo_comision = monto * (comision_inicial / 100)
+        impuestos = intereses * (tasa_impuesto / 100)
+
+        resultados = []
+        for i, estrategia in enumerate(estrategias):
+            ultimo_mes = int(meses_efectivos[i])
+            resultados.append(
+                {
+                    "nombre": estrategia["nombre"],
+                    "modalidad": estrategia["modalidad"],
+                    "cuota_inicial": round(float(simulacion["cuota_vigente"][i, gracia_meses]), 2),
+                    "cuota_final": round(float(simulacion["cuota_vigente"][i, ultimo_mes - 1]), 2),
+                    "meses_efectivos": ultimo_mes,
+                    "meses_ahorrados": plazo_meses - ultimo_mes,
+                    "total_intereses": round(float(intereses[i]), 2),
+                    "total_prepagos": round(float(prepagado[i]), 2),
+                    "total_pagado": round(float(pagado[i]), 2),
+                    "impuestos": round(float(impuestos[i]), 2),
+                    "costo_total_desembolsado": round(float(pagado[i] + costo_comision + impuestos[i]), 2),
+                    "ahorro_intereses": round(float(intereses[0] - intereses[i]), 2),
+                }
+            )
+
+        mejor = int(np.argmin(intereses))
+        resultado = {
+            "resumen": {
+                "monto_solicitado": round(monto, 2),
+                "monto_neto_desembolsado": round(monto - costo_comision, 2),
+                "comision_inicial": round(costo_comision, 2),
+                "tasa_anual_inicial": round(tasa_anual, 2),
+                "plazo_meses": plazo_meses,
+                "gracia_meses": gracia_meses,
+                "tipo_gracia": tipo_gracia if gracia_meses else None,
+                "cambios_tasa": len(cambios_tasa or []),
+            },
+            "estrategias": resultados,
+            "mejor_estrategia": resultados[mejor]["nombre"],
+        }
+
+        if incluir_tabla:
+            # Tabla de la estrategia pedida o, al comparar varias, de la mejor
+            fila = mejor if len(estrategias) > 2 else len(estrategias) - 1
+            meses = int(meses_efectivos[fila])
+            interes = simulacion["interes"][fila, :meses]
+            resultado["tabla_amortizacion"] = ServicioPrestamo.cronograma_a_tabla(
+                {
+                    "mes": np.arange(1, meses + 1),
+                    "tasa_anual": tasas[:meses] * 1200,
+                    "cuota": simulacion["cuota"][fila, :meses],
+                    "capital": simulacion["cuota"][fila, :meses] - interes,
+                    "interes": interes,
+                    "prepago": simulacion["prepago"][fila, :meses],
+                    "saldo_restante": simulacion["saldo_restante"][fila, :meses],
+                }
+            )
+            resultado["estrategia_tabla"] = resultados[fila]["nombre"]
+
+        return resultado
+
+    @staticmethod
+    def cuota_vectorizada(montos, tasas_anuales, plazos_meses) -> np.ndarray:
+        """
+        Cuota mensual con broadcasting: misma fórmula que calcular_cuota_mensual
+        para arrays de montos, tasas anuales (%) y plazos de formas compatibles
+        """
+        montos = np.asarray(montos, dtype=np.float64)
+        tasas = np.asarray(tasas_anuales, dtype=np.float64) / 1200
+        plazos = np.asarray(plazos_meses, dtype=np.float64)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            factor = np.where(tasas == 0, 1 / plazos, tasas / -np.expm1(-plazos * np.log1p(tasas)))
+        return montos * factor
+
+    @staticmethod
+    def evaluar_rejilla(
+        montos: List[float],
+        tasas_anuales: List[float],
+        plazos_meses: List[int],
+        tasa_impuesto: float = 0,
+        comision_inicial: float = 0,
+    ) -> Dict[str, Any]:
+        """
+        Cuota y costos de todas las combinaciones monto × tasa × plazo
+
+        Cada superficie es una lista anidada [monto][tasa][plazo] calculada
+        con broadcasting, con los mismos costos que calcular_prestamo_completo.
+
+        Args:
+            montos: Montos del préstamo
+            tasas_anuales: Tasas anuales en porcentaje
+            plazos_meses: Plazos en meses
+            tasa_impuesto: Tasa de impuesto sobre los intereses (%)
+            comision_inicial: Comisión inicial (porcentaje del monto)
+
+        Returns:
+            Dict con los ejes y las superficies de cuota y costos
+        """
+        ejes = []
+        for nombre, valores in (("montos", montos), ("tasas_anuales", tasas_anuales), ("plazos_meses", plazos_meses)):
+            valores = np.atleast_1d(np.asarray(valores, dtype=np.float64))
+            if valores.ndim != 1 or len(valores) == 0:
+                raise ValueError(f"'{nombre}' debe ser un número o una lista no vacía")
+            if not np.all(np.isfinite(valores)):
+                raise ValueError(f"'{nombre}' contiene valores no numéricos")
+            ejes.append(valores)
+        montos, tasas, plazos = ejes
+
+        if np.any(plazos != np.round(plazos)):
+            raise ValueError("Los plazos deben ser meses enteros")
+        n_combinaciones = len(montos) * len(tasas) * len(plazos)
+        if n_combinaciones > ServicioPrestamo.MAX_PUNTOS_REJILLA:
+            raise ValueError(
+                f"La rejilla tiene {n_combinaciones} combinaciones; máximo {ServicioPrestamo.MAX_PUNTOS_REJILLA}"
+            )
+        for monto, tasa, plazo in ((montos.min(), tasas.min(), plazos.min()), (montos.max(), tasas.max(), plazos.max())):
+            ServicioPrestamo.validar_parametros_prestamo(monto, tasa, plazo)
+        if comision_inicial < 0 or comision_inicial > 100:
+            raise ValueError("La comisión debe estar entre 0 y 100%")
+        if tasa_impuesto < 0 or tasa_impuesto > 100:
+            raise ValueError("La tasa de impuesto debe estar entre 0 y 100%")
+
+        monto = montos[:, None, None]
+        plazo = plazos[None, None, :]
+        cuota = ServicioPrestamo.cuota_vectorizada(monto, tasas[None, :, None], plazo)
+        costo_total_cuotas = cuota * plazo
+        costo_interes = costo_total_cuotas - monto
+        costo_total = costo_total_cuotas + monto * (comision_inicial / 100) + costo_interes * (tasa_impuesto / 100)
+        ted = ((1 + tasas / 1200) ** 12 - 1) * 100
+
+        def superficie(valores):
+            return np.round(valores, 2).tolist()
+
+        return {
+            "dimensiones": ["monto", "tasa_anual", "plazo_meses"],
+            "montos": montos.tolist(),
+            "tasas_anuales": tasas.tolist(),
+            "plazos_meses": plazos.astype(int).tolist(),
+            "n_combinaciones": n_combinaciones,
+            "ted_tasa_efectiva": superficie(ted),
+            "cuota_mensual": superficie(cuota),
+            "costo_interes": superficie(costo_interes),
+            "costo_total": superficie(costo_total),
+            "costo_promedio_mensual": superficie(costo_total / plazo),
         }
 
     @staticmethod
@@ -0,0 +1,182 @@
+"""
+Motor de riesgo de portafolios: VaR y CVaR (Expected Shortfall)
+
+A partir de una matriz de retornos (periodos × activos) y las ponderaciones:
+
+- Paramétrico (normal): VaR = -μ_p + z·σ_p y CVaR = -μ_p + σ_p·φ(z)/(1 - α),
+  con μ_p = wᵀμ y σ_p = √(wᵀΣw).
+- Histórico: cuantil y media de la cola de los retornos observados Xw.
+- Monte Carlo: escenarios R = μ + Z·Lᵀ con Z normal estándar y L el factor
+  de Cholesky de Σ, sorteados por bloques; de cada bloque solo se conservan
+  los escenarios que pueden caer en la cola, así la memoria no depende del
+  número de escenarios.
+
+Las contribuciones al riesgo usan la descomposición de Euler: marginal
+∂σ_p/∂w = Σw/σ_p, componente w_i·∂σ_p/∂w_i (suman σ_p) y, para el CVaR
+histórico y Monte Carlo, -E[w_i·R_i | cola] (suman el CVaR).
+"""
+import numpy as np
+from scipy import linalg, stats
+from typing import Dict, Any, Tuple
+
+# Memoria por bloque de escenarios Monte Carlo (normales, componentes y cola candidata)
+MEMORIA_MAX_BLOQUE = 32 * 1024 * 1024
+# Decimales de VaR, CVaR y contribuciones: en dinero bastan 4; como fracción
+# (valor_portafolio = 1) las contribuciones de retornos diarios repartidas en
+# muchos activos caen bajo 1e-4 y necesitan más para seguir sumando el total
+DECIMALES_MONTO = 4
+DECIMALES_FRACCION = 10
+
+
+def estadisticos_retornos(retornos: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Media y covarianza muestral (T - 1) de una matriz periodos × activos."""
+    medias = retornos.mean(axis=0)
+    centrados = retornos - medias
+    return medias, centrados.T @ centrados / (len(retornos) - 1)
+
+
+def factor_covarianza(covarianza: np.ndarray) -> np.ndarray:
+    """
+    Factor L con L·Lᵀ = Σ: Cholesky, o V·√Λ si Σ es singular (p. ej. menos
+    periodos que activos o activos colineales).
+    """
+    try:
+        return linalg.cholesky(covarianza, lower=True)
+    except linalg.LinAlgError:
+        valores, vectores = linalg.eigh(covarianza)
+        return vectores * np.sqrt(np.clip(valores, 0, None))
+
+
+def _tamano_cola(n: int, nivel_confianza: float) -> int:
+    """Número de escenarios de la cola: ⌈(1 - α)·n⌉ (al menos uno)."""
+    return max(1, int(np.ceil((1 - nivel_confianza) * n - 1e-9)))
+
+
+def var_cvar_parametrico(media: float, volatilidad: float, nivel_confianza: float) -> Tuple[float, float]:
+    """VaR y CVaR normales como pérdida (positivos = pérdida)."""
+    z = stats.norm.ppf(nivel_confianza)
+    return (-media + z * volatilidad,
+            -media + volatilidad * stats.norm.pdf(z) / (1 - nivel_confianza))
+
+
+def cola_escenarios(componentes: np.ndarray, nivel_confianza: float) -> Dict[str, Any]:
+    """
+    VaR, CVaR y CVaR por activo a partir de escenarios de componentes w_i·R_i.
+
+    Args:
+        componentes: Matriz escenarios × activos con w_i·R_i
+    """
+    retornos = componentes.sum(axis=1)
+    k = _tamano_cola(len(retornos), nivel_confianza)
+    cola = np.argpartition(retornos, k - 1)[:k]
+    return {
+        'var': float(-retornos[cola].max()),
+        'cvar': float(-retornos[cola].mean()),
+        'cvar_componente': -componentes[cola].mean(axis=0)
+    }
+
+
+def monte_carlo(medias: np.ndarray, factor: np.ndarray, ponderaciones: np.ndarray,
+                nivel_confianza: float, n_escenarios: int, semilla: int) -> Dict[str, Any]:
+    """
+    VaR y CVaR Monte Carlo con escenarios correlacionados R = μ + Z·Lᵀ.
+
+    Los escenarios se sortean por bloques acotados por MEMORIA_MAX_BLOQUE.
+    Se mantiene el conjunto de los k = ⌈(1 - α)·N⌉ peores escenarios vistos
+    hasta ahora (con sus componentes por activo), que al final es
+    exactamente la cola de los N escenarios.
+    """
+    n = len(medias)
+    k = _tamano_cola(n_escenarios, nivel_confianza)
+    tamano_bloque = max(1, MEMORIA_MAX_BLOQUE // (3 * 8 * n))
+    rng = np.random.default_rng(semilla)
+    factor_t = factor.T * ponderaciones
+    base = medias * ponderaciones
+
+    cola = np.empty((0, n))
+    cola_retornos = np.empty(0)
+    for inicio in range(0, n_escenarios, tamano_bloque):
+        normales = rng.standard_normal((min(tamano_bloque, n_escenarios - inicio), n))
+        componentes = normales @ factor_t
+        componentes += base
+        retornos = componentes.sum(axis=1)
+
+        candidatos = np.concatenate([cola_retornos, retornos])
+        peores = np.argpartition(candidatos, k - 1)[:k] if len(candidatos) > k else np.arange(len(candidatos))
+        cola = np.concatenate([cola, componentes])[peores]
+        cola_retornos = candidatos[peores]
+
+    return {
+        'var': float(-cola_retornos.max()),
+        'cvar': float(-cola_retornos.mean()),
+        'cvar_componente': -cola.mean(axis=0)
+    }
+
+
+def analizar_riesgo(retornos: np.ndarray, ponderaciones: np.ndarray, nivel_confianza: float = 0.95,
+                    valor_portafolio: float = 1.0, n_escenarios: int = 100000,
+                    semilla: int = 42) -> Dict[str, Any]:
+    """
+    VaR/CVaR paramétrico, histórico y Monte Carlo y contribuciones al riesgo.
+
+    Args:
+        retornos: Matriz periodos × activos de retornos (decimal)
+        ponderaciones: Ponderaciones del portafolio (suman 1)
+        nivel_confianza: Nivel del VaR (p. ej. 0.95)
+        valor_portafolio: Monto con el que se expresan VaR y CVaR (1 = fracción)
+        n_escenarios: Escenarios Monte Carlo (0 = omitir Monte Carlo)
+        semilla: Semilla de la simulación
+
+    Returns:
+        Dict con VaR/CVaR por método (pérdidas positivas, por periodo de la
+        matriz de retornos) y contribuciones por activo
+    """
+    medias, covarianza = estadisticos_retornos(retornos)
+    factor = factor_covarianza(covarianza)
+    media = float(medias @ ponderaciones)
+    sigma_w = covarianza @ ponderaciones
+    volatilidad = float(np.sqrt(max(ponderaciones @ sigma_w, 0.0)))
+    marginal = sigma_w / volatilidad if volatilidad > 0 else np.zeros_like(sigma_w)
+    componente = ponderaciones * marginal
+
+    var_p, cvar_p = var_cvar_parametrico(media, volatilidad, nivel_confianza)
+    z = stats.norm.ppf(nivel_confianza)
+    historico = cola_escenarios(retornos * ponderaciones, nivel_confianza)
+
+    decimales = DECIMALES_FRACCION if valor_portafolio == 1 else DECIMALES_MONTO
+
+    def monto(valor):
+        return round(float(valor) * valor_portafolio, decimales)
+
+    def montos(valores):
+        return np.round(np.asarray(valores) * valor_portafolio, decimales).tolist()
+
+    resultado = {
+        'nivel_confianza': nivel_confianza,
+        'activos': retornos.shape[1],
+        'observaciones': retornos.shape[0],
+        'valor_portafolio': valor_portafolio,
+        'retorno_esperado': round(media, DECIMALES_FRACCION),
+        'volatilidad': round(volatilidad, DECIMALES_FRACCION),
+        'parametrico': {'var': monto(var_p), 'cvar': monto(cvar_p)},
+        'historico': {'var': monto(historico['var']), 'cvar': monto(historico['cvar'])},
+        'contribuciones': {
+            'marginal': np.round(marginal, DECIMALES_FRACCION).tolist(),
+            'componente': np.round(componente, DECIMALES_FRACCION).tolist(),
+            'porcentaje': np.round(componente / volatilidad * 100 if volatilidad > 0 else componente, 2).tolist(),
+            'var_componente': montos(-ponderaciones * medias + z * componente),
+            'cvar_componente_historico': montos(historico['cvar_componente'])
+        }
+    }
+
+    if n_escenarios:
+        simulado = monte_carlo(medias, factor, ponderaciones, nivel_confianza, n_escenarios, semilla)
+        resultado['monte_carlo'] = {
+            'var': monto(simulado['var']),
+            'cvar': monto(simulado['cvar']),
+            'n_escenarios': n_escenarios,
+            'semilla': semilla
+        }
+        resultado['contribuciones']['cvar_componente_monte_carlo'] = montos(simulado['cvar_componente'])
+
+    return resultado
@@ -0,0 +1,282 @@
+"""
+Solver de TIR (Tasa Interna de Retorno)
+
+La TIR es la raíz de VAN(r) = Σ cₜ (1 + r)⁻ᵗ con c₀ = -inversión. Con el
+cambio de variable x = 1 / (1 + r) el VAN es el polinomio P(x) = Σ cₜ xᵗ, lo
+que permite:
+
+- Acotar la raíz por cambio de signo y refinarla con Halley usando las
+  derivadas analíticas P' y P'' (evaluadas por Horner), con bisección como
+  respaldo cuando un paso sale del intervalo.
+- Detectar TIR múltiples con la regla de signos de Descartes y, si hay más de
+  un cambio de signo, obtener todas las raíces reales como autovalores de la
+  matriz compañera (np.roots).
+- Resolver miles de vectores de flujos a la vez (resolver_tir_lote).
+"""
+import math
+import numpy as np
+from typing import List, Dict, Any, Tuple, Optional
+
+# Rango de tasas que se considera razonable (el mismo que usaba calcular_tir)
+TASA_MIN = -0.99
+TASA_MAX = 10.0
+
+
+def flujos_con_inversion(inversion_inicial: float, flujos_caja: List[float]) -> List[float]:
+    """Arma el vector c₀..c_T con la inversión como salida en t = 0."""
+    return [-float(inversion_inicial)] + [float(f) for f in flujos_caja]
+
+
+def cambios_de_signo(coeficientes: List[float]) -> int:
+    """
+    Cuenta los cambios de signo de la secuencia (ignorando ceros).
+
+    Por la regla de Descartes es una cota superior del número de TIR (raíces
+    x > 0) y difiere de él en un número par: con un solo cambio la TIR es única.
+    """
+    cambios = 0
+    signo_previo = 0
+    for c in coeficientes:
+        if c == 0:
+            continue
+        signo = 1 if c > 0 else -1
+        if signo_previo and signo != signo_previo:
+            cambios += 1
+        signo_previo = signo
+    return cambios
+
+
+def _horner(coeficientes: List[float], x: float) -> Tuple[float, float, float]:
+    """Evalúa P(x), P'(x) y P''(x) en una sola pasada de Horner."""
+    p = d1 = d2 = 0.0
+    for c in reversed(coeficientes):
+        d2 = d2 * x + d1
+        d1 = d1 * x + p
+        p = p * x + c
+    return p, d1, 2.0 * d2
+
+
+def _tasa_a_x(tasa: float) -> float:
+    return 1.0 / (1.0 + tasa)
+
+
+def _x_a_tasa(x: float) -> float:
+    return 1.0 / x - 1.0
+
+
+def _halley_acotado(coeficientes: List[float], x_bajo: float, x_alto: float,
+                    x_inicial: float, tol: float = 1e-12,
+                    max_iter: int = 100) -> Optional[float]:
+    """
+    Refina la raíz de P en [x_bajo, x_alto] (con cambio de signo) por Halley.
+
+    Cada iteración reduce el intervalo con el signo de P; si el paso de Halley
+    sale del intervalo o no es finito se toma el punto medio (bisección).
+    """
+    p_bajo = _horner(coeficientes, x_bajo)[0]
+    if p_bajo == 0:
+        return x_bajo
+    x = x_inicial if x_bajo < x_inicial < x_alto else 0.5 * (x_bajo + x_alto)
+
+    for _ in range(max_iter):
+        p, d1, d2 = _horner(coeficientes, x)
+        if p == 0:
+            return x
+
+        # Actualizar el intervalo que contiene la raíz
+        if (p > 0) == (p_bajo > 0):
+            x_bajo, p_bajo = x, p
+        else:
+            x_alto = x
+
+        denominador = 2.0 * d1 * d1 - p * d2
+        x_nuevo = x - 2.0 * p * d1 / denominador if denominador != 0 else math.nan
+        if not (x_bajo < x_nuevo < x_alto):
+            x_nuevo = 0.5 * (x_bajo + x_alto)
+
+        if abs(x_nuevo - x) <= tol * max(1.0, abs(x)) or x_alto - x_bajo <= tol * max(1.0, abs(x)):
+            return x_nuevo
+        x = x_nuevo
+
+    return x
+
+
+def _raices_reales(coeficientes: List[float], tasa_min: float, tasa_max: float) -> List[float]:
+    """
+    Todas las TIR en [tasa_min, tasa_max] como raíces reales x > 0 de P(x).
+
+    np.roots calcula los autovalores de la matriz compañera; cada raíz real se
+    pule después con Halley para recuperar la precisión completa.
+    """
+    # np.roots espera el coeficiente de mayor grado primero
+    coef = np.trim_zeros(np.asarray(coeficientes, dtype=np.float64)[::-1], 'f')
+    if len(coef) < 2:
+        return []
+
+    x_min, x_max = _tasa_a_x(tasa_max), _tasa_a_x(tasa_min)
+    tasas = []
+    for raiz in np.roots(coef):
+        if abs(raiz.imag) > 1e-9 * max(1.0, abs(raiz.real)):
+            continue
+        x = raiz.real
+        if not (x_min <= x <= x_max):
+            continue
+        # Pulir con un par de pasos de Halley sin acotar
+        for _ in range(3):
+            p, d1, d2 = _horner(coeficientes, x)
+            denominador = 2.0 * d1 * d1 - p * d2
+            if denominador == 0:
+                break
+            x -= 2.0 * p * d1 / denominador
+        if x > 0:
+            tasa = float(_x_a_tasa(x))
+            if tasa_min <= tasa <= tasa_max and all(abs(tasa - t) > 1e-9 for t in tasas):
+                tasas.append(tasa)
+
+    return sorted(tasas)
+
+
+def resolver_tir(coeficientes: List[float], tasa_min: float = TASA_MIN,
+                 tasa_max: float = TASA_MAX, tasa_inicial: float = 0.1,
+                 tol: float = 1e-12, max_iter: int = 100) -> Dict[str, Any]:
+    """
+    Calcula la TIR de un vector de flujos c₀..c_T.
+
+    Args:
+        coeficientes: Flujos con la inversión incluida (ver flujos_con_inversion)
+        tasa_min, tasa_max: Rango en el que se buscan TIR
+        tasa_inicial: Si hay varias TIR, se reporta la más cercana a esta tasa
+        tol: Tolerancia relativa sobre x = 1/(1+r)
+        max_iter: Máximo de iteraciones de Halley
+
+    Returns:
+        Dict con 'tir' (None si no existe en el rango), 'tirs' (todas las
+        encontradas), 'multiples', 'cambios_signo' y 'metodo'
+    """
+    cambios = cambios_de_signo(coeficientes)
+    resultado = {
+        'tir': None,
+        'tirs': [],
+        'multiples': cambios > 1,
+        'cambios_signo': cambios,
+        'metodo': None
+    }
+    if cambios == 0:
+        # Todos los flujos del mismo signo: el VAN nunca se anula
+        return resultado
+
+    if cambios == 1:
+        # TIR única: basta acotarla por cambio de signo en el rango
+        x_bajo, x_alto = _tasa_a_x(tasa_max), _tasa_a_x(tasa_min)
+        p_bajo = _horner(coeficientes, x_bajo)[0]
+        p_alto = _horner(coeficientes, x_alto)[0]
+        if p_bajo == 0 or p_alto == 0 or (p_bajo > 0) != (p_alto > 0):
+            x = _halley_acotado(coeficientes, x_bajo, x_alto,
+                                _tasa_a_x(tasa_inicial), tol, max_iter)
+            if x is not None:
+                tasa = float(_x_a_tasa(x))
+                resultado.update(tir=tasa, tirs=[tasa], metodo='halley')
+        return resultado
+
+    # Varios cambios de signo: puede haber 0, 2, ... TIR. Se buscan todas.
+    tasas = _raices_reales(coeficientes, tasa_min, tasa_max)
+    resultado['tirs'] = tasas
+    resultado['multiples'] = len(tasas) > 1
+    resultado['metodo'] = 'matriz_companera'
+    if tasas:
+        resultado['tir'] = min(tasas, key=lambda t: abs(t - tasa_inicial))
+    return resultado
+
+
+def resolver_tir_lote(coeficientes: np.ndarray, tasa_min: float = TASA_MIN,
+                      tasa_max: float = TASA_MAX, tasa_inicial: float = 0.1,
+                      tol: float = 1e-12, max_iter: int = 100) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Calcula la TIR de N vectores de flujos a la vez.
+
+    Las filas con un solo cambio de signo en los flujos y cambio de signo en
+    el rango se resuelven con Halley acotado vectorizado (cada fila tiene su
+    propio intervalo y máscara de convergencia). Las filas con más de un
+    cambio de signo (posibles TIR múltiples) se resuelven individualmente por
+    la matriz compañera, igual que resolver_tir, para reportar la misma TIR
+    (la más cercana a tasa_inicial) y no la que alcance Halley.
+
+    Args:
+        coeficientes: Matriz N×(T+1) con c₀..c_T por fila
+
+    Returns:
+        Tuple: (vector de TIR con NaN donde no existe, vector booleano de
+        filas con posibles TIR múltiples)
+    """
+    c = np.asarray(coeficientes, dtype=np.float64)
+    if c.ndim != 2:
+        raise ValueError("Se esperaba una matriz N×(T+1) de flujos")
+    n = c.shape[0]
+
+    def horner(x):
+        p = np.zeros_like(x)
+        d1 = np.zeros_like(x)
+        d2 = np.zeros_like(x)
+        for j in range(filas.shape[1] - 1, -1, -1):
+            d2 = d2 * x + d1
+            d1 = d1 * x + p
+            p = p * x + filas[:, j]
+        return p, d1, 2.0 * d2
+
+    # Cambios de signo por fila (Descartes), ignorando ceros
+    signos = np.sign(c)
+    cambios = np.zeros(n, dtype=np.int64)
+    previo = np.zeros(n)
+    for j in range(c.shape[1]):
+        s = signos[:, j]
+        cambios += ((previo != 0) & (s != 0) & (s != previo)).astype(np.int64)
+        previo = np.where(s != 0, s, previo)
+
+    tirs = np.full(n, np.nan)
+    x_min, x_max = _tasa_a_x(tasa_max), _tasa_a_x(tasa_min)
+
+    with np.errstate(over='ignore', invalid='ignore', divide='ignore'):
+        # Columnas contiguas para que Horner recorra c_j sin copias
+        filas = np.asfortranarray(c)
+        bajo = np.full(n, x_min)
+        alto = np.full(n, x_max)
+        p_bajo = horner(bajo)[0]
+        p_alto = horner(alto)[0]
+        acotadas = (np.sign(p_bajo) != np.sign(p_alto)) | (p_bajo == 0) | (p_alto == 0)
+
+        # Halley acotado solo sobre las filas con TIR única en el rango
+        idx = np.flatnonzero(acotadas & (cambios <= 1))
+        filas = np.asfortranarray(c[idx])
+        bajo, alto, p_bajo = bajo[idx], alto[idx], p_bajo[idx]
+        x = np.full(len(idx), _tasa_a_x(tasa_inicial))
+        if not (x_min < _tasa_a_x(tasa_inicial) < x_max):
+            x = 0.5 * (bajo + alto)
+        activas = np.ones(len(idx), dtype=bool)
+        for _ in range(max_iter):
+            if not activas.any():
+                break
+            p, d1, d2 = horner(x)
+            mismo = (p > 0) == (p_bajo > 0)
+            bajo = np.where(mismo, x, bajo)
+            p_bajo = np.where(mismo, p, p_bajo)
+            alto = np.where(mismo, alto, x)
+
+            x_nuevo = x - 2.0 * p * d1 / (2.0 * d1 * d1 - p * d2)
+            fuera = ~((x_nuevo > bajo) & (x_nuevo < alto))
+            x_nuevo = np.where(fuera, 0.5 * (bajo + alto), x_nuevo)
+            x_nuevo = np.where(p == 0, x, x_nuevo)
+
+            escala = np.maximum(1.0, np.abs(x))
+            convergio = (np.abs(x_nuevo - x) <= tol * escala) | ((alto - bajo) <= tol * escala) | (p == 0)
+            x = np.where(activas, x_nuevo, x)
+            activas &= ~convergio
+
+        tirs[idx] = 1.0 / x - 1.0
+
+    # Posibles TIR múltiples, con o sin cambio de signo en los extremos del rango
+    for i in np.flatnonzero(cambios > 1):
+        resultado = resolver_tir(c[i].tolist(), tasa_min, tasa_max, tasa_inicial, tol, max_iter)
+        if resultado['tir'] is not None:
+            tirs[i] = resultado['tir']
+
+    return tirs, cambios > 1
@@ -1,4 +1,7 @@
 import os
+import threading
+import time
+from flask import current_app, g, has_request_context, jsonify
 from app.config import Config
 
 # Importar módulos de base de datos
@@ -36,6 +39,285 @@ else:
     USE_POSTGRESQL = False
     print("🐘 Usando SQLite (desarrollo)")
 
+def _crear_conexion_fisica():
+    """Abrir una conexión nueva contra el motor configurado (sin pool)"""
+    if USE_POSTGRESQL:
+        # Conexión PostgreSQL usando DATABASE_URI completa
+        if Config.DATABASE_URL:
+            # Usar DATABASE_URL completa (Render)
+            conn = psycopg2.connect(
+                Config.DATABASE_URI,
+                options="-c client_encoding=UTF8"
+            )
+        else:
+            # Usar configuración individual (desarrollo/producción alternativa)
+            conn = psycopg2.connect(
+                dbname=getattr(Config, 'DB_NAME', 'econova_db'),
+                user=getattr(Config, 'DB_USER', 'postgres'),
+                password=getattr(Config, 'DB_PASSWORD', 'postgres'),
+                host=getattr(Config, 'DB_HOST', 'localhost'),
+                port=getattr(Config, 'DB_PORT', '5432'),
+                options="-c client_encoding=UTF8"
+            )
+        print("✅ Conexión PostgreSQL exitosa")
+        return conn
+
+    # Conexión SQLite. Las conexiones del pool se usan por un solo hilo a la
+    # vez, pero pueden pasar de un hilo a otro entre préstamos.
+    db_name = getattr(Config, 'DB_NAME', 'econova.db')
+    db_path = db_name if db_name and db_name.endswith('.db') else 'econova.db'
+    conn = sqlite3.connect(db_path, check_same_thread=False)
+    conn.row_factory = sqlite3.Row
+    print("✅ Conexión SQLite exitosa")
+    return conn
+
+
+class _ConexionEnPool:
+    """Conexión física junto con sus marcas de tiempo dentro del pool"""
+
+    __slots__ = ('conn', 'creada_en', 'devuelta_en')
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.creada_en = time.monotonic()
+        self.devuelta_en = self.creada_en
+
+
+class ConnectionPool:
+    """
+    Pool de conexiones acotado, seguro entre hilos y propio de cada proceso.
+
+    - Tamaño máximo: nunca hay más de ``max_size`` conexiones abiertas; si
+      todas están prestadas, ``acquire`` espera hasta ``timeout`` segundos.
+    - Health-check: antes de prestar una conexión se valida que siga viva.
+    - Vida máxima: las conexiones más viejas que ``max_lifetime`` se cierran.
+    - Reaping: las conexiones ociosas más de ``max_idle`` segundos se cierran.
+
+    Los workers de gunicorn heredan el módulo al hacer fork; el pool detecta el
+    cambio de PID y descarta las conexiones del proceso padre sin usarlas.
+    """
+
+    def __init__(self, factory, max_size=10, timeout=10.0, max_lifetime=1800.0,
+                 max_idle=300.0, pre_ping=True):
+        self._factory = factory
+        self.max_size = max(1, int(max_size))
+        self.timeout = timeout
+        self.max_lifetime = max_lifetime
+        self.max_idle = max_idle
+        self.pre_ping = pre_ping
+
+        self._lock = threading.Lock()
+        self._disponible = threading.Condition(self._lock)
+        self._inicializar_estado()
+
+    def _inicializar_estado(self):
+        self._pid = os.getpid()
+        self._ociosas = []  # LIFO: la última devuelta es la más "caliente"
+        self._prestadas = {}  # id(conn) -> _ConexionEnPool
+        self._abiertas = 0
+        self._stats = {
+            'creadas': 0,
+            'reutilizadas': 0,
+            'descartadas_rotas': 0,
+            'descartadas_expiradas': 0,
+            'descartadas_ociosas': 0,
+            'esperas': 0,
+            'timeouts': 0,
+        }
+
+    def _verificar_fork(self):
+        """Reiniciar el estado si estamos en un proceso hijo (llamar con lock)"""
+        if self._pid != os.getpid():
+            # No cerramos las conexiones heredadas: el socket pertenece al padre
+            self._inicializar_estado()
+
+    def _esta_viva(self, conn):
+        """Health-check barato de la conexión antes de prestarla"""
+        try:
+            if USE_POSTGRESQL and POSTGRESQL_AVAILABLE:
+                if conn.closed:
+                    return False
+                if not self.pre_ping:
+                    return True
+                cur = conn.cursor()
+                cur.execute("SELECT 1")
+                cur.close()
+                conn.rollback()
+                return True
+            if self.pre_ping:
+                conn.execute("SELECT 1")
+            return True
+        except Exception:
+            return False
+
+    def _cerrar(self, conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def _reap_ociosas(self, ahora):
+        """Cerrar conexiones ociosas o expiradas (llamar con lock)"""
+        vigentes = []
+        cerrar = []
+        for entrada in self._ociosas:
+            if self.max_lifetime and ahora - entrada.creada_en > self.max_lifetime:
+                self._stats['descartadas_expiradas'] += 1
+                cerrar.append(entrada)
+            elif self.max_idle and ahora - entrada.devuelta_en > self.max_idle:
+                self._stats['descartadas_ociosas'] += 1
+                cerrar.append(entrada)
+            else:
+                vigentes.append(entrada)
+        self._ociosas = vigentes
+        self._abiertas -= len(cerrar)
+        return cerrar
+
+    def acquire(self):
+        """Prestar una conexión del pool (creándola si hace falta)"""
+        limite = time.monotonic() + self.timeout
+        while True:
+            with self._lock:
+                self._verificar_fork()
+                por_cerrar = self._reap_ociosas(time.monotonic())
+
+                entrada = None
+                crear = False
+                while entrada is None and not crear:
+                    if self._ociosas:
+                        entrada = self._ociosas.pop()
+                    elif self._abiertas < self.max_size:
+                        # Reservar el cupo antes de conectar fuera del lock
+                        self._abiertas += 1
+                        crear = True
+                    else:
+                        restante = limite - time.monotonic()
+                        if restante <= 0:
+                            self._stats['timeouts'] += 1
+                            raise TimeoutError(
+                                f"Pool de conexiones agotado ({self.max_size} en uso)"
+                            )
+                        self._stats['esperas'] += 1
+                        self._disponible.wait(restante)
+
+            for vieja in por_cerrar:
+                self._cerrar(vieja.conn)
+
+            if crear:
+                try:
+                    entrada = _ConexionEnPool(self._factory())
+                except Exception:
+                    with self._lock:
+                        self._abiertas -= 1
+                        self._disponible.notify()
+                    raise
+                with self._lock:
+                    self._stats['creadas'] += 1
+                    self._prestadas[id(entrada.conn)] = entrada
+                return entrada.conn
+
+            if self._esta_viva(entrada.conn):
+                with self._lock:
+                    self._stats['reutilizadas'] += 1
+                    self._prestadas[id(entrada.conn)] = entrada
+                return entrada.conn
+
+            # Conexión rota: liberar su cupo y volver a intentar
+            self._cerrar(entrada.conn)
+            with self._lock:
+                self._abiertas -= 1
+                self._stats['descartadas_rotas'] += 1
+
+    def release(self, conn, descartar=False):
+        """Devolver una conexión prestada al pool"""
+        with self._lock:
+            if self._pid != os.getpid():
+                return
+            entrada = self._prestadas.pop(id(conn), None)
+        if entrada is None:
+            # No pertenece a este pool (p. ej. prestada antes de un reset)
+            self._cerrar(conn)
+            return
+
+        if not descartar:
+            try:
+                # No dejar transacciones abiertas para el próximo usuario
+                conn.rollback()
+            except Exception:
+                descartar = True
+                with self._lock:
+                    self._stats['descartadas_rotas'] += 1
+
+        ahora = time.monotonic()
+        if not descartar and self.max_lifetime and ahora - entrada.creada_en > self.max_lifetime:
+            descartar = True
+            with self._lock:
+                self._stats['descartadas_expiradas'] += 1
+
+        if descartar:
+            self._cerrar(conn)
+            with self._lock:
+                self._abiertas -= 1
+                self._disponible.notify()
+            return
+
+        entrada.devuelta_en = ahora
+        with self._lock:
+            self._ociosas.append(entrada)
+            self._disponible.notify()
+
+    def close_all(self):
+        """Cerrar todas las conexiones ociosas del pool"""
+        with self._lock:
+            self._verificar_fork()
+            ociosas = self._ociosas
+            self._ociosas = []
+            self._abiertas -= len(ociosas)
+            self._disponible.notify_all()
+        for entrada in ociosas:
+            self._cerrar(entrada.conn)
+
+    def stats(self):
+        """Estadísticas del pool para monitoreo"""
+        with self._lock:
+            self._verificar_fork()
+            return {
+                'pid': self._pid,
+                'motor': 'postgresql' if USE_POSTGRESQL else 'sqlite',
+                'max_size': self.max_size,
+                'abiertas': self._abiertas,
+                'en_uso': len(self._prestadas),
+                'ociosas': len(self._ociosas),
+                **self._stats,
+            }
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """Obtener el pool de conexiones del proceso (creación perezosa)"""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool(
+                    _crear_conexion_fisica,
+                    max_size=getattr(Config, 'DB_POOL_MAX_SIZE', 10),
+                    timeout=getattr(Config, 'DB_POOL_TIMEOUT', 10.0),
+                    max_lifetime=getattr(Config, 'DB_POOL_MAX_LIFETIME', 1800.0),
+                    max_idle=getattr(Config, 'DB_POOL_MAX_IDLE', 300.0),
+                    pre_ping=getattr(Config, 'DB_POOL_PRE_PING', True),
+                )
+    return _pool
+
+
+def get_pool_stats():
+    """Estadísticas del pool de conexiones del proceso actual"""
+    return get_pool().stats()
+
+
 class DatabaseConnection:
     def __init__(self):
         self.conn = None
@@ -43,46 +325,42 @@ class DatabaseConnection:
         self.use_postgresql = USE_POSTGRESQL
 
     def connect(self):
+        """Tomar una conexión del pool; si ya hay una prestada se reutiliza"""
+        if self.conn is not None:
+            return True
         try:
+            self.conn = get_pool().acquire()
             if self.use_postgresql:
-                # Conexión PostgreSQL usando DATABASE_URI completa
-                if Config.DATABASE_URL:
-                    # Usar DATABASE_URL completa (Render)
-                    self.conn = psycopg2.connect(
-                        Config.DATABASE_URI,
-                        options="-c client_encoding=UTF8"
-                    )
-                else:
-                    # Usar configuración individual (desarrollo/producción alternativa)
-                    self.conn = psycopg2.connect(
-                        dbname=getattr(Config, 'DB_NAME', 'econova_db'),
-                        user=getattr(Config, 'DB_USER', 'postgres'),
-                        password=getattr(Config, 'DB_PASSWORD', 'postgres'),
-                        host=getattr(Config, 'DB_HOST', 'localhost'),
-                        port=getattr(Config, 'DB_PORT', '5432'),
-                        options="-c client_encoding=UTF8"
-                    )
                 self.cur = self.conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-                print("✅ Conexión PostgreSQL exitosa")
-                return True
             else:
-                # Conexión SQLite
-                db_name = getattr(Config, 'DB_NAME', 'econova.db')
-                db_path = db_name if db_name and db_name.endswith('.db') else 'econova.db'
-                self.conn = sqlite3.connect(db_path)
-                self.conn.row_factory = sqlite3.Row
                 self.cur = self.conn.cursor()
-                print("✅ Conexión SQLite exitosa")
-                return True
+            return True
         except Exception as e:
             print(f"❌ Error conectando a base de datos: {e}")
+            if self.conn is not None:
+                get_pool().release(self.conn, descartar=True)
+                self.conn = None
             return False
 
     def disconnect(self):
+        """Devolver la conexión al pool"""
         if self.cur:
-            self.cur.close()
+            try:
+                self.cur.close()
+            except Exception:
+                pass
+            self.cur = None
         if self.conn:
-            self.conn.close()
+            conn = self.conn
+            self.conn = None
+            get_pool().release(conn)
+
+    def __del__(self):
+        # Red de seguridad para código que olvida llamar a disconnect()
+        try:
+            self.disconnect()
+        except Exception:
+            pass
 
     def execute_query(self, query, params=None, fetch=False):
         try:
@@ -102,7 +380,7 @@ class DatabaseConnection:
         except Exception as e:
             print(f"Error executing query: {e}")
             if self.conn:
-                self.conn.rollback()
+                self.rollback()
             return False
 
     def commit(self):
@@ -124,9 +402,221 @@ class DatabaseConnection:
             print(f"Error en rollback: {e}")
         return False
 
+class _UnidadDeTrabajo:
+    """
+    Conexión y transacción únicas de una solicitud HTTP (guardada en ``g``).
+
+    Cada ``get_db_connection()`` dentro de la solicitud entrega una
+    ``ConexionDeSolicitud`` que trabaja sobre un SAVEPOINT propio, de modo que
+    los ``rollback`` de los modelos siguen aislando su trabajo (y el de los
+    modelos anidados) sin abortar la transacción real. Esta se confirma una
+    sola vez al final si algún modelo llamó a ``commit``; si no, se revierte.
+    Una vista que se cierra sin ``commit`` descarta su trabajo, como al
+    cerrar una conexión propia sin confirmar.
+    """
+
+    def __init__(self):
+        self.db = DatabaseConnection()
+        self.pendiente = False  # algún modelo confirmó cambios
+        self._savepoints = []
+        self._con_confirmados = set()  # savepoints que contienen commits de vistas anidadas
+        self._contador = 0
+
+    def iniciar(self):
+        """
+        Tomar la conexión y abrir la transacción de la solicitud.
+
+        En SQLite un SAVEPOINT fuera de una transacción abre una propia y su
+        RELEASE la confirma, así que se emite BEGIN explícito para que los
+        savepoints queden anidados. psycopg2 ya abre la transacción con la
+        primera sentencia (incluido el primer SAVEPOINT).
+        """
+        if not self.db.connect():
+            return False
+        try:
+            if not self.db.use_postgresql and not self.db.conn.in_transaction:
+                self.db.cur.execute("BEGIN")
+            return True
+        except Exception as e:
+            print(f"❌ Error iniciando transacción de la solicitud: {e}")
+            self.db.disconnect()
+            return False
+
+    def abrir_savepoint(self):
+        self._contador += 1
+        nombre = f"uow_{self._contador}"
+        self.db.cur.execute(f"SAVEPOINT {nombre}")
+        self._savepoints.append(nombre)
+        return nombre
+
+    def activo(self, nombre):
+        return nombre in self._savepoints
+
+    def _descartar_desde(self, indice):
+        # Liberar o revertir un savepoint destruye también los posteriores
+        self._con_confirmados.difference_update(self._savepoints[indice:])
+        del self._savepoints[indice:]
+
+    def liberar_savepoint(self, nombre):
+        if self.activo(nombre):
+            self.db.cur.execute(f"RELEASE SAVEPOINT {nombre}")
+            self._descartar_desde(self._savepoints.index(nombre))
+
+    def confirmar_savepoint(self, nombre):
+        """
+        Liberar el savepoint de una vista que confirma. Su trabajo pasa a los
+        savepoints que la envuelven, que ya no pueden descartarse al cerrar
+        sin revertir también este commit.
+        """
+        if self.activo(nombre):
+            self.liberar_savepoint(nombre)
+            self._con_confirmados.update(self._savepoints)
+            self.pendiente = True
+
+    def revertir_savepoint(self, nombre):
+        if self.activo(nombre):
+            self.db.cur.execute(f"ROLLBACK TO SAVEPOINT {nombre}")
+            # ROLLBACK TO destruye los savepoints posteriores pero conserva este
+            self._descartar_desde(self._savepoints.index(nombre) + 1)
+            self._con_confirmados.discard(nombre)
+
+    def cerrar_savepoint(self, nombre):
+        """
+        Cerrar el savepoint de una vista que no confirmó: su trabajo se
+        revierte, salvo que contenga commits de vistas anidadas
+        """
+        if self.activo(nombre):
+            if nombre not in self._con_confirmados:
+                self.db.cur.execute(f"ROLLBACK TO SAVEPOINT {nombre}")
+            self.liberar_savepoint(nombre)
+
+    def finalizar(self, confirmar=True):
+        """Confirmar (o revertir) la transacción y devolver la conexión al pool"""
+        try:
+            if confirmar and self.pendiente:
+                self.db.conn.commit()
+            else:
+                self.db.conn.rollback()
+            return True
+        except Exception as e:
+            print(f"Error finalizando transacción de la solicitud: {e}")
+            self.db.rollback()
+            return False
+        finally:
+            self._savepoints = []
+            self._con_confirmados = set()
+            self.db.disconnect()
+
+
+class ConexionDeSolicitud(DatabaseConnection):
+    """Vista de ``DatabaseConnection`` sobre la conexión compartida de la solicitud"""
+
+    def __init__(self, unidad):
+        super().__init__()
+        self._unidad = unidad
+        self._savepoint = None
+
+    def connect(self):
+        if self.cur is not None:
+            return True
+        try:
+            self.conn = self._unidad.db.conn
+            if self.use_postgresql:
+                self.cur = self.conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+            else:
+                self.cur = self.conn.cursor()
+            self._savepoint = self._unidad.abrir_savepoint()
+            return True
+        except Exception as e:
+            print(f"❌ Error abriendo savepoint de la solicitud: {e}")
+            self.conn = None
+            self.cur = None
+            return False
+
+    def disconnect(self):
+        # Lo no confirmado desde el último commit se descarta (ver cerrar_savepoint)
+        if self._savepoint is not None:
+            try:
+                self._unidad.cerrar_savepoint(self._savepoint)
+            except Exception as e:
+                print(f"Error cerrando savepoint: {e}")
+            self._savepoint = None
+        if self.cur:
+            try:
+                self.cur.close()
+            except Exception:
+                pass
+            self.cur = None
+        self.conn = None
+
+    def commit(self):
+        try:
+            self._unidad.confirmar_savepoint(self._savepoint)
+            self._savepoint = self._unidad.abrir_savepoint()
+            return True
+        except Exception as e:
+            print(f"Error committing transaction: {e}")
+            self.rollback()
+            return False
+
+    def rollback(self):
+        """Revertir solo el trabajo de esta vista"""
+        try:
+            if self._savepoint is not None:
+                self._unidad.revertir_savepoint(self._savepoint)
+                return True
+        except Exception as e:
+            print(f"Error en rollback: {e}")
+        return False
+
+
+_CLAVE_UNIDAD = '_econova_unidad_de_trabajo'
+
+
+def _obtener_unidad_de_trabajo():
+    """Unidad de trabajo de la solicitud actual, o None fuera de una solicitud"""
+    if not has_request_context() or not current_app.config.get('DB_UNIT_OF_WORK', True):
+        return None
+    unidad = g.get(_CLAVE_UNIDAD)
+    if unidad is None:
+        unidad = _UnidadDeTrabajo()
+        if not unidad.iniciar():
+            return None
+        setattr(g, _CLAVE_UNIDAD, unidad)
+    return unidad
+
+
+def registrar_unidad_de_trabajo(app):
+    """Confirmar la transacción de cada solicitud una sola vez al terminarla"""
+
+    @app.after_request
+    def _confirmar_unidad_de_trabajo(response):
+        unidad = g.pop(_CLAVE_UNIDAD, None)
+        if unidad is None:
+            return response
+        confirmar = response.status_code < 500
+        if not unidad.finalizar(confirmar=confirmar) and confirmar:
+            response = jsonify({"error": "Error guardando los cambios", "status": 500})
+            response.status_code = 500
+        return response
+
+    @app.teardown_request
+    def _cerrar_unidad_de_trabajo(exc):
+        # Solo queda una unidad aquí si la solicitud terminó con una excepción
+        unidad = g.pop(_CLAVE_UNIDAD, None)
+        if unidad is not None:
+            unidad.finalizar(confirmar=False)
+
+
 def get_db_connection():
-    """Obtener nueva instancia de conexión de base de datos ya conectada"""
-    db = DatabaseConnection()
+    """
+    Obtener instancia de conexión de base de datos ya conectada.
+
+    Dentro de una solicitud HTTP se reutiliza la conexión de la solicitud;
+    fuera de ella (scripts, inicialización) se toma una del pool.
+    """
+    unidad = _obtener_unidad_de_trabajo()
+    db = ConexionDeSolicitud(unidad) if unidad is not None else DatabaseConnection()
     if db.connect():
         return db
     else:
@@ -136,9 +626,10 @@ def get_db_connection():
 def init_db():
     """Inicializar conexión de base de datos"""
     temp_db = DatabaseConnection()
-    return temp_db.connect()
+    conectado = temp_db.connect()
+    temp_db.disconnect()
+    return conectado
 
 def close_db():
-    """Cerrar conexión de base de datos"""
-    temp_db = DatabaseConnection()
-    temp_db.disconnect()
+    """Cerrar las conexiones ociosas del pool"""
+    get_pool().close_all()
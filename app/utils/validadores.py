@@ -1,7 +1,8 @@
 # Validadores de datos para simulaciones financieras
 
-from typing import List, Dict, Any, Union
+from typing import List, Dict, Any, Union, Tuple
 from decimal import Decimal, InvalidOperation
+import numpy as np
 
 def validar_numero_positivo(valor: Any, nombre_campo: str = "valor") -> float:
     """
@@ -73,6 +74,77 @@ def validar_flujos_caja(flujos: List[float], nombre_campo: str = "flujos de caja
     except (TypeError, ValueError) as e:
         raise ValueError(f"{nombre_campo} contiene valores inválidos: {e}")
 
+def validar_matriz_flujos(flujos: List[List[float]], nombre_campo: str = "flujos de caja") -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Valida una matriz N×T de flujos de caja (un proyecto por fila)
+
+    Las filas pueden tener distinta longitud: se completan con ceros al final,
+    lo que no altera ni el VAN ni la TIR del proyecto.
+
+    Args:
+        flujos: Lista de listas de flujos de caja
+        nombre_campo: Nombre del campo
+
+    Returns:
+        Tuple: (matriz float64 N×T, vector con el número de periodos de cada fila)
+    """
+    if not isinstance(flujos, list) or len(flujos) == 0:
+        raise ValueError(f"{nombre_campo} debe ser una lista no vacía de listas")
+
+    periodos = []
+    for i, fila in enumerate(flujos):
+        if not isinstance(fila, list) or len(fila) == 0:
+            raise ValueError(f"{nombre_campo}: el proyecto {i + 1} no tiene flujos")
+        periodos.append(len(fila))
+
+    matriz = np.zeros((len(flujos), max(periodos)), dtype=np.float64)
+    try:
+        for i, fila in enumerate(flujos):
+            matriz[i, :len(fila)] = fila
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"{nombre_campo} contiene valores inválidos: {e}")
+
+    if not np.all(np.isfinite(matriz)):
+        raise ValueError(f"{nombre_campo} contiene valores no finitos")
+
+    return matriz, np.array(periodos, dtype=np.int64)
+
+def validar_vector_lote(valores: Any, n: int, nombre_campo: str, es_tasa: bool = False) -> np.ndarray:
+    """
+    Valida un escalar o una lista de n valores para un cálculo por lotes
+
+    Args:
+        valores: Escalar (se repite para todos) o lista de longitud n
+        n: Número de proyectos del lote
+        nombre_campo: Nombre del campo
+        es_tasa: Si True aplica las mismas reglas que validar_tasa
+
+    Returns:
+        np.ndarray: Vector float64 de longitud n
+    """
+    try:
+        if isinstance(valores, (list, tuple)):
+            if len(valores) != n:
+                raise ValueError(f"se esperaban {n} valores y se recibieron {len(valores)}")
+            vector = np.array([float(v) for v in valores], dtype=np.float64)
+        else:
+            vector = np.full(n, float(valores), dtype=np.float64)
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"{nombre_campo} inválido: {e}")
+
+    if not np.all(np.isfinite(vector)):
+        raise ValueError(f"{nombre_campo} contiene valores no finitos")
+
+    if es_tasa:
+        # Igual que validar_tasa: valores > 1 se interpretan como porcentaje
+        vector = np.where(vector > 1, vector / 100, vector)
+        if np.any((vector < 0) | (vector > 1)):
+            raise ValueError(f"{nombre_campo} debe estar entre 0% y 100%")
+    elif np.any(vector < 0):
+        raise ValueError(f"{nombre_campo} debe ser positivo")
+
+    return vector
+
 def validar_inversion_inicial(inversion: Any) -> float:
     """
     Valida inversión inicial (debe ser positiva)
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Benchmark de inferencia de los modelos ML: predict nativo frente a los
+árboles convertidos a arrays NumPy (ML_BACKEND_INFERENCIA=numpy)
+
+Entrena modelos con la misma configuración que entrenar_modelos.py sobre
+datos sintéticos (XGBoost si está instalado; si no, un RandomForestClassifier
+para el riesgo) y mide latencia por fila y por lote.
+
+Uso:
+    python benchmarks/benchmark_inferencia.py [filas_lote]
+"""
+
+import sys
+import time
+sys.path.append('.')
+
+import numpy as np
+from sklearn.ensemble import RandomForestRegressor, GradientBoostingRegressor, RandomForestClassifier
+
+from app.servicios.arboles_compilados import compilar_modelo
+
+
+def entrenar_modelos(rng):
+    X = rng.normal(size=(5000, 15))
+    y = X[:, 0] * 2 + np.sin(X[:, 1]) + X[:, 2] * X[:, 3] + rng.normal(size=5000) * 0.1
+    clases = np.digitize(X[:, 4] + X[:, 5], [-0.5, 0.5])
+
+    modelos = {
+        'ingresos (RandomForest)': RandomForestRegressor(
+            n_estimators=100, max_depth=15, min_samples_split=5, random_state=42, n_jobs=-1).fit(X, y),
+        'crecimiento (GradientBoosting)': GradientBoostingRegressor(
+            n_estimators=100, learning_rate=0.1, max_depth=5, random_state=42).fit(X[:, :13], y),
+    }
+    try:
+        import xgboost as xgb
+        modelos['riesgo (XGBoost)'] = xgb.XGBClassifier(
+            n_estimators=100, max_depth=6, learning_rate=0.1, objective='multi:softprob',
+            random_state=42, eval_metric='mlogloss').fit(X[:, :13], clases)
+    except ImportError:
+        modelos['riesgo (RandomForestClassifier)'] = RandomForestClassifier(
+            n_estimators=100, max_depth=10, random_state=42, n_jobs=-1).fit(X[:, :13], clases)
+    return modelos
+
+
+def medir(funcion, X, repeticiones):
+    funcion(X)
+    inicio = time.perf_counter()
+    for _ in range(repeticiones):
+        funcion(X)
+    return (time.perf_counter() - inicio) / repeticiones
+
+
+def main():
+    filas_lote = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    rng = np.random.default_rng(0)
+
+    for nombre, modelo in entrenar_modelos(rng).items():
+        compilado = compilar_modelo(modelo)
+        hibrido = compilar_modelo(modelo, max_filas=64)
+        X = rng.normal(size=(filas_lote, modelo.n_features_in_))
+        metodo = 'predict_proba' if hasattr(modelo, 'predict_proba') else 'predict'
+        diferencia = np.abs(getattr(compilado, metodo)(X) - getattr(modelo, metodo)(X)).max()
+
+        print(f"{nombre}: {compilado.describir()}  diferencia máx {diferencia:.1e}")
+        for etiqueta, filas, repeticiones in (('1 fila', 1, 200), ('32 filas', 32, 100), (f'{filas_lote} filas', filas_lote, 3)):
+            t_nativo = medir(getattr(modelo, metodo), X[:filas], repeticiones)
+            t_numpy = medir(getattr(compilado, metodo), X[:filas], repeticiones)
+            t_hibrido = medir(getattr(hibrido, metodo), X[:filas], repeticiones)
+            print(f"  {etiqueta:>12}: nativo {t_nativo * 1e3:9.3f} ms   numpy {t_numpy * 1e3:9.3f} ms"
+                  f" ({t_nativo / t_numpy:5.1f}x)   numpy+respaldo {t_hibrido * 1e3:9.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
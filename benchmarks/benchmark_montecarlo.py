@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Benchmark de la simulación Monte Carlo del VAN y la TIR frente a los bucles anteriores
+
+Uso:
+    python benchmarks/benchmark_montecarlo.py [n_simulaciones] [periodos] [n_procesos]
+"""
+
+import os
+import sys
+import time
+sys.path.append('.')
+
+import numpy as np
+
+from app.servicios.ml_servicio import SimulacionMonteCarlo
+from app.servicios.solver_tir import flujos_con_inversion, resolver_tir
+
+
+def van_bucle_anterior(n_simulaciones, inversion, flujos_base, tasa_base,
+                       variacion_flujos=0.15, variacion_tasa=0.02):
+    """Réplica de la implementación previa (un sorteo por flujo y simulación)"""
+    resultados = []
+    for _ in range(n_simulaciones):
+        flujos = [max(0, np.random.normal(f, f * variacion_flujos)) for f in flujos_base]
+        tasa = max(0.01, np.random.normal(tasa_base, variacion_tasa))
+        van = -inversion
+        for t, flujo in enumerate(flujos, 1):
+            van += flujo / ((1 + tasa) ** t)
+        resultados.append(van)
+    return np.array(resultados)
+
+
+def tir_bucle_anterior(n_simulaciones, inversion, flujos_base, variacion_flujos=0.15):
+    """Réplica de la implementación previa (una resolución de TIR por trayectoria)"""
+    resultados = []
+    for _ in range(n_simulaciones):
+        flujos = [max(0, np.random.normal(f, f * variacion_flujos)) for f in flujos_base]
+        tir = resolver_tir(flujos_con_inversion(inversion, flujos))['tir']
+        if tir is not None:
+            resultados.append(tir)
+    return np.array(resultados)
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    periodos = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    n_procesos = int(sys.argv[3]) if len(sys.argv) > 3 else (os.cpu_count() or 1)
+    flujos = [30000.0] * periodos
+    inversion = 150000.0
+    tasa = 0.10
+
+    inicio = time.perf_counter()
+    anterior = van_bucle_anterior(n, inversion, flujos, tasa)
+    t_anterior = time.perf_counter() - inicio
+
+    print(f"Simulaciones: {n}  Periodos: {periodos}")
+    print(f"bucle (anterior):  {n / t_anterior:12,.0f} sim/s  media {anterior.mean():12,.2f}")
+
+    for precision in ('float64', 'float32'):
+        mc = SimulacionMonteCarlo(n_simulaciones=n)
+        inicio = time.perf_counter()
+        resultado = mc.simular_van(inversion, flujos, tasa, precision=precision)
+        t_nuevo = time.perf_counter() - inicio
+        print(f"vectorizado {precision}: {n / t_nuevo:12,.0f} sim/s  media {resultado['van_medio']:12,.2f}"
+              f"  ({t_anterior / t_nuevo:.0f}x)")
+
+    # TIR: bucle con una resolución por trayectoria frente al lote vectorizado
+    n_tir = min(n, 10000)
+    inicio = time.perf_counter()
+    anterior = tir_bucle_anterior(n_tir, inversion, flujos)
+    t_anterior = time.perf_counter() - inicio
+    inicio = time.perf_counter()
+    resultado = SimulacionMonteCarlo(n_simulaciones=n_tir).simular_tir(inversion, flujos)
+    t_nuevo = time.perf_counter() - inicio
+    print(f"TIR bucle ({n_tir} sim):  {t_anterior:8.3f} s  media {anterior.mean() * 100:6.2f}%")
+    print(f"TIR vectorizada:         {t_nuevo:8.3f} s  media {resultado['tir_media']:6.2f}%"
+          f"  ({t_anterior / t_nuevo:.0f}x)")
+
+    # Reducción de varianza: error estándar con el mismo número de simulaciones
+    for metodo in SimulacionMonteCarlo.METODOS:
+        resultado = SimulacionMonteCarlo(n_simulaciones=n).simular_van(inversion, flujos, tasa, metodo=metodo)
+        print(f"{metodo:>16}: error estándar VAN {resultado['error_estandar']:10.2f}"
+              f"  P(VAN>0) {resultado['error_estandar_probabilidad']:.6f}")
+
+    # Modo paralelo: 20 veces más simulaciones repartidas en procesos
+    if n_procesos > 1:
+        n_grande = 20 * n
+        mc = SimulacionMonteCarlo(n_simulaciones=n_grande)
+        mc.simular_van(inversion, flujos, tasa, n_procesos=n_procesos)  # arranque del pool
+        inicio = time.perf_counter()
+        resultado = mc.simular_van(inversion, flujos, tasa, n_procesos=n_procesos)
+        t_paralelo = time.perf_counter() - inicio
+        print(f"{n_procesos} procesos ({n_grande} sim): {n_grande / t_paralelo:12,.0f} sim/s"
+              f"  media {resultado['van_medio']:12,.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Benchmark del solver de TIR frente al cálculo anterior con scipy.optimize.newton
+
+Uso:
+    python benchmarks/benchmark_tir.py [n_vectores]
+"""
+
+import sys
+import time
+sys.path.append('.')
+
+import numpy as np
+from scipy.optimize import newton
+
+from app.servicios.solver_tir import resolver_tir, resolver_tir_lote
+
+
+def tir_newton_anterior(inversion, flujos):
+    """Réplica de la implementación previa (closure + newton desde x0=0.1)"""
+    def van_funcion(tasa):
+        van = -inversion
+        for t, flujo in enumerate(flujos, start=1):
+            van += flujo / ((1 + tasa) ** t)
+        return van
+    try:
+        return newton(van_funcion, x0=0.1, maxiter=100)
+    except Exception:
+        return None
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    rng = np.random.default_rng(42)
+    flujos = np.maximum(0, rng.normal(300, 45, size=(n, 5)))
+    matriz = np.column_stack([np.full(n, -1000.0), flujos])
+    filas = matriz.tolist()
+
+    inicio = time.perf_counter()
+    anteriores = [tir_newton_anterior(-f[0], f[1:]) for f in filas]
+    t_anterior = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    nuevas = [resolver_tir(f)['tir'] for f in filas]
+    t_nuevo = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    lote, _ = resolver_tir_lote(matriz)
+    t_lote = time.perf_counter() - inicio
+
+    fallidas = sum(1 for t in anteriores if t is None)
+    diferencia = max(abs(a - b) for a, b in zip(anteriores, nuevas) if a is not None)
+
+    print(f"Vectores de flujos: {n}")
+    print(f"newton (anterior):   {t_anterior / n * 1e6:8.1f} µs/llamada  ({fallidas} sin converger)")
+    print(f"resolver_tir:        {t_nuevo / n * 1e6:8.1f} µs/llamada  ({t_anterior / t_nuevo:.1f}x)")
+    print(f"resolver_tir_lote:   {t_lote / n * 1e6:8.1f} µs/vector   ({t_anterior / t_lote:.1f}x)")
+    print(f"Diferencia máxima entre métodos: {diferencia:.2e}")
+    print(f"Diferencia máxima escalar vs lote: {np.nanmax(np.abs(np.array(nuevas) - lote)):.2e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -13,6 +13,7 @@ Uso:
         predecir_ingresos,
         predecir_crecimiento,
         clasificar_riesgo,
+        predecir_lote,
         simular_monte_carlo_van,
         analisis_tornado,
         analisis_escenarios
@@ -23,6 +24,7 @@ from ml.predecir import (
     predecir_ingresos,
     predecir_crecimiento,
     clasificar_riesgo,
+    predecir_lote,
     simular_monte_carlo_van,
     analisis_tornado,
     analisis_escenarios
@@ -32,6 +34,7 @@ __all__ = [
     'predecir_ingresos',
     'predecir_crecimiento',
     'clasificar_riesgo',
+    'predecir_lote',
     'simular_monte_carlo_van',
     'analisis_tornado',
     'analisis_escenarios'
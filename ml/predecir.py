@@ -142,13 +142,44 @@ def clasificar_riesgo(datos_empresa: Dict[str, float]) -> Dict[str, Any]:
         return _clasificar_riesgo_simple(datos_empresa)
 
 
+def predecir_lote(
+    empresas: List[Dict[str, float]],
+    modelos: Optional[List[str]] = None
+) -> List[Dict[str, Any]]:
+    """
+    Predice ingresos, crecimiento y riesgo de varias empresas en una pasada.
+    
+    Args:
+        empresas: Lista de diccionarios como los de predecir_ingresos
+        modelos: Subconjunto de ['ingresos', 'crecimiento', 'riesgo'] (default todos)
+        
+    Returns:
+        Lista con un dict por empresa: {'ingresos': ..., 'crecimiento': ..., 'riesgo': ...}
+        
+    Example:
+        >>> resultados = predecir_lote([empresa_a, empresa_b], modelos=['riesgo'])
+        >>> print([r['riesgo']['nivel_riesgo'] for r in resultados])
+    """
+    if SERVICIOS_DISPONIBLES:
+        return obtener_servicio_ml().predecir_lote(empresas, modelos)
+    
+    simples = {
+        'ingresos': _predecir_ingresos_simple,
+        'crecimiento': _predecir_crecimiento_simple,
+        'riesgo': _clasificar_riesgo_simple
+    }
+    modelos = modelos or list(simples)
+    return [{modelo: simples[modelo](empresa) for modelo in modelos} for empresa in empresas]
+
+
 def simular_monte_carlo_van(
     inversion_inicial: float,
     flujos_caja: List[float],
     tasa_descuento: float,
     variacion_flujos: float = 0.15,
     variacion_tasa: float = 0.02,
-    n_simulaciones: int = 10000
+    n_simulaciones: int = 10000,
+    semilla: Optional[int] = 42
 ) -> Dict[str, Any]:
     """
     Realiza una simulación Monte Carlo para el VAN de un proyecto.
@@ -160,6 +191,7 @@ def simular_monte_carlo_van(
         variacion_flujos: Coeficiente de variación de flujos (default 15%)
         variacion_tasa: Desviación estándar de la tasa (default 2%)
         n_simulaciones: Número de simulaciones (default 10000)
+        semilla: Semilla para reproducir la simulación (None = aleatoria)
         
     Returns:
         Dict con estadísticas de la simulación
@@ -174,7 +206,7 @@ def simular_monte_carlo_van(
         >>> print(f"Probabilidad VAN > 0: {resultado['probabilidad_van_positivo']:.1%}")
     """
     if SERVICIOS_DISPONIBLES:
-        mc = SimulacionMonteCarlo(n_simulaciones=n_simulaciones)
+        mc = SimulacionMonteCarlo(n_simulaciones=n_simulaciones, seed=semilla)
         return mc.simular_van(
             inversion_inicial=inversion_inicial,
             flujos_base=flujos_caja,
@@ -185,7 +217,7 @@ def simular_monte_carlo_van(
     else:
         return _simular_monte_carlo_simple(
             inversion_inicial, flujos_caja, tasa_descuento, 
-            variacion_flujos, variacion_tasa, n_simulaciones
+            variacion_flujos, variacion_tasa, n_simulaciones, semilla
         )
 
 
@@ -323,14 +355,14 @@ def _clasificar_riesgo_simple(datos: Dict[str, float]) -> Dict[str, Any]:
     }
 
 
-def _simular_monte_carlo_simple(inv, flujos, tasa, var_flujos, var_tasa, n_sim) -> Dict[str, Any]:
+def _simular_monte_carlo_simple(inv, flujos, tasa, var_flujos, var_tasa, n_sim, semilla=42) -> Dict[str, Any]:
     """Simulación Monte Carlo simplificada."""
-    np.random.seed(42)
+    rng = np.random.default_rng(semilla)
     resultados = []
     
     for _ in range(n_sim):
-        flujos_sim = [max(0, np.random.normal(f, f * var_flujos)) for f in flujos]
-        tasa_sim = max(0.01, np.random.normal(tasa, var_tasa))
+        flujos_sim = [max(0, rng.normal(f, abs(f) * var_flujos)) for f in flujos]
+        tasa_sim = max(0.01, rng.normal(tasa, var_tasa))
         
         van = -inv
         for t, f in enumerate(flujos_sim, 1):
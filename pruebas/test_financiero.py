@@ -89,6 +89,316 @@ class TestFinancieroServicio:
 
         assert not FinancieroServicio.validar_datos_financieros(datos_invalidos)
 
+    def test_calcular_van_lote(self):
+        """Test VAN/TIR por lotes coincide con el cálculo individual"""
+        inversiones = [1000, 800, 500]
+        flujos = [[200, 300, 400, 500], [100, 100], [600]]
+        tasas = [0.1, 0.05, 0.12]
+
+        resultado = FinancieroServicio.calcular_van_lote(inversiones, flujos, tasas)
+
+        assert resultado["n_proyectos"] == 3
+        assert resultado["periodos"] == [4, 2, 1]
+        for i in range(3):
+            individual_van = FinancieroServicio.calcular_van(inversiones[i], flujos[i], tasas[i])
+            assert resultado["van"][i] == pytest.approx(individual_van["van"], abs=0.01)
+            assert resultado["decision"][i] == individual_van["decision"]
+
+        # TIR del primer proyecto ≈ 12.83%
+        assert resultado["tir"][0] == pytest.approx(0.1283, abs=1e-4)
+        assert resultado["resumen"]["mejor_proyecto"] == 0
+
+    def test_calcular_van_lote_invalido(self):
+        """Test VAN por lotes con tasas de longitud incorrecta"""
+        with pytest.raises(ValueError):
+            FinancieroServicio.calcular_van_lote(1000, [[500, 600], [700]], [0.1, 0.1, 0.1])
+
+    def test_solver_tir_multiples(self):
+        """Test detección de TIR múltiples (flujos -100, 230, -132 → 10% y 20%)"""
+        from app.servicios.solver_tir import resolver_tir
+
+        resultado = resolver_tir([-100, 230, -132])
+
+        assert resultado["multiples"]
+        assert resultado["tirs"] == pytest.approx([0.10, 0.20], abs=1e-9)
+        assert resultado["tir"] == pytest.approx(0.10, abs=1e-9)
+
+    def test_solver_tir_lote(self):
+        """Test TIR vectorizada coincide con la escalar"""
+        import numpy as np
+        from app.servicios.solver_tir import resolver_tir, resolver_tir_lote
+
+        matriz = np.array([
+            [-1000, 200, 300, 400, 500],
+            [-1000, 10, 10, 0, 0],
+            [-100, -10, 0, 0, 0],
+            # TIR -50%, 15% y 40%: cambio de signo en el rango y la más cercana al 10% es 15%
+            [-1000, 3050, -2885, 805, 0],
+        ], dtype=float)
+
+        tirs, multiples = resolver_tir_lote(matriz)
+
+        assert tirs[0] == pytest.approx(resolver_tir(matriz[0].tolist())["tir"], abs=1e-10)
+        assert tirs[1] == pytest.approx(resolver_tir(matriz[1].tolist())["tir"], abs=1e-10)
+        assert np.isnan(tirs[2])
+        assert tirs[3] == pytest.approx(resolver_tir(matriz[3].tolist())["tir"], abs=1e-10)
+        assert tirs[3] == pytest.approx(0.15, abs=1e-10)
+        assert multiples.tolist() == [False, False, False, True]
+
+    def test_montecarlo_van_paralelo(self):
+        """Test Monte Carlo en procesos: estadísticas combinadas y reproducibles"""
+        import numpy as np
+        from app.servicios.estadisticas_streaming import EstadisticasStreaming
+        from app.servicios.ml_servicio import SimulacionMonteCarlo
+
+        valores = np.random.default_rng(0).normal(100, 20, 50000)
+        estadisticas = EstadisticasStreaming.con_rango(valores.min(), valores.max())
+        for parte in np.array_split(valores, 3):
+            estadisticas.combinar(EstadisticasStreaming(estadisticas.bordes).agregar(parte))
+        assert estadisticas.media == pytest.approx(valores.mean())
+        assert estadisticas.desviacion == pytest.approx(valores.std())
+        assert estadisticas.percentil(5) == pytest.approx(np.percentile(valores, 5), abs=0.05)
+
+        mc = SimulacionMonteCarlo(n_simulaciones=250000, seed=3)
+        paralelo = mc.simular_van(1000, [400, 400, 400], 0.1, n_procesos=2)
+        repetido = SimulacionMonteCarlo(n_simulaciones=250000, seed=3).simular_van(
+            1000, [400, 400, 400], 0.1, n_procesos=3)
+        serial = SimulacionMonteCarlo(n_simulaciones=250000, seed=3).simular_van(
+            1000, [400, 400, 400], 0.1)
+
+        assert paralelo["n_simulaciones"] == 250000
+        assert paralelo["van_medio"] == repetido["van_medio"]
+        assert paralelo["van_medio"] == pytest.approx(serial["van_medio"], abs=1)
+        assert paralelo["percentil_5"] == pytest.approx(serial["percentil_5"], abs=2)
+
+    def test_montecarlo_reduccion_varianza(self):
+        """Test métodos de reducción de varianza: menor error estándar, misma media"""
+        from app.servicios.ml_servicio import SimulacionMonteCarlo
+
+        resultados = {
+            metodo: SimulacionMonteCarlo(n_simulaciones=4096, seed=1).simular_van(
+                1000, [400, 400, 400], 0.1, metodo=metodo)
+            for metodo in SimulacionMonteCarlo.METODOS
+        }
+
+        estandar = resultados["estandar"]
+        for metodo in ["antitetico", "variable_control", "sobol"]:
+            resultado = resultados[metodo]
+            assert resultado["metodo"] == metodo
+            assert resultado["n_simulaciones"] == 4096
+            assert resultado["error_estandar"] < estandar["error_estandar"] / 5
+            # VAN medio ≈ -4.2 (estimado con 2M simulaciones)
+            assert resultado["van_medio"] == pytest.approx(-4.2, abs=4 * resultado["error_estandar"] + 0.05)
+
+        with pytest.raises(ValueError):
+            SimulacionMonteCarlo(n_simulaciones=10).simular_van(1000, [400], 0.1, metodo="otro")
+
+    def test_montecarlo_parada_adaptativa(self):
+        """Test parada por precisión objetivo y por tiempo"""
+        from app.servicios.ml_servicio import SimulacionMonteCarlo
+
+        mc = SimulacionMonteCarlo(n_simulaciones=1000000, seed=2)
+        resultado = mc.simular_van(1000, [400, 400, 400], 0.1, error_objetivo=1.0)
+
+        assert resultado["convergencia"]["motivo_parada"] == "precision"
+        assert resultado["error_estandar"] <= 1.0
+        assert resultado["n_simulaciones"] < 100000
+
+        resultado = mc.simular_van(1000, [400, 400, 400], 0.1, semiancho_objetivo=1e-9, tiempo_maximo=0.05)
+        assert resultado["convergencia"]["motivo_parada"] == "tiempo"
+        assert not resultado["convergencia"]["objetivo_alcanzado"]
+
+        tir = SimulacionMonteCarlo(n_simulaciones=100000, seed=2).simular_tir(
+            1000, [400, 400, 400], error_objetivo=0.2)
+        assert tir["convergencia"]["motivo_parada"] == "precision"
+        assert tir["error_estandar"] <= 0.2
+        assert tir["tir_media"] == pytest.approx(9.7, abs=1)
+
+    def test_montecarlo_tir_vectorizada(self):
+        """Test TIR simulada por lotes coincide con el solver escalar trayectoria a trayectoria"""
+        import numpy as np
+        from app.servicios.ml_servicio import SimulacionMonteCarlo
+        from app.servicios.solver_tir import flujos_con_inversion, resolver_tir
+
+        flujos_base = [400, 400, 400]
+        tirs = SimulacionMonteCarlo(n_simulaciones=200)._sortear_tir(
+            200, 1000, flujos_base, 0.15, np.random.default_rng(5))
+
+        normales = np.random.default_rng(5).standard_normal((200, 3))
+        flujos = np.maximum(0, np.array(flujos_base) * (1 + 0.15 * normales))
+        esperadas = [resolver_tir(flujos_con_inversion(1000, f))["tir"] for f in flujos.tolist()]
+
+        assert tirs == pytest.approx(np.array(esperadas, dtype=float), abs=1e-9)
+
+    def test_cronograma_prestamo_vectorizado(self):
+        """Test cronograma en forma cerrada coincide con la recurrencia mes a mes y admite tramos"""
+        from app.servicios.prestamo_servicio import ServicioPrestamo
+
+        for tasa_anual in (0, 12.5):
+            cronograma = ServicioPrestamo.generar_cronograma(50000, tasa_anual, 360)
+            cuota = ServicioPrestamo.calcular_cuota_mensual(50000, tasa_anual, 360)
+            saldo = 50000
+            for k in range(360):
+                interes = saldo * tasa_anual / 1200
+                saldo -= cuota - interes
+                assert cronograma["interes"][k] == pytest.approx(interes, abs=1e-6)
+                assert cronograma["saldo_restante"][k] == pytest.approx(max(saldo, 0), abs=1e-6)
+            assert cronograma["capital"].sum() == pytest.approx(50000)
+
+        completo = ServicioPrestamo.calcular_prestamo_completo(50000, 12.5, 60)
+        assert len(completo["tabla_amortizacion"]) == 60
+        assert "paginacion" not in completo
+
+        resumen = ServicioPrestamo.calcular_prestamo_completo(50000, 12.5, 60, incluir_tabla=False)
+        assert "tabla_amortizacion" not in resumen
+        assert resumen["resumen"] == completo["resumen"]
+
+        tramo = ServicioPrestamo.calcular_prestamo_completo(50000, 12.5, 60, desde_mes=13, limite=12)
+        assert tramo["tabla_amortizacion"] == completo["tabla_amortizacion"][12:24]
+        assert tramo["paginacion"] == {"desde_mes": 13, "hasta_mes": 24, "total_cuotas": 60, "hay_mas": True}
+
+        with pytest.raises(ValueError):
+            ServicioPrestamo.calcular_tabla_amortizacion(50000, 12.5, 60, desde_mes=61)
+
+        # Tasa alta y plazo largo: (1+r)^n enorme; se compara con la recurrencia en aritmética exacta
+        from fractions import Fraction
+        for monto, tasa_anual, plazo in ((10000, 100, 300), (50000, 60, 480), (1000, 200, 600)):
+            cronograma = ServicioPrestamo.generar_cronograma(monto, tasa_anual, plazo)
+            r = Fraction(tasa_anual, 1200)
+            cuota = monto * r / (1 - (1 + r) ** -plazo)
+            saldo = Fraction(monto)
+            for k in range(plazo):
+                saldo -= cuota - saldo * r
+                assert cronograma["saldo_restante"][k] == pytest.approx(float(saldo), rel=1e-9, abs=1e-6)
+            assert cronograma["capital"].sum() == pytest.approx(monto)
+        assert len(ServicioPrestamo.calcular_prestamo_completo(10000, 100, 300)["tabla_amortizacion"]) == 300
+
+    def test_optimizar_portafolio(self):
+        """Test frontera eficiente: forma cerrada contra KKT y solo largos contra portafolios aleatorios"""
+        import numpy as np
+
+        retornos = [0.08, 0.12, 0.15, 0.05, 0.10]
+        volatilidades = [0.15, 0.22, 0.30, 0.08, 0.18]
+        correlacion = [[1, 0.3, 0.2, 0.1, 0.4],
+                       [0.3, 1, 0.5, 0.0, 0.3],
+                       [0.2, 0.5, 1, -0.1, 0.2],
+                       [0.1, 0.0, -0.1, 1, 0.1],
+                       [0.4, 0.3, 0.2, 0.1, 1]]
+        mu, vols = np.array(retornos), np.array(volatilidades)
+        cov = np.outer(vols, vols) * np.array(correlacion)
+
+        libre = FinancieroServicio.optimizar_portafolio(retornos, volatilidades, correlacion, 0.03, 20, False)
+        # Sistema KKT de la mínima varianza con Σw = 1
+        kkt = np.block([[2 * cov, np.ones((5, 1))], [np.ones((1, 5)), np.zeros((1, 1))]])
+        minima = np.linalg.solve(kkt, np.r_[np.zeros(5), 1])[:5]
+        assert libre["minima_varianza"]["ponderaciones"] == pytest.approx(minima, abs=1e-4)
+        tangente = np.linalg.solve(cov, mu - 0.03)
+        assert libre["maximo_sharpe"]["ponderaciones"] == pytest.approx(tangente / tangente.sum(), abs=1e-4)
+
+        largos = FinancieroServicio.optimizar_portafolio(retornos, volatilidades, correlacion, 0.03, 20, True)
+        aleatorios = np.random.default_rng(0).dirichlet(np.ones(5), 5000)
+        riesgos = np.sqrt(np.einsum('ij,jk,ik->i', aleatorios, cov, aleatorios))
+        sharpe = (aleatorios @ mu - 0.03) / riesgos
+        for nombre in ("minima_varianza", "maximo_sharpe"):
+            pesos = np.array(largos[nombre]["ponderaciones"])
+            assert pesos.min() >= 0 and pesos.sum() == pytest.approx(1, abs=1e-3)
+        assert largos["minima_varianza"]["riesgo"] <= riesgos.min() + 1e-4
+        assert largos["maximo_sharpe"]["ratio_sharpe"] >= sharpe.max() - 1e-4
+        assert largos["maximo_sharpe"]["ratio_sharpe"] <= libre["maximo_sharpe"]["ratio_sharpe"]
+
+        frontera = largos["frontera"]
+        assert len(frontera["retornos"]) == 20
+        assert frontera["retornos"][-1] == pytest.approx(0.15, abs=1e-4)
+        assert np.all(np.diff(frontera["riesgos"]) >= -1e-4)
+        # Ningún punto solo largos bate a la frontera sin restricciones del mismo retorno
+        inv_uno, inv_mu = np.linalg.solve(cov, np.ones(5)), np.linalg.solve(cov, mu)
+        a, b, c = inv_uno.sum(), inv_mu.sum(), mu @ inv_mu
+        m = np.array(frontera["retornos"])
+        riesgo_libre = np.sqrt((a * m ** 2 - 2 * b * m + c) / (a * c - b * b))
+        assert np.all(np.array(frontera["riesgos"]) >= riesgo_libre - 5e-4)
+
+        with pytest.raises(ValueError):
+            FinancieroServicio.optimizar_portafolio([0.1, 0.2], [0.1, 0.2], [[1, 1.5], [1.5, 1]])
+
+    def test_riesgo_portafolio(self):
+        """Test VaR/CVaR: histórico contra ordenamiento directo, Monte Carlo contra paramétrico"""
+        import numpy as np
+
+        rng = np.random.default_rng(1)
+        factores = rng.normal(size=(1000, 2)) @ rng.normal(size=(2, 6))
+        retornos = (factores + rng.normal(size=(1000, 6))) * 0.01 + 0.0005
+        ponderaciones = [0.3, 0.2, 0.15, 0.15, 0.1, 0.1]
+        w = np.array(ponderaciones)
+
+        resultado = FinancieroServicio.analizar_riesgo_portafolio(
+            retornos.tolist(), ponderaciones, 0.95, 1.0, 200000
+        )
+
+        cola = np.sort(retornos @ w)[:50]
+        assert resultado["historico"]["var"] == pytest.approx(-cola[-1], abs=1e-4)
+        assert resultado["historico"]["cvar"] == pytest.approx(-cola.mean(), abs=1e-4)
+        assert resultado["volatilidad"] == pytest.approx(np.sqrt(w @ np.cov(retornos.T) @ w), abs=1e-6)
+
+        # Con escenarios normales el Monte Carlo converge al paramétrico
+        assert resultado["monte_carlo"]["var"] == pytest.approx(resultado["parametrico"]["var"], rel=0.02)
+        assert resultado["monte_carlo"]["cvar"] == pytest.approx(resultado["parametrico"]["cvar"], rel=0.02)
+        assert resultado["parametrico"]["cvar"] > resultado["parametrico"]["var"] > 0
+
+        # Las contribuciones de Euler suman el total de cada medida
+        contribuciones = resultado["contribuciones"]
+        assert sum(contribuciones["componente"]) == pytest.approx(resultado["volatilidad"], abs=1e-5)
+        assert sum(contribuciones["porcentaje"]) == pytest.approx(100, abs=0.05)
+        assert sum(contribuciones["var_componente"]) == pytest.approx(resultado["parametrico"]["var"], abs=1e-3)
+        assert sum(contribuciones["cvar_componente_historico"]) == pytest.approx(resultado["historico"]["cvar"], abs=1e-3)
+        assert sum(contribuciones["cvar_componente_monte_carlo"]) == pytest.approx(resultado["monte_carlo"]["cvar"], abs=1e-3)
+
+        en_dinero = FinancieroServicio.analizar_riesgo_portafolio(
+            retornos.tolist(), ponderaciones, 0.95, 100000, 0
+        )
+        assert "monte_carlo" not in en_dinero
+        assert en_dinero["historico"]["var"] == pytest.approx(resultado["historico"]["var"] * 100000, abs=10)
+
+        # Retornos diarios en 100 activos: contribuciones bajo 1e-4 que deben seguir sumando el total
+        diarios = rng.normal(0.0003, 0.01, size=(500, 100)) + rng.normal(0, 0.005, size=(500, 1))
+        resultado = FinancieroServicio.analizar_riesgo_portafolio(
+            diarios.tolist(), [0.01] * 100, 0.95, 1, 20000
+        )
+        contribuciones = resultado["contribuciones"]
+        assert max(abs(v) for v in contribuciones["var_componente"]) < 5e-4
+        assert sum(contribuciones["componente"]) == pytest.approx(resultado["volatilidad"], rel=1e-6)
+        assert sum(contribuciones["var_componente"]) == pytest.approx(resultado["parametrico"]["var"], rel=1e-6)
+        assert sum(contribuciones["cvar_componente_historico"]) == pytest.approx(resultado["historico"]["cvar"], rel=1e-6)
+        assert sum(contribuciones["cvar_componente_monte_carlo"]) == pytest.approx(resultado["monte_carlo"]["cvar"], rel=1e-6)
+
+        with pytest.raises(ValueError):
+            FinancieroServicio.analizar_riesgo_portafolio([[0.1, 0.2]], [0.5, 0.5])
+
+    def test_simular_prestamo_tasa_alta(self):
+        """Test simulación con tasa alta y plazo largo contra la recurrencia en aritmética exacta"""
+        from fractions import Fraction
+        from app.servicios.prestamo_servicio import ServicioPrestamo
+
+        for monto, tasa_anual, plazo in ((10000, 100, 300), (1000, 200, 600)):
+            prepagos = {plazo // 2: monto / 10, plazo - 10: monto / 100}
+            for modalidad in ServicioPrestamo.MODALIDADES_PREPAGO:
+                resultado = ServicioPrestamo.simular_prestamo(
+                    monto, tasa_anual, plazo, modalidad=modalidad,
+                    prepagos=[{"mes": mes, "monto": valor} for mes, valor in prepagos.items()]
+                )
+                r = Fraction(tasa_anual, 1200)
+                saldo = Fraction(monto)
+                cuota = saldo * r / (1 - (1 + r) ** -plazo)
+                esperados = []
+                for mes in range(1, plazo + 1):
+                    saldo = max(saldo * (1 + r) - cuota - Fraction(prepagos.get(mes, 0)), Fraction(0))
+                    esperados.append(float(saldo))
+                    if modalidad == "reducir_cuota" and mes in prepagos:
+                        cuota = saldo * r / (1 - (1 + r) ** -(plazo - mes))
+                tabla = resultado["tabla_amortizacion"]
+                assert len(tabla) == sum(1 for valor in esperados if valor > 0) + 1
+                for fila, esperado in zip(tabla, esperados):
+                    assert fila["saldo_restante"] == pytest.approx(esperado, abs=0.01)
+
 if __name__ == "__main__":
     # Ejecutar tests manualmente
     test_instance = TestFinancieroServicio()
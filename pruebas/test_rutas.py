@@ -134,6 +134,704 @@ class TestRutasAPI:
             if response.status_code != 401:  # Si no requiere auth
                 assert response.content_type == 'application/json'
 
+    def test_van_lote(self):
+        """Test endpoint de VAN por lotes"""
+        datos = {
+            "inversiones_iniciales": 1000,
+            "flujos_caja": [[600, 700], [100, 100]],
+            "tasas_descuento": 0.1
+        }
+        response = self.client.post('/api/v1/financiero/van/lote',
+                                  data=json.dumps(datos),
+                                  content_type='application/json')
+        assert response.status_code == 200
+
+        data = json.loads(response.data)
+        assert data["success"]
+        assert len(data["data"]["van"]) == 2
+        assert data["data"]["decision"] == ["ACEPTAR", "RECHAZAR"]
+
+    def test_montecarlo_van(self):
+        """Test simulación Monte Carlo del VAN en ambas precisiones"""
+        for precision in ["float64", "float32"]:
+            datos = {
+                "inversion_inicial": 1000,
+                "flujos_caja": [400, 400, 400],
+                "tasa_descuento": 0.1,
+                "n_simulaciones": 2000,
+                "precision": precision
+            }
+            response = self.client.post('/api/v1/ml/sensibilidad/montecarlo',
+                                      data=json.dumps(datos),
+                                      content_type='application/json')
+            assert response.status_code == 200
+
+            simulacion = json.loads(response.data)["simulacion"]
+            assert simulacion["n_simulaciones"] == 2000
+            assert simulacion["cvar_95"] <= simulacion["var_95"] <= simulacion["van_mediana"]
+            assert len(simulacion["histograma_data"]["valores"]) == 21
+            # VAN determinista ≈ -5.26; la media simulada debe quedar cerca
+            assert abs(simulacion["van_medio"]) < 50
+
+        # Misma semilla, mismo resultado; semillas distintas, resultados distintos
+        respuestas = []
+        for semilla in [7, 7, 8]:
+            datos["semilla"] = semilla
+            response = self.client.post('/api/v1/ml/sensibilidad/montecarlo',
+                                      data=json.dumps(datos),
+                                      content_type='application/json')
+            respuestas.append(json.loads(response.data)["simulacion"])
+        assert respuestas[0] == respuestas[1]
+        assert respuestas[0]["van_medio"] != respuestas[2]["van_medio"]
+        assert respuestas[2]["semilla"] == 8
+
+        datos["precision"] = "float16"
+        response = self.client.post('/api/v1/ml/sensibilidad/montecarlo',
+                                  data=json.dumps(datos),
+                                  content_type='application/json')
+        assert response.status_code == 400
+
+    def test_predecir_lote(self):
+        """Test endpoint de predicción por lotes coincide con las predicciones individuales"""
+        empresas = [
+            {"ingresos_anuales": 500000, "gastos_operativos": 350000,
+             "activos_totales": 800000, "pasivos_totales": 300000},
+            {"ingresos_anuales": 200000, "gastos_operativos": 190000,
+             "activos_totales": 300000, "pasivos_totales": 280000, "inflacion": 0.09}
+        ]
+        response = self.client.post('/api/v1/ml/predecir/lote',
+                                  data=json.dumps({"empresas": empresas}),
+                                  content_type='application/json')
+        assert response.status_code == 200
+
+        data = json.loads(response.data)
+        assert data["n_empresas"] == 2
+        for empresa, prediccion in zip(empresas, data["predicciones"]):
+            individual = self.client.post('/api/v1/ml/predecir/riesgo',
+                                        data=json.dumps(empresa),
+                                        content_type='application/json')
+            assert prediccion["riesgo"] == json.loads(individual.data)["clasificacion"]
+            assert set(prediccion) == {"ingresos", "crecimiento", "riesgo"}
+
+        response = self.client.post('/api/v1/ml/predecir/lote',
+                                  data=json.dumps({"empresas": [{"ingresos_anuales": 1}]}),
+                                  content_type='application/json')
+        assert response.status_code == 400
+
+    def test_estado_ml_carga_perezosa(self, tmp_path):
+        """Test los artefactos ML se cargan al primer uso y /estado informa la carga"""
+        import joblib
+        from sklearn.preprocessing import LabelEncoder
+        from app.servicios.ml_servicio import obtener_servicio_ml
+
+        joblib.dump(LabelEncoder().fit(["Alto", "Bajo", "Medio"]), tmp_path / "label_encoder_riesgo.joblib")
+        servicio = obtener_servicio_ml()
+        servicio.modelos_dir = str(tmp_path)
+        servicio.modelos_cargados = True
+
+        artefactos = json.loads(self.client.get('/api/v1/ml/estado').data)["carga_modelos"]["artefactos"]
+        assert artefactos["label_encoder_riesgo"]["pendiente"]
+
+        assert list(servicio.label_encoder_riesgo.classes_) == ["Alto", "Bajo", "Medio"]
+        assert servicio.modelo_riesgo is None
+
+        artefactos = json.loads(self.client.get('/api/v1/ml/estado').data)["carga_modelos"]["artefactos"]
+        assert artefactos["label_encoder_riesgo"]["cargado"]
+        assert artefactos["label_encoder_riesgo"]["tiempo_carga_ms"] >= 0
+        assert "error" in artefactos["modelo_riesgo"]
+
+    def test_recarga_modelos_versiones(self, tmp_path, monkeypatch):
+        """Test cambio en caliente de versión de modelos desde el endpoint de administración"""
+        import joblib
+        from sklearn.preprocessing import LabelEncoder
+        from app.servicios import ml_servicio
+
+        for version, clases in [("v1", ["Alto", "Bajo"]), ("v2", ["Alto", "Bajo", "Medio"])]:
+            (tmp_path / version).mkdir()
+            joblib.dump(LabelEncoder().fit(clases), tmp_path / version / "label_encoder_riesgo.joblib")
+        registro = ml_servicio.RegistroModelos(directorio_base=str(tmp_path))
+        registro.cargar("v1")
+        monkeypatch.setattr(ml_servicio, "_registro_modelos", registro)
+        self.app.config["ML_TOKEN_ADMIN"] = "secreto"
+        anterior = ml_servicio.obtener_servicio_ml()
+
+        url = '/api/v1/ml/modelos/recargar'
+        cuerpo = json.dumps({"version": "v2"})
+        assert self.client.post(url, data=cuerpo, content_type='application/json').status_code == 403
+
+        cabeceras = {"X-Admin-Token": "secreto"}
+        response = self.client.post(url, data=cuerpo, content_type='application/json', headers=cabeceras)
+        assert response.status_code == 200
+        assert json.loads(response.data)["version"]["cambiada"]
+
+        # Las referencias anteriores siguen siendo válidas; las nuevas ven la versión nueva
+        assert list(anterior.label_encoder_riesgo.classes_) == ["Alto", "Bajo"]
+        assert list(ml_servicio.obtener_servicio_ml().label_encoder_riesgo.classes_) == ["Alto", "Bajo", "Medio"]
+        assert registro.version_configurada() == "v2"
+
+        # Sin cambios de tamaño ni fecha no se vuelve a calcular el checksum
+        calculos = []
+        checksum = ml_servicio.RegistroModelos.checksum
+        monkeypatch.setattr(ml_servicio.RegistroModelos, "checksum",
+                            staticmethod(lambda directorio: calculos.append(directorio) or checksum(directorio)))
+        response = self.client.post(url, data=cuerpo, content_type='application/json', headers=cabeceras)
+        assert not json.loads(response.data)["version"]["cambiada"]
+        assert calculos == []
+        response = self.client.post(url, data=json.dumps({"version": "../v1"}),
+                                  content_type='application/json', headers=cabeceras)
+        assert response.status_code == 400
+
+        joblib.dump(LabelEncoder().fit(["Bajo", "Medio"]), tmp_path / "v2" / "label_encoder_riesgo.joblib")
+        assert registro.comprobar_cambios()
+        assert list(ml_servicio.obtener_servicio_ml().label_encoder_riesgo.classes_) == ["Bajo", "Medio"]
+
+        data = json.loads(self.client.get('/api/v1/ml/modelos').data)
+        assert data["versiones_disponibles"] == ["v1", "v2"]
+        assert [v["directorio"] for v in data["historial"]] == ["v1", "v2", "v2"]
+
+    def test_cache_predicciones(self):
+        """Test caché LRU+TTL de predicciones: aciertos, desalojo, caducidad e invalidación"""
+        from app.servicios.cache_lru import CacheLRUTTL
+        from app.servicios.ml_servicio import obtener_servicio_ml
+
+        reloj = [0.0]
+        cache = CacheLRUTTL(capacidad=2, ttl=10, reloj=lambda: reloj[0])
+        cache.guardar("a", 1)
+        cache.guardar("b", 2)
+        assert cache.obtener("a") == 1
+        cache.guardar("c", 3)  # desaloja "b", la menos reciente
+        assert cache.obtener("b") is None
+        reloj[0] = 11
+        assert cache.obtener("a") is None
+        assert (cache.desalojos, cache.caducadas) == (1, 1)
+
+        empresa = {"ingresos_anuales": 500000, "gastos_operativos": 350000,
+                   "activos_totales": 800000, "pasivos_totales": 300000}
+        servicio = obtener_servicio_ml()
+        respuestas = [
+            json.loads(self.client.post('/api/v1/ml/predecir/riesgo', data=json.dumps(datos),
+                                        content_type='application/json').data)
+            for datos in [empresa, dict(empresa, inflacion=0.04), dict(empresa, ingresos_anuales=500000.0)]
+        ]
+        assert respuestas[0] == respuestas[1] == respuestas[2]
+
+        estadisticas = json.loads(self.client.get('/api/v1/ml/estado').data)["cache_predicciones"]
+        assert (estadisticas["aciertos"], estadisticas["fallos"]) == (2, 1)
+
+        servicio.modelo_riesgo = None  # cambiar un modelo invalida la caché
+        assert servicio.cache.estadisticas()["entradas"] == 0
+
+    def test_backend_inferencia_numpy(self, tmp_path, monkeypatch):
+        """Test árboles convertidos a NumPy: mismas predicciones que el modelo nativo"""
+        import joblib
+        import numpy as np
+        from sklearn.ensemble import RandomForestRegressor
+        from app.servicios import ml_servicio
+        from app.servicios.arboles_compilados import compilar_modelo
+
+        # Volcado JSON de XGBoost (multiclase, dos árboles paralelos por clase; rama "yes" si
+        # x < umbral, NaN por "missing"; base_score por clase)
+        class BoosterFalso:
+            feature_names = None
+            def get_dump(self, dump_format):
+                return [json.dumps({"nodeid": 0, "split": "f1", "split_condition": 0.5, "yes": 1, "no": 2, "missing": 2,
+                                    "children": [{"nodeid": 1, "leaf": izquierda}, {"nodeid": 2, "leaf": derecha}]})
+                        for izquierda, derecha in [(0.3, -0.2), (0.1, 0.0), (-0.1, 0.4), (0.0, 0.2), (0.0, 0.1), (0.2, 0.0)]]
+            def save_config(self):
+                return json.dumps({"learner": {
+                    "objective": {"name": "multi:softprob"},
+                    "gradient_booster": {"name": "gbtree", "gbtree_model_param": {"num_parallel_tree": "2"}},
+                    "learner_model_param": {"base_score": "[1E-1,0E0,-1E-1]", "num_class": "3"}}})
+            def num_features(self):
+                return 2
+        xgb_falso = type("XGBClassifier", (), {"get_booster": lambda self: BoosterFalso()})()
+        compilado = compilar_modelo(xgb_falso)
+        margenes = np.array([[0.5, -0.1, 0.1], [-0.1, 0.6, 0.0], [-0.1, 0.6, 0.0]])
+        esperadas = np.exp(margenes) / np.exp(margenes).sum(axis=1, keepdims=True)
+        assert compilado.predict_proba(np.array([[9.0, 0.2], [9.0, 0.5], [9.0, np.nan]])) == pytest.approx(esperadas)
+        assert list(compilado.predict(np.array([[0.0, 0.2], [0.0, 0.5]]))) == [0, 1]
+
+        # Con NaN, los bosques de sklearn siguen la rama de faltantes de cada nodo; una
+        # conversión que no reproduce al modelo original se rechaza al compilar
+        from sklearn.ensemble import RandomForestClassifier
+        from app.servicios import arboles_compilados
+        rng = np.random.default_rng(1)
+        X = rng.uniform(size=(500, 4))
+        X[rng.random(X.shape) < 0.1] = np.nan
+        y = (np.nan_to_num(X[:, 0]) + np.nan_to_num(X[:, 1]) > 1).astype(int)
+        bosque = RandomForestClassifier(n_estimators=10, random_state=0).fit(X, y)
+        assert compilar_modelo(bosque).predict_proba(X) == pytest.approx(bosque.predict_proba(X))
+        arbol_sklearn = arboles_compilados._arbol_sklearn
+        monkeypatch.setattr(arboles_compilados, "_arbol_sklearn", lambda arbol, normalizar=False: {
+            clave: valor for clave, valor in arbol_sklearn(arbol, normalizar).items() if clave != "faltante"})
+        with pytest.raises(ValueError):
+            compilar_modelo(bosque)
+        monkeypatch.undo()
+
+        rng = np.random.default_rng(0)
+        X = rng.uniform(size=(400, 15)) * 1e6
+        modelo = RandomForestRegressor(n_estimators=20, max_depth=6, random_state=0).fit(X, X[:, 0] * 1.1)
+        joblib.dump(modelo, tmp_path / "modelo_ingresos_xgb.joblib")
+        empresa = {"ingresos_anuales": 500000, "gastos_operativos": 350000,
+                   "activos_totales": 800000, "pasivos_totales": 300000}
+
+        predicciones = {}
+        for backend in ["nativo", "numpy"]:
+            registro = ml_servicio.RegistroModelos(directorio_base=str(tmp_path), backend_inferencia=backend)
+            registro.cargar()
+            monkeypatch.setattr(ml_servicio, "_registro_modelos", registro)
+            response = self.client.post('/api/v1/ml/predecir/ingresos', data=json.dumps(empresa),
+                                      content_type='application/json')
+            predicciones[backend] = json.loads(response.data)["prediccion"]
+            carga = registro.servicio.estado_modelos()["artefactos"]["modelo_ingresos"]
+            assert carga["backend"] == backend
+
+        assert predicciones["numpy"] == predicciones["nativo"]
+        assert predicciones["numpy"]["modelo_usado"] == "XGBoost"
+
+    def test_backend_inferencia_numpy_xgboost(self):
+        """Test conversión de un XGBClassifier multiclase real (como el de riesgo) con NaN y árboles paralelos"""
+        import numpy as np
+        xgboost = pytest.importorskip("xgboost")
+        from app.servicios.arboles_compilados import compilar_modelo
+
+        rng = np.random.default_rng(0)
+        X = rng.normal(size=(600, 5))
+        y = np.digitize(X[:, 0] + 0.5 * X[:, 1], [-0.5, 0.5])
+        X[rng.random(X.shape) < 0.15] = np.nan
+        modelo = xgboost.XGBClassifier(objective="multi:softprob", n_estimators=15, max_depth=4,
+                                       num_parallel_tree=2, random_state=0).fit(X, y)
+
+        compilado = compilar_modelo(modelo)
+        assert compilado.predict_proba(X) == pytest.approx(modelo.predict_proba(X), rel=1e-4, abs=1e-5)
+        assert (compilado.predict(X) == modelo.predict(X)).all()
+
+    def test_superficie_sensibilidad(self):
+        """Test superficie de VAN sobre rejillas coincide con el VAN escalar en cada punto"""
+        from app.servicios.ml_servicio import AnalisisSensibilidad
+
+        datos = {
+            "inversion_inicial": 1000,
+            "flujos_caja": [400, 400, 400],
+            "tasa_descuento": 0.1,
+            "variables": {
+                "flujos": {"min": 0.5, "max": 1.5, "n": 5},
+                "tasa": {"valores": [0.05, 0.1, 0.2], "tipo": "absoluto"},
+                "flujo_2": [0, 1]
+            }
+        }
+        response = self.client.post('/api/v1/ml/sensibilidad/superficie',
+                                  data=json.dumps(datos),
+                                  content_type='application/json')
+        assert response.status_code == 200
+
+        superficie = json.loads(response.data)["analisis_superficie"]
+        assert [eje["variable"] for eje in superficie["ejes"]] == ["flujos", "tasa", "flujo_2"]
+        assert superficie["n_combinaciones"] == 30
+        for i, multiplicador in enumerate([0.5, 0.75, 1.0, 1.25, 1.5]):
+            for j, tasa in enumerate([0.05, 0.1, 0.2]):
+                for k, flujo_2 in enumerate([0, 400]):
+                    flujos = [400 * multiplicador, flujo_2 * multiplicador, 400 * multiplicador]
+                    esperado = AnalisisSensibilidad.calcular_van(1000, flujos, tasa)
+                    assert superficie["van"][i][j][k] == pytest.approx(esperado, abs=0.01)
+
+        datos["variables"] = {"tasa": [0.5, 1.5], "flujo_7": [1, 2]}
+        response = self.client.post('/api/v1/ml/sensibilidad/arana',
+                                  data=json.dumps(datos),
+                                  content_type='application/json')
+        assert response.status_code == 400
+
+        tornado = AnalisisSensibilidad().analisis_tornado(1000, [400, 400, 400], 0.1, 0.2,
+                                                          variables=["inversion", "flujo_1"])
+        rangos = {r["variable"]: r["rango"] for r in tornado["resultados"]}
+        assert rangos == {"Inversión Inicial": 400.0, "Flujo período 1": pytest.approx(145.45, abs=0.01)}
+
+    def test_punto_equilibrio_todas(self):
+        """Test cada equilibrio cerrado anula el VAN y la tasa coincide con la TIR"""
+        from app.servicios.ml_servicio import AnalisisSensibilidad
+
+        datos = {
+            "inversion_inicial": 1000,
+            "flujos_caja": [300, 400, 500, 200],
+            "tasa_descuento": 0.1,
+            "variable": "todas"
+        }
+        response = self.client.post('/api/v1/ml/sensibilidad/punto-equilibrio',
+                                  data=json.dumps(datos),
+                                  content_type='application/json')
+        assert response.status_code == 200
+
+        resultado = json.loads(response.data)["punto_equilibrio"]
+        equilibrios = resultado["equilibrios"]
+        van = AnalisisSensibilidad.calcular_van
+        flujos = datos["flujos_caja"]
+        assert van(equilibrios["inversion"]["inversion_equilibrio"], flujos, 0.1) == pytest.approx(0, abs=0.01)
+        multiplicador = equilibrios["flujos"]["multiplicador_equilibrio"]
+        assert van(1000, [f * multiplicador for f in flujos], 0.1) == pytest.approx(0, abs=0.1)
+        assert van(1000, flujos, equilibrios["tasa"]["tasa_equilibrio"]) == pytest.approx(0, abs=0.1)
+        for t in range(1, 5):
+            modificados = list(flujos)
+            modificados[t - 1] = equilibrios[f"flujo_{t}"]["flujo_equilibrio"]
+            assert van(1000, modificados, 0.1) == pytest.approx(0, abs=0.01)
+        # VP acumulado: 272.73 + 330.58 = 603.31 < 1000 < 603.31 + 375.66 + 136.60
+        assert 3 < equilibrios["horizonte"]["periodo_equilibrio"] < 4
+
+        # TIR fuera del rango habitual: el rango de búsqueda se amplía
+        tasa = AnalisisSensibilidad().punto_equilibrio(100, [5000], 0.1, variable="tasa")
+        assert tasa["tasa_equilibrio"] == pytest.approx(49.0)
+
+    def test_prestamo_simulacion_prepagos(self):
+        """Test modo simulación: prepagos, cambio de tasa y gracia frente a la recurrencia mes a mes"""
+        datos = {
+            "modo": "simulacion",
+            "monto": 100000,
+            "tasa_anual": 12,
+            "plazo_meses": 120,
+            "gracia_meses": 6,
+            "tipo_gracia": "total",
+            "cambios_tasa": [{"mes": 37, "tasa_anual": 9}],
+            "prepagos": [{"mes": 24, "monto": 10000}, {"monto": 300, "cada": 1, "desde": 48}],
+            "modalidad": "reducir_cuota"
+        }
+        response = self.client.post('/api/v1/financiero/prestamo',
+                                  data=json.dumps(datos),
+                                  content_type='application/json')
+        assert response.status_code == 200
+        resultado = json.loads(response.data)["data"]
+
+        # Recurrencia explícita: gracia capitalizada y cuota recalculada tras
+        # cada prepago y en el cambio de tasa
+        saldo, cuota, intereses = 100000.0, 0.0, 0.0
+        for mes in range(1, 121):
+            r = (0.12 if mes < 37 else 0.09) / 12
+            prepago_previo = mes - 1 == 24 or mes - 1 >= 48
+            if mes == 7 or mes == 37 or (mes > 7 and prepago_previo):
+                cuota = saldo * r / (1 - (1 + r) ** -(121 - mes))
+            interes = saldo * r
+            pago = 0.0 if mes <= 6 else min(cuota, saldo + interes)
+            saldo += interes - pago
+            saldo -= min(saldo, 10000 if mes == 24 else 300 if mes >= 48 else 0)
+            intereses += interes
+
+        sin_prepagos, con_prepagos = resultado["estrategias"]
+        assert con_prepagos["total_intereses"] == pytest.approx(intereses, abs=0.01)
+        assert con_prepagos["ahorro_intereses"] > 0
+        assert sin_prepagos["meses_efectivos"] == 120
+        tabla = resultado["tabla_amortizacion"]
+        assert tabla[5]["cuota"] == 0 and tabla[5]["saldo_restante"] > 100000
+        assert tabla[-1]["saldo_restante"] == 0
+        assert con_prepagos["costo_total_desembolsado"] == con_prepagos["total_pagado"]
+
+        # Comisión e impuesto se aplican igual que en el modo estándar
+        datos.update(comision_inicial=2, tasa_impuesto=10)
+        response = self.client.post('/api/v1/financiero/prestamo',
+                                  data=json.dumps(datos),
+                                  content_type='application/json')
+        resultado = json.loads(response.data)["data"]
+        con_prepagos = resultado["estrategias"][1]
+        assert resultado["resumen"]["comision_inicial"] == 2000
+        assert resultado["resumen"]["monto_neto_desembolsado"] == 98000
+        assert con_prepagos["impuestos"] == pytest.approx(intereses * 0.1, abs=0.01)
+        assert con_prepagos["costo_total_desembolsado"] == pytest.approx(
+            con_prepagos["total_pagado"] + 2000 + intereses * 0.1, abs=0.02)
+        del datos["comision_inicial"], datos["tasa_impuesto"]
+
+        # Evaluación en lote: reducir plazo ahorra más intereses que reducir cuota
+        datos["estrategias"] = [
+            {"nombre": "Plazo", "prepagos": [{"monto": 500, "cada": 1}], "modalidad": "reducir_plazo"},
+            {"nombre": "Cuota", "prepagos": [{"monto": 500, "cada": 1}], "modalidad": "reducir_cuota"},
+            {"nombre": "Anual", "prepagos": [{"monto": 6000, "cada": 12, "desde": 18}], "modalidad": "reducir_plazo"}
+        ]
+        datos["incluir_tabla"] = False
+        response = self.client.post('/api/v1/financiero/prestamo',
+                                  data=json.dumps(datos),
+                                  content_type='application/json')
+        resultado = json.loads(response.data)["data"]
+        intereses = {e["nombre"]: e["total_intereses"] for e in resultado["estrategias"]}
+        assert resultado["mejor_estrategia"] == "Plazo"
+        assert intereses["Plazo"] < intereses["Cuota"] < intereses["Sin prepagos"]
+        assert "tabla_amortizacion" not in resultado
+
+        datos["prepagos"] = [{"mes": 3, "monto": 1000}]
+        del datos["estrategias"]
+        response = self.client.post('/api/v1/financiero/prestamo',
+                                  data=json.dumps(datos),
+                                  content_type='application/json')
+        assert response.status_code == 400
+
+    def test_prestamo_grid(self):
+        """Test rejilla de préstamos coincide punto a punto con calcular_prestamo_completo"""
+        from app.servicios.prestamo_servicio import ServicioPrestamo
+
+        tasas = [0] + [round(6 + 0.5 * i, 1) for i in range(19)]
+        plazos = list(range(12, 372, 12))
+        datos = {"montos": 50000, "tasas_anuales": tasas, "plazos_meses": plazos,
+                 "comision_inicial": 2, "tasa_impuesto": 5}
+        response = self.client.post('/api/v1/financiero/prestamo/grid',
+                                  data=json.dumps(datos),
+                                  content_type='application/json')
+        assert response.status_code == 200
+
+        rejilla = json.loads(response.data)["data"]
+        assert rejilla["n_combinaciones"] == 600
+        for i, tasa in enumerate(tasas):
+            for j, plazo in enumerate(plazos):
+                completo = ServicioPrestamo.calcular_prestamo_completo(
+                    50000, tasa, plazo, tasa_impuesto=5, comision_inicial=2, incluir_tabla=False)
+                assert rejilla["cuota_mensual"][0][i][j] == completo["resumen"]["cuota_mensual"]
+                assert rejilla["costo_total"][0][i][j] == pytest.approx(
+                    completo["costos"]["costo_total_desembolsado"], abs=0.01)
+
+        datos["plazos_meses"] = [12, 700]
+        response = self.client.post('/api/v1/financiero/prestamo/grid',
+                                  data=json.dumps(datos),
+                                  content_type='application/json')
+        assert response.status_code == 400
+
+    def test_meta_ahorro_lote(self):
+        """Test metas de ahorro en lote coinciden con la simulación mes a mes"""
+        def meses_bucle(objetivo, inicial, tasa_anual, aporte, impuesto=0, inflacion=0):
+            saldo, meses = inicial, 0
+            tasa = tasa_anual / 1200 * (1 - impuesto / 100)
+            while meses < 1200:
+                meses += 1
+                saldo = (saldo + aporte) * (1 + tasa)
+                if saldo / (1 + inflacion / 1200) ** meses >= objetivo:
+                    return meses
+            return None
+
+        metas = [
+            {"aporte_mensual": 500},
+            {"aporte_mensual": 500, "tasa_anual": 0},
+            {"aporte_mensual": 500, "tasa_impuesto": 30},
+            {"aporte_mensual": 500, "inflacion_anual": 4},
+            {"aporte_mensual": 0, "tasa_anual": -2},
+            {"aporte_mensual": 2000, "monto_inicial": 0, "tasa_anual": 12}
+        ]
+        datos = {"monto_objetivo": 100000, "monto_inicial": 10000, "tasa_anual": 8, "metas": metas}
+        response = self.client.post('/api/v1/financiero/ahorro/meta',
+                                  data=json.dumps(datos),
+                                  content_type='application/json')
+        assert response.status_code == 200
+
+        resultados = json.loads(response.data)["data"]["metas"]
+        assert len(resultados) == len(metas)
+        for meta, resultado in zip(metas, resultados):
+            parametros = {**datos, **meta}
+            esperado = meses_bucle(parametros["monto_objetivo"], parametros["monto_inicial"],
+                                   parametros["tasa_anual"], parametros["aporte_mensual"],
+                                   meta.get("tasa_impuesto", 0), meta.get("inflacion_anual", 0))
+            if esperado is None:
+                assert resultado["meta_alcanzable"] is False
+            else:
+                assert resultado["meses_necesarios"] == esperado
+        assert resultados[2]["impuestos_pagados"] > 0
+        assert resultados[3]["saldo_poder_adquisitivo"] >= 100000
+        assert resultados[0]["meses_necesarios"] < resultados[2]["meses_necesarios"] < resultados[3]["meses_necesarios"]
+
+    def test_ahorro_resolucion_y_streaming(self):
+        """Test proyección de ahorro mensual, trimestral y en CSV por bloques"""
+        datos = {"monto_inicial": 1000, "aporte_mensual": 100, "tasa_anual": 6,
+                 "meses": 600, "tasa_impuesto": 10, "resolucion": "mensual"}
+        response = self.client.post('/api/v1/financiero/ahorro',
+                                  data=json.dumps(datos),
+                                  content_type='application/json')
+        assert response.status_code == 200
+        proyeccion = json.loads(response.data)["data"]["proyeccion"]
+        assert [fila["mes"] for fila in proyeccion] == list(range(1, 601))
+
+        saldo = 1000
+        for fila in proyeccion:
+            interes = (saldo + 100) * 0.005
+            saldo += 100 + interes * 0.9
+            assert abs(fila["saldo"] - round(saldo, 2)) <= 0.01
+            assert abs(fila["interes_mes"] - round(interes, 2)) <= 0.01
+
+        response = self.client.post('/api/v1/financiero/ahorro',
+                                  data=json.dumps({**datos, "resolucion": "trimestral", "meses": 10}),
+                                  content_type='application/json')
+        assert [f["mes"] for f in json.loads(response.data)["data"]["proyeccion"]] == [1, 3, 6, 9, 10]
+
+        response = self.client.post('/api/v1/financiero/ahorro',
+                                  data=json.dumps({**datos, "stream": True}),
+                                  content_type='application/json')
+        assert response.status_code == 200
+        assert json.loads(response.data)["data"]["proyeccion"] == proyeccion
+
+        response = self.client.post('/api/v1/financiero/ahorro',
+                                  data=json.dumps({**datos, "formato": "csv"}),
+                                  content_type='application/json')
+        assert response.status_code == 200
+        assert response.mimetype == 'text/csv'
+        lineas = response.data.decode().splitlines()
+        assert lineas[0].startswith("mes,ano,aporte_mes")
+        assert len(lineas) == 601
+        assert float(lineas[-1].split(",")[6]) == proyeccion[-1]["saldo"]
+
+        response = self.client.post('/api/v1/financiero/ahorro',
+                                  data=json.dumps({**datos, "formato": "xml"}),
+                                  content_type='application/json')
+        assert response.status_code == 400
+
+    def test_ahorro_monte_carlo(self):
+        """Test Monte Carlo de ahorro: bandas, meta y caso sin volatilidad"""
+        datos = {"monto_inicial": 1000, "aporte_mensual": 500, "tasa_anual": 7, "meses": 480,
+                 "volatilidad_anual": 15, "inflacion_anual": 3, "volatilidad_inflacion": 1,
+                 "monto_objetivo": 500000, "n_simulaciones": 2000}
+        response = self.client.post('/api/v1/financiero/ahorro/monte-carlo',
+                                  data=json.dumps(datos),
+                                  content_type='application/json')
+        assert response.status_code == 200
+        resultado = json.loads(response.data)["data"]
+        abanico = resultado["abanico"]
+        assert abanico["mes"][0] == 1 and abanico["mes"][-1] == 480 and len(abanico["mes"]) == 41
+        for p_bajo, p_alto in zip(abanico["percentiles"], abanico["percentiles"][1:]):
+            assert all(a <= b for a, b in zip(abanico["saldo"][f"p{p_bajo}"], abanico["saldo"][f"p{p_alto}"]))
+        assert 0 < resultado["resumen"]["probabilidad_meta"] < 1
+        assert resultado["resumen"]["probabilidad_meta_real"] < resultado["resumen"]["probabilidad_meta"]
+        assert abanico["probabilidad_meta"][-1] == resultado["resumen"]["probabilidad_meta"]
+
+        # Misma semilla, mismo resultado
+        repetido = self.client.post('/api/v1/financiero/ahorro/monte-carlo',
+                                  data=json.dumps(datos),
+                                  content_type='application/json')
+        assert json.loads(repetido.data)["data"] == resultado
+
+        # Sin volatilidad coincide con la proyección determinista
+        datos_fijos = {**datos, "volatilidad_anual": 0, "volatilidad_inflacion": 0, "n_simulaciones": 10}
+        response = self.client.post('/api/v1/financiero/ahorro/monte-carlo',
+                                  data=json.dumps(datos_fijos),
+                                  content_type='application/json')
+        mediana = json.loads(response.data)["data"]["abanico"]["saldo"]["p50"]
+        response = self.client.post('/api/v1/financiero/ahorro',
+                                  data=json.dumps(datos_fijos),
+                                  content_type='application/json')
+        proyeccion = json.loads(response.data)["data"]["proyeccion"]
+        assert [fila["saldo"] for fila in proyeccion] == mediana
+
+        response = self.client.post('/api/v1/financiero/ahorro/monte-carlo',
+                                  data=json.dumps({**datos, "modelo": "bootstrap"}),
+                                  content_type='application/json')
+        assert response.status_code == 400
+
+    def _tabla_unidad_de_trabajo(self):
+        """Crea (vacía) la tabla de las pruebas de transacción por solicitud"""
+        from app.utils.base_datos import DatabaseConnection
+
+        db = DatabaseConnection()
+        db.connect()
+        db.execute_query("CREATE TABLE IF NOT EXISTS prueba_unidad_trabajo (valor TEXT)")
+        db.execute_query("DELETE FROM prueba_unidad_trabajo")
+        db.commit()
+        db.disconnect()
+
+    def _filas_unidad_de_trabajo(self):
+        from app.utils.base_datos import DatabaseConnection
+
+        db = DatabaseConnection()
+        db.connect()
+        filas = db.execute_query("SELECT valor FROM prueba_unidad_trabajo ORDER BY valor", fetch=True)
+        db.disconnect()
+        return [fila[0] for fila in filas]
+
+    def test_unidad_de_trabajo_revierte_errores(self):
+        """Test una respuesta 5xx o una excepción no dejan filas escritas por los modelos"""
+        from app.utils.base_datos import get_db_connection
+
+        def escribir(valor):
+            db = get_db_connection()
+            db.execute_query("INSERT INTO prueba_unidad_trabajo (valor) VALUES (%s)", (valor,))
+            db.commit()
+            db.disconnect()
+
+        def vista_5xx():
+            escribir("5xx")
+            return {"error": "fallo"}, 500
+
+        def vista_excepcion():
+            escribir("excepcion")
+            raise RuntimeError("fallo de la vista")
+
+        def vista_ok():
+            escribir("ok")
+            return {"ok": True}, 200
+
+        self.app.add_url_rule('/_prueba/uow/5xx', 'uow_5xx', vista_5xx)
+        self.app.add_url_rule('/_prueba/uow/excepcion', 'uow_excepcion', vista_excepcion)
+        self.app.add_url_rule('/_prueba/uow/ok', 'uow_ok', vista_ok)
+        self._tabla_unidad_de_trabajo()
+
+        assert self.client.get('/_prueba/uow/5xx').status_code == 500
+        with pytest.raises(RuntimeError):
+            self.client.get('/_prueba/uow/excepcion')
+        assert self._filas_unidad_de_trabajo() == []
+
+        assert self.client.get('/_prueba/uow/ok').status_code == 200
+        assert self._filas_unidad_de_trabajo() == ["ok"]
+
+    def test_unidad_de_trabajo_savepoints_anidados(self):
+        """Test revertir una vista externa descarta los savepoints de las vistas internas"""
+        from flask import g
+        from app.utils.base_datos import get_db_connection
+
+        def vista_anidada():
+            externa = get_db_connection()
+            externa.execute_query("INSERT INTO prueba_unidad_trabajo (valor) VALUES (%s)", ("a",))
+
+            interna = get_db_connection()
+            interna.execute_query("INSERT INTO prueba_unidad_trabajo (valor) VALUES (%s)", ("b",))
+            interna.commit()
+
+            externa.rollback()
+            savepoints = list(g._econova_unidad_de_trabajo._savepoints)
+            interna.disconnect()
+
+            externa.execute_query("INSERT INTO prueba_unidad_trabajo (valor) VALUES (%s)", ("c",))
+            assert externa.commit()
+            externa.disconnect()
+            return {"savepoints": savepoints}, 200
+
+        self.app.add_url_rule('/_prueba/uow/anidada', 'uow_anidada', vista_anidada)
+        self._tabla_unidad_de_trabajo()
+
+        response = self.client.get('/_prueba/uow/anidada')
+        assert response.status_code == 200
+        assert json.loads(response.data)["savepoints"] == ["uow_1"]
+        assert self._filas_unidad_de_trabajo() == ["c"]
+
+    def test_unidad_de_trabajo_cierre_sin_commit(self):
+        """Test lo que una vista escribe y cierra sin commit no se guarda aunque otra vista confirme"""
+        from app.utils.base_datos import get_db_connection
+
+        def escribir(valor, confirmar):
+            db = get_db_connection()
+            db.execute_query("INSERT INTO prueba_unidad_trabajo (valor) VALUES (%s)", (valor,))
+            if confirmar:
+                db.commit()
+            db.disconnect()
+
+        def vista_sin_commit():
+            escribir("sin_commit", False)
+            escribir("confirmado", True)
+            return {"ok": True}, 200
+
+        def vista_anidada():
+            # El commit de una vista interna sobrevive al cierre sin commit de la externa
+            externa = get_db_connection()
+            escribir("interna", True)
+            externa.disconnect()
+            escribir("descartada", False)
+            return {"ok": True}, 200
+
+        self.app.add_url_rule('/_prueba/uow/sin-commit', 'uow_sin_commit', vista_sin_commit)
+        self.app.add_url_rule('/_prueba/uow/sin-commit-anidada', 'uow_sin_commit_anidada', vista_anidada)
+        self._tabla_unidad_de_trabajo()
+
+        assert self.client.get('/_prueba/uow/sin-commit').status_code == 200
+        assert self._filas_unidad_de_trabajo() == ["confirmado"]
+        assert self.client.get('/_prueba/uow/sin-commit-anidada').status_code == 200
+        assert self._filas_unidad_de_trabajo() == ["confirmado", "interna"]
+
 if __name__ == "__main__":
     # Ejecutar tests manualmente
     test_instance = TestRutasAPI()